@@ -171,9 +171,35 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # Set environment variable MEDIA_USE_RELATIVE_URLS=False to force absolute URLs.
 MEDIA_USE_RELATIVE_URLS = os.environ.get('MEDIA_USE_RELATIVE_URLS', 'True') == 'True'
 
+# 画像の配信方式。空なら nginx の /media/ から公開配信（URL は ?v= の指紋付きで1年キャッシュ）。
+# 'nginx'（X-Accel-Redirect）/ 'sendfile'（X-Sendfile）/ 'django' では /api/media/ の署名付き URL を返し、
+# API が署名を確かめてからファイル本体の送信を Web サーバに任せる（'django' は開発用に Django が送信）
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIA_SENDFILE_BACKEND', '')
+# X-Accel-Redirect の内部 location（nginx.conf の internal な /protected-media/）
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
 # Upload limits (avoid 413 Request Entity Too Large from Django)
 DATA_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('DATA_UPLOAD_MAX_MEMORY_SIZE', 50 * 1024 * 1024))  # 50MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', 50 * 1024 * 1024))  # 50MB
+# これを超えるファイルはメモリではなく一時ファイルで受ける（gunicorn の各ワーカーに 50MB を抱えさせない）
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', 2621440))  # 2.5MB
+# 分割アップロード（/api/uploads/）: チャンクの一時保存先（MEDIA_ROOT の外）、1ファイルの上限、未完了の保持秒数
+CHUNKED_UPLOAD_ROOT = os.environ.get('CHUNKED_UPLOAD_ROOT', str(BASE_DIR / 'chunked_uploads'))
+CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', 200 * 1024 * 1024))
+CHUNKED_UPLOAD_EXPIRE_SECONDS = int(os.environ.get('CHUNKED_UPLOAD_EXPIRE_SECONDS', 86400))
+# 提案画像: 原本は長辺 IMAGE_ORIGINAL_MAX_SIZE px に縮小し EXIF を除いて保存、一覧・承認画面用に中サイズとサムネイルを作る
+IMAGE_ORIGINAL_MAX_SIZE = int(os.environ.get('IMAGE_ORIGINAL_MAX_SIZE', 2560))
+IMAGE_MEDIUM_SIZE = int(os.environ.get('IMAGE_MEDIUM_SIZE', 1280))
+IMAGE_THUMBNAIL_SIZE = int(os.environ.get('IMAGE_THUMBNAIL_SIZE', 320))
+# 派生画像の形式（WEBP / JPEG）と画質
+IMAGE_VARIANT_FORMAT = os.environ.get('IMAGE_VARIANT_FORMAT', 'WEBP')
+IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', 80))
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 85))
+# 派生画像の作成を run_image_worker に任せる（False で提出リクエスト内で作成）
+IMAGE_PROCESSING_ASYNC = os.environ.get('IMAGE_PROCESSING_ASYNC', 'True') == 'True'
+IMAGE_JOB_MAX_ATTEMPTS = int(os.environ.get('IMAGE_JOB_MAX_ATTEMPTS', 3))
+IMAGE_JOB_STALE_SECONDS = int(os.environ.get('IMAGE_JOB_STALE_SECONDS', 600))
+# gc_image_blobs は作成・更新からこの秒数が経過した未参照ファイルだけを削除する（アップロード中のものを残す）
+IMAGE_BLOB_GC_GRACE_SECONDS = int(os.environ.get('IMAGE_BLOB_GC_GRACE_SECONDS', 86400))
 
 
 CORS_ALLOWED_ORIGINS = [
@@ -229,6 +255,39 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 20,
 }
 
+# 改善提案一覧のカーソルページング件数（?page_size= で上限まで変更可）
+PROPOSAL_LIST_PAGE_SIZE = int(os.environ.get('PROPOSAL_LIST_PAGE_SIZE', 50))
+PROPOSAL_LIST_MAX_PAGE_SIZE = int(os.environ.get('PROPOSAL_LIST_MAX_PAGE_SIZE', 500))
+# 全文検索（/api/improvement-proposals/search/）の既定件数
+PROPOSAL_SEARCH_LIMIT = int(os.environ.get('PROPOSAL_SEARCH_LIMIT', 50))
+# MySQL の ngram_token_size（これより短いキーワードは FULLTEXT で一致しないため部分一致で検索する）
+SEARCH_NGRAM_TOKEN_SIZE = int(os.environ.get('SEARCH_NGRAM_TOKEN_SIZE', 2))
+# 一括承認（bulk-approve）で1回に指定できる提案数
+BULK_APPROVAL_MAX_IDS = int(os.environ.get('BULK_APPROVAL_MAX_IDS', 500))
+# 分析ダッシュボードを集計テーブル（AnalyticsContribution）から返す（False で従来の pandas 集計）
+ANALYTICS_USE_AGGREGATES = os.environ.get('ANALYTICS_USE_AGGREGATES', 'True') == 'True'
+# 期別レポート（export）を openpyxl write-only で一時ファイルに書き出して配信する（False で従来の BytesIO）
+REPORT_EXPORT_STREAMING = os.environ.get('REPORT_EXPORT_STREAMING', 'True') == 'True'
+# レポート作成ジョブ（run_report_worker）の成果物保存先（MEDIA_ROOT の外＝直接公開しない）
+REPORT_ARTIFACT_ROOT = os.environ.get('REPORT_ARTIFACT_ROOT', str(BASE_DIR / 'report_artifacts'))
+# 作成中のまま停止したジョブを待機中に戻すまでの秒数
+REPORT_JOB_STALE_SECONDS = int(os.environ.get('REPORT_JOB_STALE_SECONDS', 1800))
+# 承認者ディレクトリ（通知先の解決）のキャッシュ秒数。キャッシュはプロセスごとで、保存時はシグナルで DB の版数を更新して無効にする
+APPROVER_DIRECTORY_TTL = int(os.environ.get('APPROVER_DIRECTORY_TTL', 300))
+# 参照データ（部署・在籍従業員の一覧）のキャッシュ秒数。版数は DB（CacheVersion）に置いて ETag として返し、保存時はシグナルで更新する
+# 一覧はプロセスごとのローカルメモリに版数付きのキーで保存する（REFERENCE_CACHE_BACKEND で共有キャッシュにすれば作成を1回にできる）
+REFERENCE_DATA_TTL = int(os.environ.get('REFERENCE_DATA_TTL', 300))
+REFERENCE_DATA_CACHE = 'reference'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    REFERENCE_DATA_CACHE: {
+        'BACKEND': os.environ.get('REFERENCE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('REFERENCE_CACHE_LOCATION', 'proposals-reference'),
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -253,6 +312,18 @@ EMAIL_USE_SSL = os.environ.get('EMAIL_USE_SSL', 'False') == 'True'
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER or 'noreply@example.com')
+
+# 通知メールは EmailOutbox に登録し send_outbox_mail ワーカーが送信する
+# EMAIL_BACKEND が SMTP 以外（console / locmem）のときは送信者ごとの SMTP 設定を使わずそのバックエンドに出力する
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 50))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
+# 再送間隔（秒）は RETRY_BASE × 2^(試行回数-1)、上限 RETRY_MAX
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 60))
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = int(os.environ.get('EMAIL_OUTBOX_RETRY_MAX_SECONDS', 3600))
+# 送信中のまま停止したメールを送信待ちに戻すまでの秒数
+EMAIL_OUTBOX_STALE_SECONDS = int(os.environ.get('EMAIL_OUTBOX_STALE_SECONDS', 600))
+# 承認依頼のまとめ送信: 宛先ごとに最初の依頼からこの秒数の間に届いた依頼を1通にまとめる（0 で1件ずつ即時）
+EMAIL_DIGEST_WINDOW_SECONDS = int(os.environ.get('EMAIL_DIGEST_WINDOW_SECONDS', 0))
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -10,10 +10,28 @@ from .models import (
     Proposal,
     ProposalApproval,
 )
+from .services import analytics as proposal_analytics
+from .services import department_tree
+from .services.workflow import refresh_stage_state
+
+
+class DepartmentAdminForm(forms.ModelForm):
+    """部署編集フォーム - 親に自身または配下の部署を選べないようにする"""
+
+    class Meta:
+        model = Department
+        fields = '__all__'
+
+    def clean_parent(self):
+        parent = self.cleaned_data.get('parent')
+        if department_tree.creates_cycle(Department(pk=self.instance.pk, parent=parent)):
+            raise forms.ValidationError(department_tree.CYCLE_ERROR)
+        return parent
 
 
 @admin.register(Department)
 class DepartmentAdmin(admin.ModelAdmin):
+    form = DepartmentAdminForm
     list_display = ("name", "level", "parent")
     search_fields = ("name",)
 
@@ -42,7 +60,7 @@ class EmployeeAdminForm(forms.ModelForm):
 
     class Meta:
         model = Employee
-        exclude = ['division', 'group', 'team']
+        exclude = ['division', 'group', 'team', 'group_department', 'team_department']
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -54,18 +72,9 @@ class EmployeeAdminForm(forms.ModelForm):
                     self.fields['division_dept'].initial = dept
                 except Department.DoesNotExist:
                     pass
-            if self.instance.group:
-                try:
-                    dept = Department.objects.get(name=self.instance.group, level='group')
-                    self.fields['group_dept'].initial = dept
-                except Department.DoesNotExist:
-                    pass
-            if self.instance.team:
-                try:
-                    dept = Department.objects.get(name=self.instance.team, level='team')
-                    self.fields['team_dept'].initial = dept
-                except Department.DoesNotExist:
-                    pass
+            # 係・班は解決済みの部署を優先（同名の係・班があっても選択を保つ）
+            self.fields['group_dept'].initial = self.instance.group_department
+            self.fields['team_dept'].initial = self.instance.team_department
 
     def save(self, commit=True):
         # ドロップダウンで選択された値をCharFieldに保存
@@ -74,8 +83,10 @@ class EmployeeAdminForm(forms.ModelForm):
             instance.division = self.cleaned_data['division_dept'].name
         if self.cleaned_data.get('group_dept'):
             instance.group = self.cleaned_data['group_dept'].name
+            instance.group_department = self.cleaned_data['group_dept']
         if self.cleaned_data.get('team_dept'):
             instance.team = self.cleaned_data['team_dept'].name
+            instance.team_department = self.cleaned_data['team_dept']
         if commit:
             instance.save()
         return instance
@@ -114,6 +125,10 @@ class ImprovementProposalAdmin(admin.ModelAdmin):
     search_fields = ("management_no", "proposer_name", "deployment_item")
     autocomplete_fields = ("department", "section", "group", "team", "proposer")
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        proposal_analytics.refresh_proposal(obj)
+
 
 @admin.register(ProposalApproval)
 class ProposalApprovalAdmin(admin.ModelAdmin):
@@ -127,6 +142,17 @@ class ProposalApprovalAdmin(admin.ModelAdmin):
     list_filter = ("stage", "status")
     autocomplete_fields = ("proposal", "confirmed_by")
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_stage_state(obj.proposal)
+        proposal_analytics.refresh_proposal(obj.proposal)
+
+    def delete_model(self, request, obj):
+        proposal = obj.proposal
+        super().delete_model(request, obj)
+        refresh_stage_state(proposal)
+        proposal_analytics.refresh_proposal(proposal)
+
 
 @admin.register(Proposal)
 class ProposalAdmin(admin.ModelAdmin):
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from proposals.models import ImprovementProposal, ProposalApproval
+from proposals.services.workflow import STAGE_STATE_FIELDS, compute_stage_state
+
+
+class Command(BaseCommand):
+    help = "ProposalApproval から改善提案の current_stage / current_status / is_completed を再計算する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="1トランザクションで更新する件数")
+        parser.add_argument("--dry-run", action="store_true", help="更新せず差分件数のみ表示する")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+
+        approvals: dict[int, list[ProposalApproval]] = {}
+        for approval in ProposalApproval.objects.only("proposal_id", "stage", "status").iterator():
+            approvals.setdefault(approval.proposal_id, []).append(approval)
+
+        changed = []
+        total = 0
+        queryset = ImprovementProposal.objects.only("id", *STAGE_STATE_FIELDS).order_by("id")
+        for proposal in queryset.iterator(chunk_size=batch_size):
+            total += 1
+            state = compute_stage_state(approvals.get(proposal.id, []))
+            if state == (proposal.current_stage, proposal.current_status, proposal.is_completed):
+                continue
+            proposal.current_stage, proposal.current_status, proposal.is_completed = state
+            changed.append(proposal)
+
+        if not dry_run:
+            for start in range(0, len(changed), batch_size):
+                with transaction.atomic():
+                    ImprovementProposal.objects.bulk_update(
+                        changed[start:start + batch_size], STAGE_STATE_FIELDS
+                    )
+
+        if dry_run:
+            self.stdout.write(f"{total}件中 {len(changed)}件が更新対象です（dry-run）")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{total}件中 {len(changed)}件を更新しました"))
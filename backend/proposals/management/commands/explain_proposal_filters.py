@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from proposals.views import ImprovementProposalViewSet
+
+# ImprovementProposalViewSet の一覧フィルター組み合わせ（{term} / {department} は実行時に置換）
+LIST_FILTER_COMBINATIONS = [
+    {},
+    {"view": "summary"},
+    {"department": "{department}"},
+    {"term": "{term}"},
+    {"term": "{term}", "quarter": "1"},
+    {"term": "{term}", "department": "{department}"},
+    {"proposal_classification": "優秀提案"},
+    {"submitted_at_from": "2025-10-01T00:00:00", "submitted_at_to": "2025-12-31T23:59:59"},
+    {"stage": "supervisor", "status": "pending"},
+    {"stage": "manager", "status": "pending"},
+    {"stage": "committee", "status": "approved"},
+    {"status": "completed"},
+    {"q": "改善"},
+    {"q": "改善", "search": "fulltext"},
+]
+
+
+class Command(BaseCommand):
+    help = "改善提案一覧・export・analytics の各フィルター組み合わせに EXPLAIN を実行し、フルスキャンを報告する（MySQL / SQLite）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--term", type=int, default=52, help="期フィルターに使う期")
+        parser.add_argument("--department", type=int, default=1, help="部門フィルターに使う部門ID")
+        parser.add_argument("--fail-on-scan", action="store_true", help="フルスキャンがあれば終了コード1で終了する")
+        parser.add_argument("--verbose-plan", action="store_true", help="全ての EXPLAIN 行を表示する")
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ("mysql", "sqlite"):
+            raise CommandError(f"MySQL / SQLite 用のコマンドです（現在: {connection.vendor}）")
+
+        substitutions = {"term": str(options["term"]), "department": str(options["department"])}
+        findings = []
+        for label, queryset in self._querysets(substitutions, options["term"]):
+            rows = self._explain(queryset)
+            scans = [row for row in rows if self._is_full_scan(row)]
+            status = self.style.ERROR("FULL SCAN") if scans else self.style.SUCCESS("ok")
+            self.stdout.write(f"[{status}] {label}")
+            for row in rows if options["verbose_plan"] else scans:
+                self.stdout.write(self._format(row))
+            if scans:
+                findings.append(label)
+
+        if findings:
+            self.stdout.write(self.style.WARNING(f"フルスキャン: {len(findings)}件"))
+            if options["fail_on_scan"]:
+                raise CommandError("full table scan detected: " + ", ".join(findings))
+        else:
+            self.stdout.write(self.style.SUCCESS("フルスキャンはありません"))
+
+    def _querysets(self, substitutions: dict[str, str], term_number: int):
+        factory = APIRequestFactory()
+        page_size = getattr(settings, "PROPOSAL_LIST_PAGE_SIZE", 50)
+        for combination in LIST_FILTER_COMBINATIONS:
+            params = {key: value.format(**substitutions) for key, value in combination.items()}
+            view = ImprovementProposalViewSet(action="list", format_kwarg=None)
+            view.request = Request(factory.get("/api/improvement-proposals/", params))
+            label = "list " + ("&".join(f"{k}={v}" for k, v in params.items()) or "(no filter)")
+            yield label, view.get_queryset()[:page_size]
+
+        view = ImprovementProposalViewSet(action="export", format_kwarg=None)
+        yield f"export term={term_number}", view._term_report_queryset(term_number)
+        yield (
+            f"analytics term={term_number}&month=4",
+            view._term_report_queryset(term_number).filter(submitted_at__month=4),
+        )
+
+    def _explain(self, queryset) -> list[dict]:
+        sql, params = queryset.query.sql_with_params()
+        explain = "EXPLAIN QUERY PLAN" if connection.vendor == "sqlite" else "EXPLAIN"
+        with connection.cursor() as cursor:
+            cursor.execute(f"{explain} {sql}", params)
+            columns = [col[0] for col in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _is_full_scan(row: dict) -> bool:
+        if connection.vendor == "sqlite":
+            # EXPLAIN QUERY PLAN の detail（例: "SCAN proposals_improvementproposal"）。索引を使う走査は除く
+            detail = str(row.get("detail") or "")
+            return detail.startswith("SCAN ") and "USING" not in detail and "CONSTANT ROW" not in detail
+        return str(row.get("type") or "").upper() == "ALL"
+
+    @staticmethod
+    def _format(row: dict) -> str:
+        if connection.vendor == "sqlite":
+            return f"    {row.get('detail')}"
+        return "    table={table} type={type} key={key} rows={rows} extra={Extra}".format(
+            **{key: row.get(key) for key in ("table", "type", "key", "rows", "Extra")}
+        )
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from proposals.services import chunked_uploads, image_blobs
+
+
+class Command(BaseCommand):
+    help = "参照されなくなった提案画像（参照数 0 の blob、削除された提案の画像など）と期限切れの分割アップロードを削除する"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-seconds", type=int, default=None, help="この秒数より新しいファイルは残す（既定 IMAGE_BLOB_GC_GRACE_SECONDS）"
+        )
+        parser.add_argument("--dry-run", action="store_true", help="削除せず対象の件数だけ表示する")
+
+    def handle(self, *args, **options):
+        result = image_blobs.collect_garbage(grace_seconds=options["grace_seconds"], dry_run=options["dry_run"])
+        label = "削除対象" if options["dry_run"] else "削除しました"
+        if not options["dry_run"]:
+            purged = chunked_uploads.purge_expired()
+            if purged:
+                self.stdout.write(f"期限切れの分割アップロードを {purged}件 削除しました")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{label}: blob {result.blobs}件 / ファイル {result.files}件（{result.bytes / 1024 / 1024:.1f} MB）"
+            )
+        )
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from proposals.services.employee_import import import_employees
+
+
+class Command(BaseCommand):
+    help = "従業員名簿（CSV）を従業員マスタに同期する（社員番号で差分を取り一括登録・更新）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", type=Path, help="取込む CSV ファイル")
+        parser.add_argument("--batch-size", type=int, default=500, help="1回の一括登録・更新で送る行数")
+        parser.add_argument("--encoding", default="utf-8-sig", help="CSV の文字コード")
+        parser.add_argument(
+            "--deactivate-missing",
+            action="store_true",
+            help="CSV に含まれない在籍中の従業員を無効（is_active=False）にする",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="反映せずに件数だけ確認する（最後にロールバック）")
+
+    def handle(self, *args, **options):
+        csv_path: Path = options["csv_path"]
+        if not csv_path.exists():
+            raise CommandError(f"{csv_path} が見つかりません")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size は1以上を指定してください")
+
+        started = time.monotonic()
+        result = import_employees(
+            csv_path,
+            deactivate_missing=options["deactivate_missing"],
+            dry_run=options["dry_run"],
+            batch_size=options["batch_size"],
+            encoding=options["encoding"],
+        )
+        elapsed = time.monotonic() - started
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        if result.duplicates:
+            self.stdout.write(f"{prefix}重複した社員番号（後の行を採用）: {', '.join(result.duplicates)}")
+        if result.unknown_departments:
+            self.stdout.write(
+                f"{prefix}未登録の部署（未設定として登録）: {', '.join(sorted(result.unknown_departments))}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}新規 {result.inserted}件 / 更新 {result.updated}件 / 変更なし {result.unchanged}件"
+                f" / 無効化 {result.deactivated}件（{elapsed:.1f}秒）"
+            )
+        )
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from proposals.services.jiseki_import import import_jiseki
+
+
+class Command(BaseCommand):
+    help = "過去実績（CSV）を改善提案として一括取込する（全段階承認済みとして登録）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", type=Path, help="取込む CSV ファイル")
+        parser.add_argument("--chunk-size", type=int, default=500, help="1トランザクションで登録する行数")
+        parser.add_argument("--encoding", default="utf-8-sig", help="CSV の文字コード")
+        parser.add_argument("--dry-run", action="store_true", help="登録せずに件数だけ確認する（最後にロールバック）")
+
+    def handle(self, *args, **options):
+        csv_path: Path = options["csv_path"]
+        if not csv_path.exists():
+            raise CommandError(f"{csv_path} が見つかりません")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size は1以上を指定してください")
+
+        started = time.monotonic()
+
+        def progress(done, total, result):
+            self.stdout.write(f"  {done}/{total} 行（登録 {result.created}件 / スキップ {result.skipped}件）")
+
+        result = import_jiseki(
+            csv_path,
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+            encoding=options["encoding"],
+            progress=progress,
+        )
+        elapsed = time.monotonic() - started
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        if result.departments_created:
+            self.stdout.write(f"{prefix}新規部署: {', '.join(result.departments_created)}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}{result.total}行中 {result.created}件を登録、{result.skipped}件をスキップしました（{elapsed:.1f}秒）"
+            )
+        )
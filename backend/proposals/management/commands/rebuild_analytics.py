@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from proposals.services import analytics
+
+
+class Command(BaseCommand):
+    help = "分析ダッシュボード用の集計テーブル（AnalyticsContribution）を再構築する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--term", type=int, action="append", help="再構築する期（複数指定可、省略時は全件）")
+        parser.add_argument("--pending", action="store_true", help="未構築の期だけを再構築する")
+
+    def handle(self, *args, **options):
+        terms = options["term"]
+        if options["pending"]:
+            terms = analytics.pending_terms()
+            if not terms:
+                self.stdout.write("未構築の期はありません")
+                return
+        if not terms:
+            created = analytics.rebuild_all()
+            self.stdout.write(self.style.SUCCESS(f"全期の集計行を {created}件 再構築しました"))
+            return
+
+        for term in terms:
+            created = analytics.rebuild_term(term)
+            self.stdout.write(self.style.SUCCESS(f"{term}期の集計行を {created}件 再構築しました"))
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from proposals.services import department_tree
+
+
+class Command(BaseCommand):
+    help = "部署の親子関係から階層の閉包テーブル（DepartmentClosure）を再構築する"
+
+    def handle(self, *args, **options):
+        count = department_tree.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"部署階層を再構築しました（{count}行）"))
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from proposals.services import image_jobs
+
+
+class Command(BaseCommand):
+    help = "提案画像の派生画像作成ジョブ（ImageJob）をプロセスプールで並列に処理する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="待機中のジョブを処理したら終了する")
+        parser.add_argument("--interval", type=float, default=2.0, help="ジョブがないときの待機秒数")
+        parser.add_argument(
+            "--processes", type=int, default=os.cpu_count() or 1, help="並列に処理するプロセス数（1 はプールを使わない）"
+        )
+        parser.add_argument("--batch-size", type=int, default=0, help="1回に取り出すジョブ数（既定はプロセス数の2倍）")
+        parser.add_argument("--backfill", action="store_true", help="派生画像のない既存画像のジョブを先に登録する")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        if processes < 1:
+            raise CommandError("--processes は1以上を指定してください")
+        batch_size = options["batch_size"] or processes * 2
+
+        requeued = image_jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"停止したジョブを {requeued}件 待機中に戻しました"))
+        if options["backfill"]:
+            self.stdout.write(f"既存画像のジョブを {image_jobs.enqueue_missing()}件 登録しました")
+
+        # 子プロセスは spawn（Windows）でも設定を読めるよう Django を初期化する
+        executor = ProcessPoolExecutor(max_workers=processes, initializer=django.setup) if processes > 1 else None
+        processed = succeeded = 0
+        try:
+            while True:
+                jobs = image_jobs.claim_batch(batch_size)
+                if not jobs:
+                    finished = image_jobs.finish_processed()
+                    if finished:
+                        self.stdout.write(f"変換済みの blob を参照する処理中の画像を {finished}件 完了にしました")
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+                    continue
+                processed += len(jobs)
+                succeeded += image_jobs.process(jobs, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"{processed}件のジョブを処理しました（完了 {succeeded}件）"))
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from proposals.models import ReportJob
+from proposals.services import analytics, report_jobs
+
+
+class Command(BaseCommand):
+    help = "期別実績レポートの作成ジョブ（ReportJob）を処理し、空き時間に未構築の分析集計を再構築する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="待機中のジョブを処理したら終了する")
+        parser.add_argument("--interval", type=float, default=5.0, help="ジョブがないときの待機秒数")
+        parser.add_argument("--max-jobs", type=int, default=0, help="処理するジョブの上限（0 は無制限）")
+
+    def handle(self, *args, **options):
+        requeued = report_jobs.requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"停止したジョブを {requeued}件 待機中に戻しました"))
+
+        processed = 0
+        max_jobs = options["max_jobs"]
+        while not max_jobs or processed < max_jobs:
+            job = report_jobs.claim_next_job()
+            if job is None:
+                # 部署・従業員の変更で未構築に戻った期は1期ずつ再構築する（その間ダッシュボードは従来の集計）
+                rebuilt = analytics.rebuild_pending_terms(limit=1)
+                if rebuilt:
+                    self.stdout.write(self.style.SUCCESS(f"{rebuilt[0]}期の分析集計を再構築しました"))
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+
+            job = report_jobs.run_job(job)
+            processed += 1
+            if job.status == ReportJob.Status.SUCCEEDED:
+                self.stdout.write(self.style.SUCCESS(f"{job.term}期のレポートを作成しました（job {job.pk}）"))
+            else:
+                self.stdout.write(self.style.ERROR(f"{job.term}期のレポート作成に失敗しました（job {job.pk}）: {job.error}"))
+
+        self.stdout.write(f"{processed}件のジョブを処理しました")
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from proposals.services import digest, mail_outbox
+
+
+class Command(BaseCommand):
+    help = "送信箱（EmailOutbox）の通知メールを送信する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="送信期限を迎えたメールを送信したら終了する")
+        parser.add_argument("--interval", type=float, default=5.0, help="送信待ちがないときの待機秒数")
+        parser.add_argument("--batch-size", type=int, default=None, help="1回に取り出す件数（既定は EMAIL_OUTBOX_BATCH_SIZE）")
+
+    def handle(self, *args, **options):
+        requeued = mail_outbox.requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f"送信中のまま停止したメールを {requeued}件 送信待ちに戻しました"))
+
+        total_claimed = 0
+        total_sent = 0
+        while True:
+            # まとめ期間を過ぎた宛先の承認依頼をまとめメールにしてから送信する
+            digest.flush_due()
+            claimed, sent = mail_outbox.deliver_pending(options["batch_size"])
+            total_claimed += claimed
+            total_sent += sent
+            if claimed:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"{total_claimed}件中 {total_sent}件のメールを送信しました"))
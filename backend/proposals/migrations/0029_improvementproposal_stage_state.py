@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:11
+
+from django.db import migrations, models
+
+STAGE_ORDER = ["supervisor", "chief", "manager", "committee"]
+
+
+def backfill_stage_state(apps, schema_editor):
+    ImprovementProposal = apps.get_model("proposals", "ImprovementProposal")
+    ProposalApproval = apps.get_model("proposals", "ProposalApproval")
+    statuses: dict[int, dict[str, str]] = {}
+    for proposal_id, stage, status in ProposalApproval.objects.values_list("proposal_id", "stage", "status"):
+        statuses.setdefault(proposal_id, {})[stage] = status
+
+    to_update = []
+    for proposal in ImprovementProposal.objects.only("id").iterator():
+        stage_map = statuses.get(proposal.id, {})
+        proposal.current_stage, proposal.current_status, proposal.is_completed = "completed", "approved", True
+        for stage in STAGE_ORDER:
+            status = stage_map.get(stage, "pending")
+            if status != "approved":
+                proposal.current_stage, proposal.current_status, proposal.is_completed = stage, status, False
+                break
+        to_update.append(proposal)
+    ImprovementProposal.objects.bulk_update(
+        to_update, ["current_stage", "current_status", "is_completed"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0028_alter_reduction_hours_precision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='improvementproposal',
+            name='current_stage',
+            field=models.CharField(default='supervisor', editable=False, max_length=20, verbose_name='現在の承認段階'),
+        ),
+        migrations.AddField(
+            model_name='improvementproposal',
+            name='current_status',
+            field=models.CharField(default='pending', editable=False, max_length=20, verbose_name='現在段階のステータス'),
+        ),
+        migrations.AddField(
+            model_name='improvementproposal',
+            name='is_completed',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='承認完了'),
+        ),
+        migrations.AddIndex(
+            model_name='improvementproposal',
+            index=models.Index(fields=['current_stage', 'current_status'], name='improvement_stage_status_idx'),
+        ),
+        migrations.RunPython(backfill_stage_state, migrations.RunPython.noop),
+    ]
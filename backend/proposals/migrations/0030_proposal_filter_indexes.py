@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0029_improvementproposal_stage_state'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='improvementproposal',
+            index=models.Index(fields=['submitted_at', 'id'], name='improvement_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='improvementproposal',
+            index=models.Index(fields=['term', 'submitted_at'], name='improvement_term_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='improvementproposal',
+            index=models.Index(fields=['term', 'quarter'], name='improvement_term_quarter_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='improvementproposal',
+            index=models.Index(fields=['department', 'submitted_at'], name='improvement_dept_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='improvementproposal',
+            index=models.Index(fields=['proposal_classification'], name='improvement_proposal_cls_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='improvementproposal',
+            index=models.Index(fields=['committee_classification'], name='improvement_committee_cls_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposalapproval',
+            index=models.Index(fields=['stage', 'status'], name='approval_stage_status_idx'),
+        ),
+    ]
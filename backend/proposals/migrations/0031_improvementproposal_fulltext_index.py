@@ -0,0 +1,32 @@
+from django.db import migrations
+
+TABLE = "proposals_improvementproposal"
+INDEX_NAME = "improvement_fulltext_idx"
+COLUMNS = ("deployment_item", "problem_summary", "improvement_plan", "improvement_result", "effect_details")
+
+
+def add_fulltext_index(apps, schema_editor):
+    # FULLTEXT + ngram parser は MySQL 専用（日本語の部分一致検索用）
+    if schema_editor.connection.vendor != "mysql":
+        return
+    columns = ", ".join(f"`{column}`" for column in COLUMNS)
+    schema_editor.execute(
+        f"ALTER TABLE `{TABLE}` ADD FULLTEXT INDEX `{INDEX_NAME}` ({columns}) WITH PARSER ngram"
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(f"ALTER TABLE `{TABLE}` DROP INDEX `{INDEX_NAME}`")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("proposals", "0030_proposal_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0031_improvementproposal_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.IntegerField(unique=True, verbose_name='期')),
+                ('rebuilt_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnalyticsContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.IntegerField(verbose_name='期')),
+                ('month', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='月')),
+                ('department_name', models.CharField(max_length=100, verbose_name='部署')),
+                ('person_name', models.CharField(max_length=128, verbose_name='提案者')),
+                ('filter_department', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_primary', models.BooleanField(default=False)),
+                ('count_share', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='件数按分')),
+                ('mindset_score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('idea_score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('hint_score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('points_share', models.DecimalField(decimal_places=2, default=0, max_digits=8, verbose_name='提案ポイント按分')),
+                ('reduction_hours', models.DecimalField(decimal_places=2, default=0, max_digits=8, verbose_name='削減時間(Hr/月)')),
+                ('effect_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='効果額(円/月)')),
+                ('proposal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics_rows', to='proposals.improvementproposal')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'month'], name='analytics_term_month_idx'), models.Index(fields=['term', 'filter_department'], name='analytics_term_dept_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0034_email_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailoutbox',
+            name='kind',
+            field=models.CharField(choices=[('submission', '提出通知'), ('approval', '承認依頼'), ('digest', '承認依頼まとめ')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ApprovalNotice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254, verbose_name='宛先')),
+                ('stage', models.CharField(choices=[('supervisor', '監督者'), ('chief', '係長'), ('manager', '部門長'), ('committee', '改善委員')], max_length=20, verbose_name='承認待ちの段階')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('outbox', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notices', to='proposals.emailoutbox')),
+                ('proposal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='approval_notices', to='proposals.improvementproposal')),
+                ('sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='approval_notices', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['outbox', 'recipient', 'created_at'], name='approval_notice_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0035_approval_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='キー')),
+                ('value', models.BigIntegerField(default=0, verbose_name='払い出し済みの値')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
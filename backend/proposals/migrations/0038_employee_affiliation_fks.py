@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_affiliations(apps, schema_editor):
+    Department = apps.get_model("proposals", "Department")
+    Employee = apps.get_model("proposals", "Employee")
+    by_name = {
+        (level, name): pk
+        for pk, level, name in Department.objects.filter(level__in=("group", "team")).values_list("id", "level", "name")
+    }
+    to_update = []
+    for employee in Employee.objects.only("id", "group", "team").iterator():
+        employee.group_department_id = by_name.get(("group", employee.group.strip()))
+        employee.team_department_id = by_name.get(("team", employee.team.strip()))
+        if employee.group_department_id or employee.team_department_id:
+            to_update.append(employee)
+    Employee.objects.bulk_update(to_update, ["group_department", "team_department"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0037_department_closure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='group_department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='group_employees', to='proposals.department', verbose_name='係（部署）'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='team_department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='team_employees', to='proposals.department', verbose_name='班（部署）'),
+        ),
+        migrations.RunPython(backfill_affiliations, migrations.RunPython.noop),
+    ]
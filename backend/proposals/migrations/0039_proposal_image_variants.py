@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0038_employee_affiliation_fks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposalimage',
+            name='medium_path',
+            field=models.CharField(blank=True, max_length=255, verbose_name='中サイズ画像パス'),
+        ),
+        migrations.AddField(
+            model_name='proposalimage',
+            name='thumbnail_path',
+            field=models.CharField(blank=True, max_length=255, verbose_name='サムネイル画像パス'),
+        ),
+    ]
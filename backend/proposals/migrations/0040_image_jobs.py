@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0039_proposal_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposalimage',
+            name='status',
+            field=models.CharField(choices=[('processing', '処理中'), ('ready', '完了'), ('failed', '処理失敗')], default='ready', max_length=20, verbose_name='処理状況'),
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', '待機中'), ('running', '処理中'), ('succeeded', '完了'), ('failed', '失敗')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='試行回数')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='proposals.proposalimage')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='image_job_status_idx')],
+            },
+        ),
+    ]
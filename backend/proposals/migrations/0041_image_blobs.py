@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-17 09:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0040_image_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('path', models.CharField(max_length=255, verbose_name='原本パス')),
+                ('medium_path', models.CharField(blank=True, max_length=255, verbose_name='中サイズ画像パス')),
+                ('thumbnail_path', models.CharField(blank=True, max_length=255, verbose_name='サムネイル画像パス')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='アップロードサイズ')),
+                ('is_processed', models.BooleanField(default=False)),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='参照数')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['ref_count', 'created_at'], name='image_blob_refcount_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='proposalimage',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='images', to='proposals.imageblob'),
+        ),
+    ]
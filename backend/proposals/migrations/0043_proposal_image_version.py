@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 10:28
+
+from django.db import migrations, models
+
+
+def backfill_blob_versions(apps, schema_editor):
+    # 変換済みの blob の画像は内容のハッシュを版にする（blob 導入前の画像は空のまま＝再検証）
+    ImageBlob = apps.get_model("proposals", "ImageBlob")
+    ProposalImage = apps.get_model("proposals", "ProposalImage")
+    for blob_id, sha256 in ImageBlob.objects.filter(is_processed=True).values_list("id", "sha256").iterator():
+        ProposalImage.objects.filter(blob_id=blob_id, status="ready").update(version=sha256[:12])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0042_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposalimage',
+            name='version',
+            field=models.CharField(blank=True, max_length=16, verbose_name='画像の版'),
+        ),
+        migrations.RunPython(backfill_blob_versions, migrations.RunPython.noop),
+    ]
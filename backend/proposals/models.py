@@ -1,8 +1,26 @@
+import uuid
+
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
 
+class DepartmentQuerySet(models.QuerySet):
+    def descendants_of(self, department, include_self: bool = True):
+        """指定部署の配下（既定で自身を含む）。DepartmentClosure との1回の結合で引く。"""
+        queryset = self.filter(ancestor_links__ancestor_id=getattr(department, "pk", department))
+        if not include_self:
+            queryset = queryset.filter(ancestor_links__depth__gt=0)
+        return queryset
+
+    def ancestors_of(self, department, include_self: bool = True):
+        """指定部署の上位部署（既定で自身を含む）。"""
+        queryset = self.filter(descendant_links__descendant_id=getattr(department, "pk", department))
+        if not include_self:
+            queryset = queryset.filter(descendant_links__depth__gt=0)
+        return queryset
+
+
 class Department(models.Model):
     """部門/課/係/班などの組織階層を表す."""
 
@@ -24,6 +42,8 @@ class Department(models.Model):
         related_name="children",
     )
 
+    objects = DepartmentQuerySet.as_manager()
+
     class Meta:
         unique_together = ("name", "level")
         ordering = ["display_id", "name"]
@@ -33,6 +53,26 @@ class Department(models.Model):
         return f"{prefix}:{self.name}"
 
 
+class DepartmentClosure(models.Model):
+    """部署階層の閉包テーブル（上位部署, 配下部署, 階層差）。自身への行（depth=0）を含む。
+
+    Department の保存・削除シグナル（proposals.signals）で services.department_tree が維持する。
+    """
+
+    ancestor = models.ForeignKey(Department, on_delete=models.CASCADE, related_name="descendant_links")
+    descendant = models.ForeignKey(Department, on_delete=models.CASCADE, related_name="ancestor_links")
+    depth = models.PositiveIntegerField("階層差")
+
+    class Meta:
+        unique_together = ("ancestor", "descendant")
+        indexes = [
+            models.Index(fields=["descendant", "depth"], name="department_closure_desc_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.ancestor_id}->{self.descendant_id} ({self.depth})"
+
+
 class Proposal(models.Model):
     """改善提案と多段階承認のステータスを表す."""
 
@@ -159,6 +199,23 @@ class Employee(models.Model):
     division = models.CharField("事業部/課", max_length=100, blank=True)
     group = models.CharField("係", max_length=100, blank=True)
     team = models.CharField("班", max_length=100, blank=True)
+    # group / team の名称に対応する係・班の部署（保存時に services.affiliations が名称から解決する）
+    group_department = models.ForeignKey(
+        Department,
+        verbose_name="係（部署）",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="group_employees",
+    )
+    team_department = models.ForeignKey(
+        Department,
+        verbose_name="班（部署）",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="team_employees",
+    )
     position = models.CharField(max_length=100, blank=True)
     role = models.CharField(max_length=20, choices=Role.choices, default=Role.STAFF)
     employment_type = models.CharField(
@@ -271,6 +328,10 @@ class ImprovementProposal(models.Model):
     hint_score = models.PositiveSmallIntegerField("みんなのヒント", null=True, blank=True)
     before_image_path = models.CharField("改善前画像", max_length=255, blank=True)
     after_image_path = models.CharField("改善後画像", max_length=255, blank=True)
+    # ProposalApproval から算出した承認状況（services.workflow.refresh_stage_state で更新）
+    current_stage = models.CharField("現在の承認段階", max_length=20, default="supervisor", editable=False)
+    current_status = models.CharField("現在段階のステータス", max_length=20, default="pending", editable=False)
+    is_completed = models.BooleanField("承認完了", default=False, db_index=True, editable=False)
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -283,6 +344,18 @@ class ImprovementProposal(models.Model):
 
     class Meta:
         ordering = ["-submitted_at", "-created_at"]
+        indexes = [
+            models.Index(fields=["current_stage", "current_status"], name="improvement_stage_status_idx"),
+            # 一覧の既定順（カーソルページング）と提出日範囲
+            models.Index(fields=["submitted_at", "id"], name="improvement_submitted_idx"),
+            # 期フィルター: term=N OR (term IS NULL AND submitted_at BETWEEN ...)
+            models.Index(fields=["term", "submitted_at"], name="improvement_term_submitted_idx"),
+            models.Index(fields=["term", "quarter"], name="improvement_term_quarter_idx"),
+            models.Index(fields=["department", "submitted_at"], name="improvement_dept_submitted_idx"),
+            # 判定フィルター: proposal_classification OR committee_classification（index merge）
+            models.Index(fields=["proposal_classification"], name="improvement_proposal_cls_idx"),
+            models.Index(fields=["committee_classification"], name="improvement_committee_cls_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.management_no} - {self.proposer_name}"
@@ -371,11 +444,40 @@ class ProposalApproval(models.Model):
     class Meta:
         unique_together = ("proposal", "stage")
         ordering = ["proposal_id", "stage"]
+        indexes = [
+            models.Index(fields=["stage", "status"], name="approval_stage_status_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.proposal.management_no} / {self.stage}"
 
 
+class ImageBlob(models.Model):
+    """アップロード内容の SHA-256 をキーにした画像ファイル（同じ写真は1ファイルを共有する）。
+
+    ref_count は参照する ProposalImage の数。0 になったものは gc_image_blobs が削除する。
+    """
+
+    sha256 = models.CharField("SHA-256", max_length=64, unique=True)
+    path = models.CharField("原本パス", max_length=255)
+    medium_path = models.CharField("中サイズ画像パス", max_length=255, blank=True)
+    thumbnail_path = models.CharField("サムネイル画像パス", max_length=255, blank=True)
+    size = models.PositiveBigIntegerField("アップロードサイズ", default=0)
+    # 派生画像の作成（build_variants）が済んでいれば、同じ内容の再アップロードはそのまま使う
+    is_processed = models.BooleanField(default=False)
+    ref_count = models.PositiveIntegerField("参照数", default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["ref_count", "created_at"], name="image_blob_refcount_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.sha256[:12]} ({self.ref_count})"
+
+
 class ProposalImage(models.Model):
     """改善提案に紐づく複数画像を保持する。"""
 
@@ -383,6 +485,11 @@ class ProposalImage(models.Model):
         BEFORE = "before", "改善前"
         AFTER = "after", "改善後"
 
+    class Status(models.TextChoices):
+        PROCESSING = "processing", "処理中"
+        READY = "ready", "完了"
+        FAILED = "failed", "処理失敗"
+
     proposal = models.ForeignKey(
         ImprovementProposal,
         on_delete=models.CASCADE,
@@ -390,6 +497,15 @@ class ProposalImage(models.Model):
     )
     kind = models.CharField(max_length=10, choices=Kind.choices)
     image_path = models.CharField("画像パス", max_length=255)
+    # 処理中はアップロードのまま（image_path）を表示し、run_image_worker が派生画像を作ると完了になる
+    status = models.CharField("処理状況", max_length=20, choices=Status.choices, default=Status.READY)
+    # services.images.build_variants が作る派生画像（空なら原本を表示）
+    medium_path = models.CharField("中サイズ画像パス", max_length=255, blank=True)
+    thumbnail_path = models.CharField("サムネイル画像パス", max_length=255, blank=True)
+    # 内容で重複排除したファイル（空は blob 導入前の proposals/<管理No>/ 配下のファイル）
+    blob = models.ForeignKey(ImageBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="images")
+    # URL の ?v=（services.media.image_version を書込時に保存）。空は処理中・不明で毎回再検証させる
+    version = models.CharField("画像の版", max_length=16, blank=True)
     display_order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -400,6 +516,74 @@ class ProposalImage(models.Model):
         return f"{self.proposal.management_no} {self.kind} #{self.display_order}"
 
 
+class ImageJob(models.Model):
+    """提案画像の派生画像作成ジョブ。提出時に登録し、run_image_worker がプロセスプールで処理する。"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "待機中"
+        RUNNING = "running", "処理中"
+        SUCCEEDED = "succeeded", "完了"
+        FAILED = "failed", "失敗"
+
+    image = models.ForeignKey(ProposalImage, on_delete=models.CASCADE, related_name="jobs")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField("試行回数", default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="image_job_status_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"image {self.image_id} ({self.get_status_display()})"
+
+
+class ChunkedUpload(models.Model):
+    """再開可能な分割アップロード。チャンクは CHUNKED_UPLOAD_ROOT の一時ファイルに直接追記し、
+    全体の SHA-256 を確かめてから提案に画像として添付する。
+    """
+
+    class Status(models.TextChoices):
+        UPLOADING = "uploading", "受信中"
+        COMPLETE = "complete", "受信完了"
+        ATTACHED = "attached", "添付済み"
+        FAILED = "failed", "検証失敗"
+
+    # 推測できない ID をアップロードの再開・添付の鍵にする
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField("ファイル名", max_length=255)
+    size = models.PositiveBigIntegerField("サイズ")
+    sha256 = models.CharField("SHA-256", max_length=64)
+    offset = models.PositiveBigIntegerField("受信済みバイト数", default=0)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.UPLOADING)
+    image = models.ForeignKey(
+        ProposalImage, on_delete=models.SET_NULL, null=True, blank=True, related_name="uploads"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="chunked_uploads",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "updated_at"], name="chunked_upload_status_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+
 class UserProfile(models.Model):
     """ユーザーの役職・担当部署情報."""
 
@@ -505,3 +689,213 @@ class UserPermission(models.Model):
         return f"{self.user.username} - {self.resource}"
 
 
+class AnalyticsContribution(models.Model):
+    """分析ダッシュボード用の集計元行（委員承認済み提案 × 共同提案者）。
+
+    services.analytics が提案の承認・共同提案者の変更時に提案単位で洗い替える。
+    """
+
+    proposal = models.ForeignKey(
+        ImprovementProposal,
+        on_delete=models.CASCADE,
+        related_name="analytics_rows",
+    )
+    term = models.IntegerField("期")
+    month = models.PositiveSmallIntegerField("月", null=True, blank=True)
+    department_name = models.CharField("部署", max_length=100)
+    person_name = models.CharField("提案者", max_length=128)
+    # 部門フィルター（共同提案者ベース）で一致させる部署名。共同提案者なしの行は NULL
+    filter_department = models.CharField(max_length=100, null=True, blank=True)
+    is_primary = models.BooleanField(default=False)
+    count_share = models.DecimalField("件数按分", max_digits=5, decimal_places=2)
+    mindset_score = models.PositiveSmallIntegerField(null=True, blank=True)
+    idea_score = models.PositiveSmallIntegerField(null=True, blank=True)
+    hint_score = models.PositiveSmallIntegerField(null=True, blank=True)
+    points_share = models.DecimalField("提案ポイント按分", max_digits=8, decimal_places=2, default=0)
+    reduction_hours = models.DecimalField("削減時間(Hr/月)", max_digits=8, decimal_places=2, default=0)
+    effect_amount = models.DecimalField("効果額(円/月)", max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["term", "month"], name="analytics_term_month_idx"),
+            models.Index(fields=["term", "filter_department"], name="analytics_term_dept_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.term}期 {self.department_name} {self.person_name}"
+
+
+class AnalyticsTerm(models.Model):
+    """AnalyticsContribution を全件再構築済みの期。"""
+
+    term = models.IntegerField("期", unique=True)
+    rebuilt_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.term}期"
+
+
+class ReportDataVersion(models.Model):
+    """期別レポートのデータ版数。レポート成果物のキャッシュキーに使う。
+
+    term=0 は全期共通（部署・従業員の変更）の版数。
+    """
+
+    GLOBAL_TERM = 0
+
+    term = models.IntegerField("期", unique=True)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.term}期 v{self.version}"
+
+
+class CacheVersion(models.Model):
+    """プロセスごとのキャッシュの版数。
+
+    各プロセスは版数をキャッシュキーに含め、データの変更時に版数を更新して全プロセスのキャッシュを一斉に無効にする。
+    版数は連番ではなく毎回新しいトークンにする（ロールバックで戻った版数が別の内容で再利用されないように）。
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    version = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} v{self.version}"
+
+
+class ReportJob(models.Model):
+    """期別実績レポート（Excel）の非同期作成ジョブ。"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "待機中"
+        RUNNING = "running", "作成中"
+        SUCCEEDED = "succeeded", "完了"
+        FAILED = "failed", "失敗"
+
+    term = models.IntegerField("期")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    data_version = models.CharField("データ版数", max_length=32)
+    file_path = models.CharField("成果物パス", max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="report_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="report_job_status_idx"),
+            models.Index(fields=["term", "data_version"], name="report_job_version_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.term}期 ({self.get_status_display()})"
+
+
+class EmailOutbox(models.Model):
+    """送信待ちの通知メール。業務データと同じトランザクションで登録し、send_outbox_mail が送信する。"""
+
+    class Kind(models.TextChoices):
+        SUBMISSION = "submission", "提出通知"
+        APPROVAL = "approval", "承認依頼"
+        DIGEST = "digest", "承認依頼まとめ"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "送信待ち"
+        SENDING = "sending", "送信中"
+        SENT = "sent", "送信済み"
+        FAILED = "failed", "送信失敗"
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    subject = models.CharField("件名", max_length=255)
+    body = models.TextField("本文")
+    recipients = models.JSONField("宛先", default=list)
+    # 送信者の SMTP 設定（UserProfile）は送信時に参照する（パスワードを複製しない）
+    sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="outbox_emails",
+    )
+    proposal = models.ForeignKey(
+        ImprovementProposal,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="outbox_emails",
+    )
+    attempts = models.PositiveSmallIntegerField("送信試行回数", default=0)
+    next_attempt_at = models.DateTimeField("次回送信日時", default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="email_outbox_due_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.subject} ({self.get_status_display()})"
+
+
+class ApprovalNotice(models.Model):
+    """まとめ送信待ちの承認依頼（宛先ごと）。送信時に同じ宛先の依頼を1通のメールにまとめる。"""
+
+    recipient = models.EmailField("宛先")
+    proposal = models.ForeignKey(
+        ImprovementProposal,
+        on_delete=models.CASCADE,
+        related_name="approval_notices",
+    )
+    stage = models.CharField("承認待ちの段階", max_length=20, choices=ProposalApproval.Stage.choices)
+    sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="approval_notices",
+    )
+    # まとめメールに含めた時点で設定する（未設定＝送信待ち）
+    outbox = models.ForeignKey(
+        EmailOutbox,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="notices",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["outbox", "recipient", "created_at"], name="approval_notice_pending_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.recipient}: {self.proposal_id} ({self.get_stage_display()})"
+
+
+class Sequence(models.Model):
+    """採番カウンター（キーごとに最後に払い出した値）。services.sequences が行ロックして加算する。"""
+
+    key = models.CharField("キー", max_length=64, unique=True)
+    value = models.BigIntegerField("払い出し済みの値", default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.key}={self.value}"
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProposalCursorPagination(BasePagination):
+    """改善提案一覧用のキーセット(submitted_at, id)カーソルページネーション。
+
+    カーソルは前ページ最後の行の (submitted_at, id) で、次ページは
+    ``submitted_at < t OR (submitted_at = t AND id < pk)`` の条件で improvement_submitted_idx を
+    範囲走査する（同じ提出日時が続いても OFFSET にならない）。前方向のみ。
+    ``?page_size=all`` を指定した場合は従来通り全件を配列で返す。
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    unpaginated_value = "all"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self):
+        self.page_size = getattr(settings, "PROPOSAL_LIST_PAGE_SIZE", 50)
+        self.max_page_size = getattr(settings, "PROPOSAL_LIST_MAX_PAGE_SIZE", 500)
+        self.next_position = None
+        self.request = None
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    @staticmethod
+    def encode_cursor(submitted_at: datetime, pk: int) -> str:
+        raw = f"{submitted_at.isoformat()}|{pk}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, request) -> tuple[datetime, int] | None:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+            submitted_at, pk = raw.rsplit("|", 1)
+            return datetime.fromisoformat(submitted_at), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.page_size_query_param) == self.unpaginated_value:
+            return None
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by("-submitted_at", "-id")
+        position = self.decode_cursor(request)
+        if position is not None:
+            submitted_at, pk = position
+            queryset = queryset.filter(Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__lt=pk))
+        # 1件多く取り、次ページの有無を判定する
+        rows = list(queryset[: page_size + 1])
+        page = rows[:page_size]
+        self.next_position = (page[-1].submitted_at, page[-1].pk) if len(rows) > page_size else None
+        return page
+
+    def get_next_link(self) -> str | None:
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -7,11 +7,14 @@ import logging
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
 
 from .models import (
+    ChunkedUpload,
     Department,
+    EmailOutbox,
     Employee,
     UserProfile,
     UserPermission,
@@ -19,22 +22,26 @@ from .models import (
     ProposalContributor,
     ProposalApproval,
     ProposalImage,
+    ReportJob,
 )
 from .services import fiscal
 from .services.identifiers import generate_management_no
-from .services.images import save_proposal_image
+from .services import analytics as proposal_analytics
+from .services import approvers, chunked_uploads, department_tree, image_jobs, mail_outbox, media, reference_data, sequences
+from .services.workflow import refresh_stage_state
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
-def build_media_url(request, path: str | None) -> str:
+def build_media_url(request, path: str | None, version: str = "") -> str:
     """Return absolute media URL for stored relative image paths."""
     if not path:
         return ""
     if isinstance(path, str) and path.startswith("http"):
         return path
-    media_path = f"{settings.MEDIA_URL.rstrip('/')}/{str(path).lstrip('/')}"
+    # 版（ProposalImage.version）を ?v= に付け、内容が変われば URL も変わる。署名付き配信では /api/media/ の URL になる
+    media_path = media.media_path(path, version)
     # By default return a relative media path so the frontend will resolve
     # the host (origin). This avoids returning localhost/127.0.0.1 hosts
     # when the API server is behind a proxy or run locally.
@@ -43,6 +50,17 @@ def build_media_url(request, path: str | None) -> str:
     return request.build_absolute_uri(media_path) if request else media_path
 
 
+class FieldProjectionMixin:
+    """``fields`` 引数で指定されたフィールドのみを出力する。"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class DepartmentSerializer(serializers.ModelSerializer):
     parent_name = serializers.CharField(source="parent.name", read_only=True)
 
@@ -50,6 +68,13 @@ class DepartmentSerializer(serializers.ModelSerializer):
         model = Department
         fields = ["id", "name", "level", "display_id", "parent", "parent_name"]
 
+    def validate_parent(self, value):
+        if value is not None and self.instance is not None and (
+            Department.objects.descendants_of(self.instance).filter(pk=value.pk).exists()
+        ):
+            raise serializers.ValidationError(department_tree.CYCLE_ERROR)
+        return value
+
 
 class UserProfileSerializer(serializers.ModelSerializer):
     responsible_department_detail = DepartmentSerializer(source="responsible_department", read_only=True)
@@ -223,12 +248,15 @@ class EmployeeSerializer(serializers.ModelSerializer):
             "division",
             "group",
             "team",
+            "group_department",
+            "team_department",
             "joined_on",
             "department",
             "department_detail",
             "permissions",
         ]
-        read_only_fields = ("is_active",)
+        # 係・班の部署は group / team の名称から保存時に解決する
+        read_only_fields = ("is_active", "group_department", "team_department")
 
 
 class ProposalContributorSerializer(serializers.ModelSerializer):
@@ -279,22 +307,66 @@ class ProposalApprovalSerializer(serializers.ModelSerializer):
 
 class ProposalImageSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
+    medium_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
     filename = serializers.SerializerMethodField()
 
     class Meta:
         model = ProposalImage
-        fields = ["id", "kind", "image_path", "display_order", "url", "filename", "created_at"]
+        fields = [
+            "id", "kind", "image_path", "status", "display_order", "url", "medium_url", "thumbnail_url", "filename",
+            "created_at",
+        ]
         read_only_fields = fields
 
     def get_url(self, obj):
         request = self.context.get("request")
-        return build_media_url(request, obj.image_path)
+        return build_media_url(request, obj.image_path, obj.version)
+
+    def get_medium_url(self, obj):
+        # 派生画像がない（取込済みの旧画像など）場合は原本
+        return build_media_url(self.context.get("request"), obj.medium_path or obj.image_path, obj.version)
+
+    def get_thumbnail_url(self, obj):
+        return build_media_url(
+            self.context.get("request"), obj.thumbnail_path or obj.medium_path or obj.image_path, obj.version
+        )
 
     def get_filename(self, obj):
         return Path(obj.image_path).name
 
 
-class ImprovementProposalSerializer(serializers.ModelSerializer):
+class ProposalStageStatusMixin:
+    """承認段階ごとのステータスを prefetch 済みの approvals から算出する。"""
+
+    def _get_approvals(self, obj: ImprovementProposal):
+        approvals = getattr(obj, '_prefetched_objects_cache', {}).get('approvals')
+        if approvals is None:
+            approvals = list(obj.approvals.all())
+        return approvals
+
+    def get_supervisor_status(self, obj: ImprovementProposal) -> str:
+        approvals = self._get_approvals(obj)
+        approval = next((a for a in approvals if a.stage == ProposalApproval.Stage.SUPERVISOR), None)
+        return approval.status if approval else ProposalApproval.Status.PENDING
+
+    def get_chief_status(self, obj: ImprovementProposal) -> str:
+        approvals = self._get_approvals(obj)
+        approval = next((a for a in approvals if a.stage == ProposalApproval.Stage.CHIEF), None)
+        return approval.status if approval else ProposalApproval.Status.PENDING
+
+    def get_manager_status(self, obj: ImprovementProposal) -> str:
+        approvals = self._get_approvals(obj)
+        approval = next((a for a in approvals if a.stage == ProposalApproval.Stage.MANAGER), None)
+        return approval.status if approval else ProposalApproval.Status.PENDING
+
+    def get_committee_status(self, obj: ImprovementProposal) -> str:
+        approvals = self._get_approvals(obj)
+        approval = next((a for a in approvals if a.stage == ProposalApproval.Stage.COMMITTEE), None)
+        return approval.status if approval else ProposalApproval.Status.PENDING
+
+
+class ImprovementProposalSerializer(FieldProjectionMixin, ProposalStageStatusMixin, serializers.ModelSerializer):
     department_detail = DepartmentSerializer(source="department", read_only=True)
     section_detail = DepartmentSerializer(source="section", read_only=True)
     group_detail = DepartmentSerializer(source="group", read_only=True)
@@ -306,8 +378,6 @@ class ImprovementProposalSerializer(serializers.ModelSerializer):
     images = ProposalImageSerializer(many=True, read_only=True)
     before_images = serializers.SerializerMethodField()
     after_images = serializers.SerializerMethodField()
-    current_stage = serializers.SerializerMethodField()
-    is_completed = serializers.SerializerMethodField()
     term = serializers.SerializerMethodField()
     quarter = serializers.SerializerMethodField()
     supervisor_status = serializers.SerializerMethodField()
@@ -434,14 +504,24 @@ class ImprovementProposalSerializer(serializers.ModelSerializer):
         errors = {}
         current = self.instance or ImprovementProposal()
 
-        def check_level(value: Department | None, expected: str, field: str):
-            if value and value.level != expected:
+        levels: dict[int, str] = {}
+
+        def check_level(field: str, expected: str):
+            if field in attrs:
+                level = attrs[field].level if attrs[field] else None
+            else:
+                # 更新時の既存の部署はキャッシュ済みの対応表で確認する（部署を1件ずつ読み込まない）
+                department_id = getattr(current, f"{field}_id", None)
+                if department_id and not levels:
+                    levels.update(reference_data.department_levels())
+                level = levels.get(department_id)
+            if level and level != expected:
                 errors[field] = f"{field} must be a {expected} level department"
 
-        check_level(attrs.get("department", getattr(current, "department", None)), "division", "department")
-        check_level(attrs.get("section", getattr(current, "section", None)), "section", "section")
-        check_level(attrs.get("group", getattr(current, "group", None)), "group", "group")
-        check_level(attrs.get("team", getattr(current, "team", None)), "team", "team")
+        check_level("department", "division")
+        check_level("section", "section")
+        check_level("group", "group")
+        check_level("team", "team")
 
         quarter = attrs.get("quarter")
         if quarter is not None and quarter not in {1, 2, 3, 4}:
@@ -470,14 +550,8 @@ class ImprovementProposalSerializer(serializers.ModelSerializer):
         for idx, file_obj in enumerate(files):
             logger.info(f"[_save_images] Processing file {idx}: {file_obj.name if hasattr(file_obj, 'name') else 'no name'}")
             try:
-                saved_path = save_proposal_image(file_obj, proposal.management_no, kind, suffix=str(idx + 1))
+                saved_path = image_jobs.attach(proposal, file_obj, kind, idx).image_path
                 logger.info(f"[_save_images] Saved to: {saved_path}")
-                ProposalImage.objects.create(
-                    proposal=proposal,
-                    kind=kind,
-                    image_path=saved_path,
-                    display_order=idx,
-                )
                 saved_paths.append(saved_path)
             except Exception as e:
                 logger.error(f"[_save_images] Error saving file {idx}: {e}", exc_info=True)
@@ -495,7 +569,12 @@ class ImprovementProposalSerializer(serializers.ModelSerializer):
             {
                 "id": img.id,
                 "path": img.image_path,
-                "url": build_media_url(request, img.image_path),
+                "url": build_media_url(request, img.image_path, img.version),
+                "medium_url": build_media_url(request, img.medium_path or img.image_path, img.version),
+                "thumbnail_url": build_media_url(
+                    request, img.thumbnail_path or img.medium_path or img.image_path, img.version
+                ),
+                "status": img.status,
                 "filename": Path(img.image_path).name,
                 "order": img.display_order,
             }
@@ -631,9 +710,8 @@ class ImprovementProposalSerializer(serializers.ModelSerializer):
         logger.warning(f"[_load_contributors] Unexpected data type, returning None")
         return None
 
+    @transaction.atomic
     def create(self, validated_data):
-        from django.core.mail import send_mail
-
         before_image = validated_data.pop("before_image", None)
         after_image = validated_data.pop("after_image", None)
         contributors_payload = getattr(self, '_raw_contributors', None)
@@ -691,12 +769,14 @@ class ImprovementProposalSerializer(serializers.ModelSerializer):
         logger.info(f"[create] Saved contributors count in DB: {saved_count}")
         for stage, _ in ProposalApproval.Stage.choices:
             ProposalApproval.objects.get_or_create(proposal=proposal, stage=stage)
+        refresh_stage_state(proposal)
 
-        # 提案提出時に上司へメール送信
-        self._send_submission_email(proposal)
+        # 提案提出時の上司への通知は送信箱に登録する（送信は send_outbox_mail ワーカー）
+        self._queue_submission_email(proposal)
 
         return proposal
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         before_image = validated_data.pop("before_image", None)
         after_image = validated_data.pop("after_image", None)
@@ -737,160 +817,61 @@ class ImprovementProposalSerializer(serializers.ModelSerializer):
             proposal.save(update_fields=updated_fields)
         if normalized_contributors is not None:
             self._sync_contributors(proposal, normalized_contributors)
+        if "serial_number" in validated_data and proposal.term and proposal.serial_number:
+            # 手入力の通し番号を以降の自動採番と重複させない
+            sequences.ensure_serial_at_least(proposal.term, proposal.serial_number)
+        proposal_analytics.refresh_proposal(proposal)
         return proposal
 
-    def _get_approvals(self, obj: ImprovementProposal):
-        approvals = getattr(obj, '_prefetched_objects_cache', {}).get('approvals')
-        if approvals is None:
-            approvals = list(obj.approvals.all())
-        return approvals
-
-    def get_current_stage(self, obj: ImprovementProposal) -> str:
-        approvals = self._get_approvals(obj)
-        pending = next((a for a in approvals if a.status == ProposalApproval.Status.PENDING), None)
-        return pending.stage if pending else 'completed'
-
-    def get_is_completed(self, obj: ImprovementProposal) -> bool:
-        approvals = self._get_approvals(obj)
-        return all(a.status == ProposalApproval.Status.APPROVED for a in approvals)
-
     def get_term(self, obj: ImprovementProposal) -> int:
         return obj.term
 
     def get_quarter(self, obj: ImprovementProposal) -> int:
         return obj.quarter
 
-    def get_supervisor_status(self, obj: ImprovementProposal) -> str:
-        approvals = self._get_approvals(obj)
-        approval = next((a for a in approvals if a.stage == ProposalApproval.Stage.SUPERVISOR), None)
-        return approval.status if approval else ProposalApproval.Status.PENDING
-
-    def get_chief_status(self, obj: ImprovementProposal) -> str:
-        approvals = self._get_approvals(obj)
-        approval = next((a for a in approvals if a.stage == ProposalApproval.Stage.CHIEF), None)
-        return approval.status if approval else ProposalApproval.Status.PENDING
-
-    def get_manager_status(self, obj: ImprovementProposal) -> str:
-        approvals = self._get_approvals(obj)
-        approval = next((a for a in approvals if a.stage == ProposalApproval.Stage.MANAGER), None)
-        return approval.status if approval else ProposalApproval.Status.PENDING
-
-    def get_committee_status(self, obj: ImprovementProposal) -> str:
-        approvals = self._get_approvals(obj)
-        approval = next((a for a in approvals if a.stage == ProposalApproval.Stage.COMMITTEE), None)
-        return approval.status if approval else ProposalApproval.Status.PENDING
-
     def get_before_images(self, obj: ImprovementProposal):
         return self._get_images_for_kind(obj, ProposalImage.Kind.BEFORE)
 
     def get_after_images(self, obj: ImprovementProposal):
         return self._get_images_for_kind(obj, ProposalImage.Kind.AFTER)
 
+    @staticmethod
+    def _path_version(instance: ImprovementProposal, path: str | None) -> str:
+        """代表画像パスと同じ画像の版（prefetch 済みの images から引く）。"""
+        if not path:
+            return ""
+        images = getattr(instance, '_prefetched_objects_cache', {}).get('images')
+        if images is None:
+            images = instance.images.all()
+        return next((image.version for image in images if image.image_path == path), "")
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         request = self.context.get("request")
-        data["before_image_path"] = build_media_url(request, data.get("before_image_path"))
-        data["after_image_path"] = build_media_url(request, data.get("after_image_path"))
-        if not data.get("before_image_path") and data.get("before_images"):
-            data["before_image_path"] = data["before_images"][0].get("url") or ""
-        if not data.get("after_image_path") and data.get("after_images"):
-            data["after_image_path"] = data["after_images"][0].get("url") or ""
+        for kind in ("before", "after"):
+            path_key = f"{kind}_image_path"
+            if path_key not in data:
+                continue
+            path = data.get(path_key)
+            data[path_key] = build_media_url(request, path, self._path_version(instance, path))
+            if not data.get(path_key) and data.get(f"{kind}_images"):
+                data[path_key] = data[f"{kind}_images"][0].get("url") or ""
         return data
 
-    def _get_smtp_connection_for_user(self, user):
-        """指定されたユーザーのSMTP設定を使用してメール接続を作成"""
-        from django.core.mail import get_connection
-
-        if not user:
-            logger.info("[mail] no user -> default SMTP from=%s", settings.DEFAULT_FROM_EMAIL)
-            return get_connection(fail_silently=False), settings.DEFAULT_FROM_EMAIL
-
-        try:
-            # ユーザープロファイルからSMTP設定を取得
-            if hasattr(user, 'profile') and user.profile:
-                profile = user.profile
-
-                # SMTP設定が全て揃っているか確認
-                if (profile.smtp_host and profile.smtp_user and
-                    profile.smtp_password and user.email):
-
-                    # ユーザーのSMTP設定を使用して接続を作成
-                    # 開発環境では暗号化なしで接続（TLSをオフ）
-                    connection = get_connection(
-                        backend='django.core.mail.backends.smtp.EmailBackend',
-                        host=profile.smtp_host,
-                        port=profile.smtp_port or 587,
-                        username=profile.smtp_user,
-                        password=profile.smtp_password,
-                        use_tls=False,  # 開発環境では証明書エラーを回避するためFalse
-                        fail_silently=False,
-                    )
-                    from_email = user.email
-                    logger.info(
-                        "[mail] use user SMTP user=%s host=%s port=%s from=%s",
-                        getattr(user, "username", None),
-                        profile.smtp_host,
-                        profile.smtp_port or 587,
-                        from_email,
-                    )
-                    return connection, from_email
-        except Exception as e:
-            logger.error("Error getting SMTP settings for user %s: %s", getattr(user, "username", None), e)
-
-        # フォールバック: デフォルト設定を使用
-        logger.warning(
-            "[mail] fallback default SMTP for user=%s from=%s",
-            getattr(user, "username", None),
-            settings.DEFAULT_FROM_EMAIL,
-        )
-        return get_connection(fail_silently=False), settings.DEFAULT_FROM_EMAIL
-
-    def _send_submission_email(self, proposal):
-        """Send submission email to the appropriate supervisor."""
-        from django.core.mail import EmailMessage, get_connection
-        from django.db.models import Q
-        from .models import UserProfile
-
+    def _queue_submission_email(self, proposal):
+        """Queue submission email to the appropriate supervisor."""
         # Find supervisors in order: team -> group -> department
-        role_dept_chain = []
-        if proposal.team:
-            role_dept_chain.append(("supervisor", proposal.team))
-        if proposal.group:
-            role_dept_chain.append(("chief", proposal.group))
-        if proposal.department:
-            role_dept_chain.append(("manager", proposal.department))
-
+        role, dept, recipient_list = approvers.submission_recipients(proposal)
         logger.info(
-            "[mail] submit proposal id=%s mgmt_no=%s proposer=%s dept_chain=%s",
+            "[mail] submit proposal id=%s mgmt_no=%s proposer=%s role=%s dept_id=%s dept_name=%s recipients=%s",
             proposal.id,
             proposal.management_no,
             proposal.proposer_name,
-            [(r, getattr(d, "id", None), getattr(d, "name", None)) for r, d in role_dept_chain],
+            role,
+            getattr(dept, "id", None),
+            getattr(dept, "name", None),
+            recipient_list,
         )
-
-        recipient_list = []
-        for role, dept in role_dept_chain:
-            # proposals_userprofile テーブルから管轄者を検索
-            # auth_user.email からメールアドレスを取得
-            profiles_query = Q(role=role, responsible_department=dept) | Q(role='admin')
-            profiles = UserProfile.objects.filter(
-                profiles_query,
-                user__isnull=False,
-                user__is_active=True,
-                user__email__isnull=False
-            ).exclude(user__email__exact='').select_related('user')
-
-            recipient_list = [profile.user.email for profile in profiles if profile.user and profile.user.email]
-            logger.info(
-                "[mail] role=%s dept_id=%s dept_name=%s recipients=%s (from UserProfile table)",
-                role,
-                getattr(dept, "id", None),
-                getattr(dept, "name", None),
-                recipient_list,
-            )
-            if recipient_list:
-                break
-
         if not recipient_list:
             logger.warning("[mail] no recipients found for proposal id=%s", proposal.id)
             return  # No recipients, skip sending
@@ -917,38 +898,95 @@ class ImprovementProposalSerializer(serializers.ModelSerializer):
         http://10.0.1.232:8503/approval-center
         """
 
-        try:
-            # ログインしているユーザー（created_by）のSMTP設定を使用
-            # auth_user → proposals_userprofile から smtp_host, smtp_user, smtp_password を取得
-            login_user = proposal.created_by
-            logger.info(
-                "[mail] login_user=%s (created_by)",
-                getattr(login_user, 'username', None) if login_user else None
-            )
+        # 送信時にログインユーザー（created_by）の SMTP 設定を使用する
+        mail_outbox.enqueue(
+            EmailOutbox.Kind.SUBMISSION,
+            subject,
+            message,
+            recipient_list,
+            sender=proposal.created_by,
+            proposal=proposal,
+        )
+        logger.info("[mail] queued submission email to=%s", recipient_list)
+
+class ImprovementProposalSummarySerializer(FieldProjectionMixin, ProposalStageStatusMixin, serializers.ModelSerializer):
+    """一覧画面向けの軽量シリアライザー（本文・画像・共同提案者を含まない）。"""
+
+    # ImprovementProposalViewSet が .only() で読み込むカラム
+    QUERYSET_ONLY = (
+        "id",
+        "management_no",
+        "submitted_at",
+        "department__id",
+        "department__name",
+        "section__id",
+        "section__name",
+        "group__id",
+        "group__name",
+        "team__id",
+        "team__name",
+        "deployment_item",
+        "proposer_id",
+        "proposer_name",
+        "reduction_hours",
+        "effect_amount",
+        "proposal_classification",
+        "committee_classification",
+        "classification_points",
+        "term",
+        "quarter",
+        "serial_number",
+        "current_stage",
+        "is_completed",
+        "created_at",
+        "updated_at",
+    )
 
-            connection, from_email = self._get_smtp_connection_for_user(login_user)
+    department_name = serializers.CharField(source="department.name", read_only=True)
+    section_name = serializers.CharField(source="section.name", read_only=True, default="")
+    group_name = serializers.CharField(source="group.name", read_only=True, default="")
+    team_name = serializers.CharField(source="team.name", read_only=True, default="")
+    supervisor_status = serializers.SerializerMethodField()
+    chief_status = serializers.SerializerMethodField()
+    manager_status = serializers.SerializerMethodField()
+    committee_status = serializers.SerializerMethodField()
 
-            # Fall back to default connection if user-specific SMTP is missing
-            if not connection:
-                connection = get_connection(fail_silently=False)
-                from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "")
-                logger.warning(
-                    "[mail] SMTP not configured for login_user=%s; using default from=%s",
-                    getattr(login_user, "username", None) if login_user else None,
-                    from_email,
-                )
+    class Meta:
+        model = ImprovementProposal
+        fields = [
+            "id",
+            "management_no",
+            "submitted_at",
+            "department",
+            "department_name",
+            "section",
+            "section_name",
+            "group",
+            "group_name",
+            "team",
+            "team_name",
+            "deployment_item",
+            "proposer",
+            "proposer_name",
+            "reduction_hours",
+            "effect_amount",
+            "proposal_classification",
+            "committee_classification",
+            "classification_points",
+            "term",
+            "quarter",
+            "serial_number",
+            "created_at",
+            "updated_at",
+            "current_stage",
+            "is_completed",
+            "supervisor_status",
+            "chief_status",
+            "manager_status",
+            "committee_status",
+        ]
+        read_only_fields = fields
 
-            email = EmailMessage(
-                subject=subject,
-                body=message,
-                from_email=from_email,
-                to=recipient_list,
-                connection=connection,
-            )
-            email.send(fail_silently=False)
-            logger.info("[mail] sent submission email to=%s from=%s", recipient_list, from_email)
-        except Exception as e:
-            logger.error("Error sending submission email: %s", e)
 
 class ApprovalActionSerializer(serializers.Serializer):
     stage = serializers.ChoiceField(choices=ProposalApproval.Stage.choices)
@@ -1001,3 +1039,75 @@ class ApprovalActionSerializer(serializers.Serializer):
             if sdgs_flag is None or safety_flag is None:
                 raise serializers.ValidationError('sdgs_flag and safety_flag are required at manager approval')
         return attrs
+
+
+class BulkApprovalActionSerializer(ApprovalActionSerializer):
+    """同じ承認内容を複数の提案に適用する（一括承認）。"""
+
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+
+    def validate_ids(self, value):
+        limit = getattr(settings, "BULK_APPROVAL_MAX_IDS", 500)
+        if len(value) > limit:
+            raise serializers.ValidationError(f"at most {limit} ids can be approved at once")
+        return list(dict.fromkeys(value))
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source="get_status_display", read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            "id",
+            "term",
+            "status",
+            "status_display",
+            "data_version",
+            "error",
+            "download_url",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj: ReportJob) -> str:
+        if obj.status != ReportJob.Status.SUCCEEDED or not obj.file_path:
+            return ""
+        request = self.context.get("request")
+        path = f"/api/report-jobs/{obj.pk}/download/"
+        return request.build_absolute_uri(path) if request else path
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    """分割アップロードの開始（filename / size / sha256）と受信状況。"""
+
+    status_display = serializers.CharField(source="get_status_display", read_only=True)
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ["id", "filename", "size", "sha256", "offset", "status", "status_display", "image", "created_at"]
+        read_only_fields = ["id", "offset", "status", "status_display", "image", "created_at"]
+
+    def validate_size(self, value):
+        limit = chunked_uploads.max_size()
+        if value <= 0 or value > limit:
+            raise serializers.ValidationError(f"1〜{limit}バイトで指定してください")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.strip().lower()
+        if len(value) != 64 or any(ch not in "0123456789abcdef" for ch in value):
+            raise serializers.ValidationError("SHA-256 の16進文字列（64文字）を指定してください")
+        return value
+
+    def create(self, validated_data):
+        request = self.context.get("request")
+        return chunked_uploads.create(user=getattr(request, "user", None), **validated_data)
+
+
+class ChunkedUploadAttachSerializer(serializers.Serializer):
+    proposal = serializers.PrimaryKeyRelatedField(queryset=ImprovementProposal.objects.all())
+    kind = serializers.ChoiceField(choices=ProposalImage.Kind.choices)
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from django.db.models import Q
+
+from proposals.models import Department, Employee
+
+# 従業員の係・班（group / team の名称）を Department の行（level が group / team のもの）に解決する。
+# 部署名は階層ごとに一意のため、別の階層の同名部署（例: 係と同名の班）とは取り違えない。
+
+AFFILIATION_LEVELS = ("group", "team")
+
+
+class AffiliationResolver:
+    """係・班の部署を1回で読み込み、名称から部署IDを引く。"""
+
+    def __init__(self, names: list[tuple[str, str]] | None = None):
+        # names を指定するとその (階層, 名称) の部署だけを読み込む（従業員1件の保存用）
+        departments = Department.objects.filter(level__in=AFFILIATION_LEVELS)
+        if names is not None:
+            condition = Q()
+            for level, name in names:
+                condition |= Q(level=level, name=name)
+            if not condition:
+                self.by_name: dict[tuple[str, str], int] = {}
+                return
+            departments = departments.filter(condition)
+        self.by_name = {
+            (level, name): pk for pk, level, name in departments.values_list("id", "level", "name")
+        }
+
+    @classmethod
+    def for_employee(cls, employee: Employee) -> "AffiliationResolver":
+        """従業員1件の係・班の名称に一致する部署だけを引く（名称が空なら問い合わせない）。"""
+        names = [(level, (getattr(employee, level) or "").strip()) for level in AFFILIATION_LEVELS]
+        return cls([(level, name) for level, name in names if name])
+
+    def resolve(self, level: str, name: str) -> int | None:
+        return self.by_name.get((level, (name or "").strip()))
+
+    def assign(self, employee: Employee) -> list[str]:
+        """group / team の名称から係・班の部署を設定し、変更した列名を返す。"""
+        changed = []
+        for field_name, level in (("group_department", "group"), ("team_department", "team")):
+            department_id = self.resolve(level, getattr(employee, level))
+            if department_id != getattr(employee, f"{field_name}_id"):
+                setattr(employee, f"{field_name}_id", department_id)
+                changed.append(field_name)
+        return changed
+
+
+def relink(department: Department) -> int:
+    """係・班の部署の作成・名称や階層の変更後に、従業員の所属をその部署に付け替え、更新件数を返す。"""
+    updated = 0
+    for level in AFFILIATION_LEVELS:
+        field_name = f"{level}_department"
+        linked = Employee.objects.filter(**{field_name: department})
+        if department.level == level:
+            # 名称が一致する従業員を付け、名称変更で一致しなくなった従業員を外す
+            updated += (
+                Employee.objects.filter(**{level: department.name})
+                .exclude(**{f"{field_name}_id": department.pk})
+                .update(**{field_name: department})
+            )
+            linked = linked.exclude(**{level: department.name})
+        updated += linked.update(**{field_name: None})
+    return updated
@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Iterable
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from proposals.models import (
+    AnalyticsContribution,
+    AnalyticsTerm,
+    ImprovementProposal,
+    ProposalApproval,
+    ReportDataVersion,
+)
+from proposals.services import fiscal, report_jobs
+from proposals.services.reports import (
+    _share_weights,
+    _to_decimal,
+    department_month_frame,
+    person_summary_frame,
+    term_report_queryset,
+)
+
+# 分析ダッシュボードは委員承認済み提案を共同提案者単位に展開した AnalyticsContribution を
+# 期ごとに集計する（reports.get_analytics_summary の pandas 集計と同じ結果になる）。
+ZERO = Decimal("0")
+CENT = Decimal("0.01")
+
+
+def _is_committee_approved(proposal: ImprovementProposal) -> bool:
+    return any(
+        a.stage == ProposalApproval.Stage.COMMITTEE and a.status == ProposalApproval.Status.APPROVED
+        for a in proposal.approvals.all()
+    )
+
+
+def build_rows(proposal: ImprovementProposal) -> list[AnalyticsContribution]:
+    """提案1件を集計元行に展開する（build_summary_dataframe / build_person_summary と同じ規則）。"""
+    submitted_at = (
+        proposal.submitted_at.astimezone(timezone.get_current_timezone()) if proposal.submitted_at else None
+    )
+    term = proposal.term or (fiscal.fiscal_term(submitted_at) if submitted_at else None)
+    if term is None:
+        return []
+
+    approvals = {a.stage: a for a in proposal.approvals.all()}
+    manager_approval = approvals.get(ProposalApproval.Stage.MANAGER)
+    committee_approval = approvals.get(ProposalApproval.Stage.COMMITTEE)
+    mindset = getattr(committee_approval, "mindset_score", None) or getattr(manager_approval, "mindset_score", None)
+    idea = getattr(committee_approval, "idea_score", None) or getattr(manager_approval, "idea_score", None)
+    hint = getattr(committee_approval, "hint_score", None) or getattr(manager_approval, "hint_score", None)
+
+    dept_default = (proposal.department.name if proposal.department else "") or "未設定"
+    person_default = proposal.proposer_name or "未設定"
+    reduction = _to_decimal(proposal.reduction_hours) or ZERO
+    effect = _to_decimal(proposal.effect_amount) or ZERO
+    total_points = _to_decimal(proposal.classification_points) or ZERO
+    common = {
+        "proposal": proposal,
+        "term": term,
+        "month": submitted_at.month if submitted_at else None,
+        "mindset_score": mindset,
+        "idea_score": idea,
+        "hint_score": hint,
+    }
+
+    contributors = list(proposal.contributors.all())
+    if not contributors:
+        return [
+            AnalyticsContribution(
+                department_name=dept_default,
+                person_name=person_default,
+                filter_department=None,
+                is_primary=True,
+                count_share=Decimal("1"),
+                points_share=total_points,
+                reduction_hours=reduction,
+                effect_amount=effect,
+                **common,
+            )
+        ]
+
+    rows = []
+    for contrib, share_ratio in zip(contributors, _share_weights(contributors)):
+        employee = contrib.employee
+        if employee:
+            filter_department = getattr(getattr(employee, "department", None), "name", None)
+        else:
+            filter_department = (proposal.department.name if proposal.department else None)
+        points_share = _to_decimal(contrib.classification_points_share)
+        if points_share is None:
+            points_share = (total_points / Decimal(len(contributors))).quantize(CENT, rounding=ROUND_HALF_UP)
+        rows.append(
+            AnalyticsContribution(
+                department_name=getattr(getattr(employee, "department", None), "name", None) or dept_default,
+                person_name=getattr(employee, "name", None) or person_default,
+                filter_department=filter_department,
+                is_primary=contrib.is_primary,
+                count_share=share_ratio,
+                points_share=points_share,
+                reduction_hours=reduction if contrib.is_primary else ZERO,
+                effect_amount=effect if contrib.is_primary else ZERO,
+                **common,
+            )
+        )
+    return rows
+
+
+def _with_relations(queryset):
+    return queryset.select_related("department").prefetch_related(
+        "approvals", "contributors__employee__department"
+    )
+
+
+@transaction.atomic
+def refresh_proposal(proposal: ImprovementProposal | int) -> None:
+    """提案1件の集計元行を洗い替える（承認・編集・共同提案者の変更後に呼ぶ）。"""
+    refresh_proposals([proposal if isinstance(proposal, int) else proposal.pk])
+
+
+def refresh_proposals(proposal_ids: Iterable[int]) -> None:
+    """複数提案の集計元行をまとめて洗い替える（一括承認など）。"""
+    proposal_ids = list(proposal_ids)
+    if not proposal_ids:
+        return
+    existing = AnalyticsContribution.objects.filter(proposal_id__in=proposal_ids)
+    terms = set(existing.values_list("term", flat=True))
+    existing.delete()
+    rows = []
+    for instance in _with_relations(ImprovementProposal.objects.filter(pk__in=proposal_ids)):
+        if _is_committee_approved(instance):
+            rows.extend(build_rows(instance))
+    AnalyticsContribution.objects.bulk_create(rows, batch_size=1000)
+    terms.update(row.term for row in rows)
+    if terms:
+        # 期別レポートのキャッシュ（report_jobs）も無効にする
+        report_jobs.bump_data_version(terms)
+
+
+def _rebuild(proposals: Iterable[ImprovementProposal], term_number: int | None = None) -> int:
+    rows = []
+    for proposal in proposals:
+        for row in build_rows(proposal):
+            if term_number is None or row.term == term_number:
+                rows.append(row)
+    AnalyticsContribution.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+@transaction.atomic
+def rebuild_term(term_number: int) -> int:
+    """指定期の集計元行を全件再構築し、構築済みとして記録する。"""
+    proposals = _with_relations(term_report_queryset(term_number).distinct())
+    AnalyticsContribution.objects.filter(
+        Q(term=term_number) | Q(proposal__in=proposals.values("pk"))
+    ).delete()
+    created = _rebuild(proposals.iterator(chunk_size=500), term_number)
+    AnalyticsTerm.objects.update_or_create(term=term_number)
+    return created
+
+
+@transaction.atomic
+def rebuild_all() -> int:
+    """全ての委員承認済み提案の集計元行を再構築する。"""
+    AnalyticsContribution.objects.all().delete()
+    proposals = _with_relations(
+        ImprovementProposal.objects.filter(
+            approvals__stage=ProposalApproval.Stage.COMMITTEE,
+            approvals__status=ProposalApproval.Status.APPROVED,
+        ).distinct()
+    )
+    created = _rebuild(proposals.iterator(chunk_size=500))
+    for term in AnalyticsContribution.objects.values_list("term", flat=True).distinct():
+        AnalyticsTerm.objects.update_or_create(term=term)
+    return created
+
+
+def invalidate_terms() -> None:
+    """部署名・従業員の所属変更時に全期を未構築に戻す（run_report_worker が期単位で再構築）。"""
+    AnalyticsTerm.objects.all().delete()
+    report_jobs.bump_data_version()
+
+
+def is_built(term_number: int) -> bool:
+    return AnalyticsTerm.objects.filter(term=term_number).exists()
+
+
+def pending_terms() -> list[int]:
+    """集計元行または版数のある期のうち、再構築済みでない期（新しい期から）。"""
+    terms = set(AnalyticsContribution.objects.values_list("term", flat=True).distinct())
+    terms.update(
+        ReportDataVersion.objects.exclude(term=ReportDataVersion.GLOBAL_TERM).values_list("term", flat=True)
+    )
+    terms.difference_update(AnalyticsTerm.objects.values_list("term", flat=True))
+    return sorted(terms, reverse=True)
+
+
+def rebuild_pending_terms(limit: int | None = None) -> list[int]:
+    """未構築の期を再構築し、再構築した期を返す（リクエスト処理の外で呼ぶ）。"""
+    terms = pending_terms()[:limit]
+    for term in terms:
+        rebuild_term(term)
+    return terms
+
+
+def _decimal(value: Any) -> Decimal:
+    return (_to_decimal(value) or ZERO).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def get_analytics_summary(
+    term_number: int,
+    department_filter: str | None = None,
+    month: int | None = None,
+) -> dict[str, Any]:
+    """集計元行から分析ダッシュボードのデータを返す（reports.get_analytics_summary と同じ形式）。
+
+    再構築済み（is_built）の期でのみ正しい結果になる。未構築の期は呼び出し元が従来の集計に切り替える。
+    """
+    rows = AnalyticsContribution.objects.filter(term=term_number)
+    if month:
+        rows = rows.filter(month=month)
+    if department_filter:
+        # 部門フィルター時は対象部門の共同提案者のみ（共同提案者なしの提案は対象外）
+        rows = rows.filter(filter_department=department_filter)
+    if not rows.exists():
+        return {"person_summary": [], "department_summary": []}
+
+    decimal_field = DecimalField(max_digits=20, decimal_places=4)
+
+    def weighted(score: str):
+        return Sum(F(score) * F("count_share"), output_field=decimal_field)
+
+    def weight(score: str):
+        return Sum("count_share", filter=Q(**{f"{score}__isnull": False}))
+
+    person_rows = rows.values("department_name", "person_name").annotate(
+        count=Sum("count_share"),
+        mindset_sum=weighted("mindset_score"),
+        mindset_w=weight("mindset_score"),
+        idea_sum=weighted("idea_score"),
+        idea_w=weight("idea_score"),
+        hint_sum=weighted("hint_score"),
+        hint_w=weight("hint_score"),
+        proposal_points=Sum("points_share"),
+        reduction=Sum("reduction_hours"),
+        effect=Sum("effect_amount"),
+    )
+    summary = {
+        (row["department_name"], row["person_name"]): {
+            key: _decimal(row[key])
+            for key in (
+                "count", "mindset_sum", "mindset_w", "idea_sum", "idea_w",
+                "hint_sum", "hint_w", "proposal_points", "reduction", "effect",
+            )
+        }
+        for row in person_rows.order_by()
+    }
+
+    month_numbers = fiscal.fiscal_month_sequence()
+    dept_totals: dict[str, dict[int, Decimal]] = defaultdict(lambda: {m: ZERO for m in month_numbers})
+    month_rows = (
+        rows.filter(month__isnull=False)
+        .values("department_name", "month")
+        .annotate(count=Coalesce(Sum("count_share"), ZERO, output_field=decimal_field))
+        .order_by()
+    )
+    for row in month_rows:
+        dept_totals[row["department_name"]][row["month"]] += _decimal(row["count"])
+
+    return {
+        "person_summary": person_summary_frame(summary).to_dict(orient="records"),
+        "department_summary": department_month_frame(dept_totals).to_dict(orient="records"),
+    }
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from heapq import merge
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from proposals.models import Department, ImprovementProposal, ProposalApproval, UserProfile
+from proposals.services import cache_versions
+
+# 承認者ディレクトリ: (役職, 担当部署ID) → 通知先メールアドレス。
+# 有効なユーザーのプロファイルを1クエリで読み込み、DB の版数（CacheVersion）をキーに含めてプロセスごとにキャッシュする。
+# UserProfile / User / Department の保存・削除シグナル（proposals.signals）で版数を更新し、全プロセスのキャッシュを無効にする。
+
+CACHE_KEY = "proposals:approver_directory"
+VERSION_NAME = "approvers:directory"
+ADMIN_ROLE = "admin"
+
+# 提出時の通知先: 班長（班）→ 係長（係）→ 部門長（部）の順に最初に見つかった管轄者
+SUBMISSION_CHAIN = (("supervisor", "team"), ("chief", "group"), ("manager", "department"))
+
+
+def _load_directory() -> dict[tuple[str, int | None], list[tuple[int, str]]]:
+    directory: dict[tuple[str, int | None], list[tuple[int, str]]] = {}
+    rows = (
+        UserProfile.objects.filter(user__is_active=True, user__email__isnull=False)
+        .exclude(user__email__exact="")
+        .order_by("pk")
+        .values_list("pk", "role", "responsible_department_id", "user__email")
+    )
+    for pk, role, department_id, email in rows:
+        directory.setdefault((role, department_id), []).append((pk, email))
+    return directory
+
+
+def _cache_key() -> str:
+    return f"{CACHE_KEY}:{cache_versions.current(VERSION_NAME)[VERSION_NAME]}"
+
+
+def get_directory() -> dict[tuple[str, int | None], list[tuple[int, str]]]:
+    key = _cache_key()
+    directory = cache.get(key)
+    if directory is None:
+        directory = _load_directory()
+        cache.set(key, directory, getattr(settings, "APPROVER_DIRECTORY_TTL", 300))
+    return directory
+
+
+def invalidate() -> None:
+    """版数を更新する（保存と同じトランザクションで更新し、ロールバック時は元に戻る）。"""
+    cache_versions.bump(VERSION_NAME)
+
+
+def resolve_recipients(role: str | None, department: Department | int | None) -> list[str]:
+    """役職・担当部署の管轄者とシステム管理者のメールアドレス（プロファイル登録順）。"""
+    directory = get_directory()
+    department_id = getattr(department, "pk", department)
+    entries = [directory.get((ADMIN_ROLE, key), []) for key in _admin_keys(directory)]
+    if role and department_id is not None and role != ADMIN_ROLE:
+        entries.append(directory.get((role, department_id), []))
+    return [email for _, email in merge(*entries)]
+
+
+def _admin_keys(directory) -> list[int | None]:
+    return [department_id for role, department_id in directory if role == ADMIN_ROLE]
+
+
+def submission_recipients(proposal: ImprovementProposal) -> tuple[str | None, Department | None, list[str]]:
+    """提出通知の宛先。班→係→部の順に最初に宛先が見つかった (役職, 部署, 宛先) を返す。"""
+    for role, field in SUBMISSION_CHAIN:
+        department = getattr(proposal, field)
+        if department is None:
+            continue
+        recipients = resolve_recipients(role, department)
+        if recipients:
+            return role, department, recipients
+    return None, None, []
+
+
+# 承認待ち一覧の管轄: 役職 → 担当部署と照合する提案の部署列（班長は班、係長は係、部門長・改善委員は部または課）
+SCOPE_FIELDS = {
+    "supervisor": ("team",),
+    "chief": ("group",),
+    "manager": ("department", "section"),
+    "committee": ("department", "section"),
+    "committee_chair": ("department", "section"),
+}
+
+
+def scope_filter(role: str | None, department_id: int | None) -> Q | None:
+    """役職・担当部署が管轄する提案の条件（管理者・担当部署なし・対象外の役職は None＝絞り込まない）。"""
+    fields = SCOPE_FIELDS.get(role)
+    if not fields or department_id is None:
+        return None
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}_id": department_id})
+    return condition
+
+
+def next_approver_department(proposal: ImprovementProposal, role: str) -> Department | None:
+    """次段階の役職が管轄する部署（班長は班、係長は係、部門長・改善委員は課→部）。"""
+    if role == "supervisor":
+        return proposal.team
+    if role == "chief":
+        return proposal.group
+    if role in ("manager", "committee", "committee_chair"):
+        return proposal.section or proposal.department
+    return None
+
+
+def next_stage_recipients(proposal: ImprovementProposal, stage: str) -> tuple[str | None, list[str]]:
+    """承認した段階の次段階の役職と宛先（最終段階なら宛先なし）。"""
+    stages_order = list(ProposalApproval.Stage.values)
+    index = stages_order.index(stage)
+    if index + 1 >= len(stages_order):
+        return None, []
+    next_role = stages_order[index + 1]
+    return next_role, resolve_recipients(next_role, next_approver_department(proposal, next_role))
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from uuid import uuid4
+
+from proposals.models import CacheVersion
+
+# キャッシュの版数は DB に置く（ローカルメモリのキャッシュは gunicorn のワーカーごとに別なので、版数を共有して無効化を揃える）。
+# 更新は保存と同じトランザクションで行うため、コミット前の内容が新しい版数で他プロセスにキャッシュされることはない。
+
+INITIAL = "0"
+
+
+def current(*names: str) -> dict[str, str]:
+    """名前 → 版数（未登録は INITIAL）。1 クエリで読む。"""
+    versions = dict(CacheVersion.objects.filter(name__in=names).values_list("name", "version"))
+    return {name: versions.get(name, INITIAL) for name in names}
+
+
+def bump(*names: str) -> None:
+    """版数を新しいトークンに更新する。"""
+    for name in names:
+        token = uuid4().hex
+        if not CacheVersion.objects.filter(name=name).update(version=token):
+            CacheVersion.objects.update_or_create(name=name, defaults={"version": token})
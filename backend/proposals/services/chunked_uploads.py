@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterator
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from proposals.models import ChunkedUpload, ImprovementProposal, ProposalImage
+from proposals.services import image_jobs
+
+logger = logging.getLogger(__name__)
+
+# 再開可能な分割アップロード。各チャンクはリクエスト本文を少しずつ読んで一時ファイルの受信済み位置へ直接書くため、
+# ファイルの大きさに関わらずワーカーのメモリは READ_SIZE 程度で済む。通信が途中で切れても書けた分だけ offset を進め、
+# クライアントは GET で offset を確かめて続きから送り直す。最後のバイトを受けたら全体の SHA-256 を確かめる。
+# 本文の受信中は DB のトランザクション・行ロックを持たず、同じアップロードへの同時書き込みはロックファイルで防ぐ。
+# offset と状態は受信後に「offset が受信開始時のままなら」の条件付き UPDATE で1文で確定する。
+
+READ_SIZE = 64 * 1024
+HASH_READ_SIZE = 1024 * 1024
+# 書き込み中のロックファイルを更新する間隔と、更新が止まったロックを放棄されたとみなす秒数
+LOCK_TOUCH_BYTES = 1024 * 1024
+LOCK_STALE_SECONDS = 120
+
+
+def upload_root() -> Path:
+    root = Path(getattr(settings, "CHUNKED_UPLOAD_ROOT", Path(settings.BASE_DIR) / "chunked_uploads"))
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def temp_path(upload: ChunkedUpload) -> Path:
+    return upload_root() / f"{upload.pk}.part"
+
+
+def lock_path(upload: ChunkedUpload) -> Path:
+    return upload_root() / f"{upload.pk}.lock"
+
+
+def max_size() -> int:
+    return getattr(settings, "CHUNKED_UPLOAD_MAX_SIZE", 200 * 1024 * 1024)
+
+
+def create(filename: str, size: int, sha256: str, user=None) -> ChunkedUpload:
+    upload = ChunkedUpload.objects.create(
+        filename=Path(filename).name,
+        size=size,
+        sha256=sha256.lower(),
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    temp_path(upload).touch()
+    return upload
+
+
+def lock(upload_id) -> ChunkedUpload:
+    """添付が重ならないよう行をロックして取得する（呼び出し元のトランザクション内）。"""
+    return ChunkedUpload.objects.select_for_update().get(pk=upload_id)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def writing(upload: ChunkedUpload) -> Iterator[bool]:
+    """チャンクの書き込み中を示すロックファイルを作る（他のリクエストが書き込み中なら False）。
+
+    O_EXCL で作るため複数のワーカープロセスでも1つだけが取得でき、更新の止まったロック（ワーカー停止など）は取り直す。
+    """
+    path = lock_path(upload)
+    try:
+        if path.stat().st_mtime < time.time() - LOCK_STALE_SECONDS:
+            path.unlink(missing_ok=True)
+    except FileNotFoundError:
+        pass
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def append(upload: ChunkedUpload, stream) -> int:
+    """stream を受信済み位置から書き込み、書けたバイト数を返す（writing() のロックを取得して呼ぶ）。
+
+    通信が切れた場合も書けた分は残して offset を進める。全体を受けたら SHA-256 を確かめ、
+    一致すれば受信完了、一致しなければ一時ファイルを消して検証失敗にする。
+    受信中に他のリクエストが offset を進めていた場合は何も確定せず 0 を返す。
+    """
+    path = temp_path(upload)
+    start = upload.offset
+    remaining = upload.size - start
+    written = 0
+    with path.open("r+b" if path.exists() else "wb") as dest:
+        dest.seek(start)
+        while written < remaining:
+            try:
+                block = stream.read(min(READ_SIZE, remaining - written))
+            except OSError as exc:
+                logger.warning("[uploads] %s interrupted after %s bytes: %s", upload.pk, written, exc)
+                break
+            if not block:
+                break
+            dest.write(block)
+            if (written + len(block)) // LOCK_TOUCH_BYTES != written // LOCK_TOUCH_BYTES:
+                # 長いチャンクの受信中にロックが放棄扱いされないよう更新する
+                os.utime(lock_path(upload))
+            written += len(block)
+        # 前回の途中で切れた書き込みの残りを捨てる
+        dest.truncate(start + written)
+
+    offset = start + written
+    status = ChunkedUpload.Status.UPLOADING
+    if offset >= upload.size:
+        if file_sha256(path) == upload.sha256:
+            status = ChunkedUpload.Status.COMPLETE
+        else:
+            logger.warning("[uploads] %s checksum mismatch", upload.pk)
+            status = ChunkedUpload.Status.FAILED
+
+    # 受信中はロックを持たず、offset が受信開始時のままの場合だけ確定する
+    committed = ChunkedUpload.objects.filter(
+        pk=upload.pk, offset=start, status=ChunkedUpload.Status.UPLOADING
+    ).update(offset=offset, status=status, updated_at=timezone.now())
+    if not committed:
+        logger.warning("[uploads] %s offset moved while receiving, discarding %s bytes", upload.pk, written)
+        upload.refresh_from_db()
+        return 0
+    if status == ChunkedUpload.Status.FAILED:
+        path.unlink(missing_ok=True)
+    upload.offset, upload.status = offset, status
+    return written
+
+
+def next_display_order(proposal: ImprovementProposal, kind: str) -> int:
+    last = proposal.images.filter(kind=kind).order_by("-display_order").values_list("display_order", flat=True).first()
+    return 0 if last is None else last + 1
+
+
+@transaction.atomic
+def attach(upload: ChunkedUpload, proposal: ImprovementProposal, kind: str) -> ProposalImage:
+    """受信完了したファイルを提案の画像にする（代表画像がなければそれにもする）。"""
+    path = temp_path(upload)
+    with path.open("rb") as handle:
+        image = image_jobs.attach(
+            proposal,
+            File(handle, name=upload.filename),
+            kind,
+            next_display_order(proposal, kind),
+            sha256=upload.sha256,
+        )
+    upload.status = ChunkedUpload.Status.ATTACHED
+    upload.image = image
+    upload.save(update_fields=["status", "image", "updated_at"])
+
+    # 一覧・詳細の版数（updated_at）も進める
+    updated_fields = ["updated_at"]
+    path_field = f"{kind}_image_path"
+    if not getattr(proposal, path_field):
+        setattr(proposal, path_field, image.image_path)
+        updated_fields.append(path_field)
+    proposal.save(update_fields=updated_fields)
+
+    transaction.on_commit(lambda: path.unlink(missing_ok=True))
+    return image
+
+
+def purge_expired(expire_seconds: int | None = None) -> int:
+    """添付されないまま期限を過ぎたアップロードと一時ファイルを削除し、件数を返す。"""
+    if expire_seconds is None:
+        expire_seconds = getattr(settings, "CHUNKED_UPLOAD_EXPIRE_SECONDS", 86400)
+    threshold = timezone.now() - timedelta(seconds=expire_seconds)
+    expired = ChunkedUpload.objects.filter(updated_at__lt=threshold).exclude(status=ChunkedUpload.Status.ATTACHED)
+    purged = 0
+    for upload in expired:
+        temp_path(upload).unlink(missing_ok=True)
+        lock_path(upload).unlink(missing_ok=True)
+        upload.delete()
+        purged += 1
+    return purged
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from django.db import transaction
+
+from proposals.models import Department, DepartmentClosure
+
+# 部署階層の閉包テーブル（DepartmentClosure）の維持。
+# 追加時は親の上位部署をコピーし、親の付け替え時は配下ごと上位部署の行を張り替える。削除時は子が最上位になる（parent は SET_NULL）。
+# queryset.update(parent=...) や loaddata（raw 保存）はシグナルを通らないため、その後は rebuild_department_tree で再構築する。
+
+CYCLE_ERROR = "親部署に自身または配下の部署は指定できません"
+
+
+def _ancestors(department_id: int) -> list[tuple[int, int]]:
+    """(上位部署ID, 階層差) の一覧（自身を含む）。"""
+    return list(
+        DepartmentClosure.objects.filter(descendant_id=department_id).values_list("ancestor_id", "depth")
+    )
+
+
+def _subtree(department_id: int) -> list[tuple[int, int]]:
+    """(配下部署ID, 階層差) の一覧（自身を含む）。"""
+    return list(
+        DepartmentClosure.objects.filter(ancestor_id=department_id).values_list("descendant_id", "depth")
+    )
+
+
+def _link(ancestors: list[tuple[int, int]], subtree: list[tuple[int, int]]) -> None:
+    DepartmentClosure.objects.bulk_create(
+        DepartmentClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + down + 1)
+        for ancestor_id, up in ancestors
+        for descendant_id, down in subtree
+    )
+
+
+def creates_cycle(department: Department) -> bool:
+    """親に自身または配下の部署を指定しているか。"""
+    if department.pk is None or department.parent_id is None:
+        return False
+    return DepartmentClosure.objects.filter(ancestor_id=department.pk, descendant_id=department.parent_id).exists()
+
+
+def sync_department(department: Department) -> None:
+    """保存後の部署について閉包テーブルを親の変更に合わせる。"""
+    with transaction.atomic():
+        subtree = _subtree(department.pk)
+        current_parent = (
+            DepartmentClosure.objects.filter(descendant_id=department.pk, depth=1)
+            .values_list("ancestor_id", flat=True)
+            .first()
+        )
+        if not subtree:
+            DepartmentClosure.objects.create(ancestor_id=department.pk, descendant_id=department.pk, depth=0)
+            subtree = [(department.pk, 0)]
+        elif current_parent == department.parent_id:
+            return
+        else:
+            # 配下ごと旧上位部署から切り離す（配下内の行は残す）
+            subtree_ids = [descendant_id for descendant_id, _ in subtree]
+            DepartmentClosure.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if department.parent_id is not None:
+            _link(_ancestors(department.parent_id), subtree)
+
+
+def detach_children(department: Department) -> None:
+    """削除前に配下を上位部署から切り離す（自身の行は CASCADE で消える）。"""
+    below = [descendant_id for descendant_id, depth in _subtree(department.pk) if depth > 0]
+    if not below:
+        return
+    above = [ancestor_id for ancestor_id, _ in _ancestors(department.pk)]
+    DepartmentClosure.objects.filter(descendant_id__in=below, ancestor_id__in=above).delete()
+
+
+def closure_rows(parents: dict[int, int | None]) -> list[tuple[int, int, int]]:
+    """{部署ID: 親ID} から閉包テーブルの行 (上位部署ID, 配下部署ID, 階層差) を作る。"""
+    rows = []
+    for department_id in parents:
+        ancestor_id, depth, seen = department_id, 0, set()
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            rows.append((ancestor_id, department_id, depth))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    return rows
+
+
+def rebuild() -> int:
+    """Department.parent から閉包テーブルを作り直す。作成した行数を返す。"""
+    parents = dict(Department.objects.values_list("id", "parent_id"))
+    with transaction.atomic():
+        DepartmentClosure.objects.all().delete()
+        created = DepartmentClosure.objects.bulk_create(
+            (
+                DepartmentClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+                for ancestor_id, descendant_id, depth in closure_rows(parents)
+            ),
+            batch_size=1000,
+        )
+    return len(created)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from proposals.models import ApprovalNotice, EmailOutbox, ImprovementProposal, ProposalApproval
+from proposals.services import mail_outbox
+
+# 承認依頼のまとめ送信。EMAIL_DIGEST_WINDOW_SECONDS > 0 のとき承認依頼は宛先ごとの ApprovalNotice として溜め、
+# send_outbox_mail が宛先の最初の依頼から期間を過ぎた時点で1通のまとめメール（EmailOutbox）にする。
+
+
+def window() -> timedelta:
+    return timedelta(seconds=getattr(settings, "EMAIL_DIGEST_WINDOW_SECONDS", 0))
+
+
+def is_enabled() -> bool:
+    return window() > timedelta(0)
+
+
+def queue_notices(
+    proposal: ImprovementProposal,
+    stage: str,
+    recipients: Iterable[str],
+    sender=None,
+) -> list[ApprovalNotice]:
+    """承認依頼を宛先ごとに登録する（呼び出し元のトランザクションに含まれる）。"""
+    sender = sender if getattr(sender, "is_authenticated", False) else None
+    return ApprovalNotice.objects.bulk_create(
+        ApprovalNotice(recipient=recipient, proposal=proposal, stage=stage, sender=sender)
+        for recipient in dict.fromkeys(address for address in recipients if address)
+    )
+
+
+def summary_body(entries: Iterable[tuple[ImprovementProposal, str]]) -> str:
+    """承認待ちの提案（提案, 段階）を一覧にしたメール本文。"""
+    entries = list(entries)
+    lines = [
+        f"・{proposal.management_no}（{ProposalApproval.Stage(stage).label}）"
+        f" 提案者: {proposal.proposer_name} テーマ: {proposal.deployment_item}"
+        for proposal, stage in entries
+    ]
+    return "\n".join(
+        [
+            f"改善提案 {len(entries)}件 があなたの確認待ちです。",
+            "",
+            *lines,
+            "",
+            "下記URLより内容を確認し、承認処理をお願いします。",
+            "http://10.0.1.232:8503/approval-center",
+        ]
+    )
+
+
+def summary_subject(count: int) -> str:
+    return f"【改善提案】承認依頼 {count}件"
+
+
+def _flush_recipient(recipient: str) -> EmailOutbox | None:
+    with transaction.atomic():
+        notices = list(
+            ApprovalNotice.objects.select_for_update(skip_locked=True)
+            .filter(outbox__isnull=True, recipient=recipient)
+            .select_related("proposal")
+            .order_by("created_at", "id")
+        )
+        # まとめる前に次の段階へ進んだ（処理済みの）提案と重複は除く
+        waiting: dict[tuple[int, str], ApprovalNotice] = {}
+        for notice in notices:
+            proposal = notice.proposal
+            if proposal.current_stage == notice.stage and not proposal.is_completed:
+                waiting.setdefault((proposal.pk, notice.stage), notice)
+        kept = {notice.pk for notice in waiting.values()}
+        stale = [notice.pk for notice in notices if notice.pk not in kept]
+        if stale:
+            ApprovalNotice.objects.filter(pk__in=stale).delete()
+        if not waiting:
+            return None
+
+        included = list(waiting.values())
+        outbox = mail_outbox.enqueue(
+            EmailOutbox.Kind.DIGEST,
+            summary_subject(len(included)),
+            summary_body((notice.proposal, notice.stage) for notice in included),
+            [recipient],
+            sender=included[-1].sender,
+        )
+        ApprovalNotice.objects.filter(pk__in=[notice.pk for notice in included]).update(outbox=outbox)
+        return outbox
+
+
+def flush_due(now=None) -> int:
+    """最初の依頼からまとめ期間を過ぎた宛先ごとにまとめメールを送信箱へ登録する。登録件数を返す。"""
+    now = now or timezone.now()
+    due_recipients = list(
+        ApprovalNotice.objects.filter(outbox__isnull=True)
+        .values("recipient")
+        .annotate(oldest=Min("created_at"))
+        .filter(oldest__lte=now - window())
+        .values_list("recipient", flat=True)
+    )
+    return sum(1 for recipient in due_recipients if _flush_recipient(recipient) is not None)
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from django.db import transaction
+
+from proposals.models import Department, Employee
+from proposals.services import analytics, reference_data
+from proposals.services.affiliations import AffiliationResolver
+
+# 従業員名簿（CSV）の同期。既存の従業員を code で1回読み込み、メモリ上で差分を取ってから
+# bulk_create / bulk_update でまとめて反映する（全体を1トランザクション）。
+
+DEFAULT_DEPARTMENT_NAME = "未設定"
+DEFAULT_DEPARTMENT_LEVEL = "section"
+
+# 列名（見出し）の候補
+COLUMN_ALIASES: dict[str, tuple[str, ...]] = {
+    "code": ("code", "社員番号", "従業員コード", "コード"),
+    "name": ("name", "氏名", "名前"),
+    "email": ("email", "メールアドレス", "メール"),
+    "department": ("department", "部署", "所属"),
+    "division": ("division", "事業部/課", "事業部"),
+    "group": ("group", "係"),
+    "team": ("team", "班"),
+    "position": ("position", "役職"),
+    "role": ("role", "権限"),
+    "employment_type": ("employment_type", "雇用形態"),
+}
+CHOICE_FIELDS = {"role": Employee.Role, "employment_type": Employee.EmploymentType}
+
+
+class DryRunRollback(Exception):
+    """dry-run で差分を反映した後にロールバックするための例外。"""
+
+
+@dataclass
+class EmployeeImportResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deactivated: int = 0
+    duplicates: list[str] = field(default_factory=list)
+    unknown_departments: set[str] = field(default_factory=set)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "deactivated": self.deactivated,
+        }
+
+
+def _choice_value(choices, raw: str) -> str | None:
+    """選択肢の値または表示名から値を返す。"""
+    raw = raw.strip()
+    for value, label in choices.choices:
+        if raw in (value, label):
+            return value
+    return None
+
+
+def _column_index(header: list[str]) -> dict[str, int]:
+    normalized = [cell.strip().lower() for cell in header]
+    columns = {}
+    for field_name, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias.lower() in normalized:
+                columns[field_name] = normalized.index(alias.lower())
+                break
+    return columns
+
+
+def read_roster(csv_path: Path | str, encoding: str = "utf-8-sig") -> tuple[list[dict[str, str]], set[str]]:
+    """CSV を (code → 値) の行リストと、CSV で指定された列名の集合にする。
+
+    見出しに氏名列がない従来形式（1列目が氏名）は、import_employees.py と同じく
+    行番号から EMP0001 形式のコードを振り、部署などは既定値で登録する。
+    """
+    with open(csv_path, encoding=encoding, newline="") as handle:
+        reader = csv.reader(handle)
+        header = next(reader, None) or []
+        columns = _column_index(header)
+        legacy = "name" not in columns
+        rows = []
+        for idx, row in enumerate(reader, start=1):
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if legacy:
+                name = row[0].strip()
+                if name:
+                    rows.append({"code": f"EMP{idx:04d}", "name": name})
+                continue
+            values = {
+                field_name: row[index].strip() if index < len(row) else ""
+                for field_name, index in columns.items()
+            }
+            if not values.get("name"):
+                continue
+            values.setdefault("code", "")
+            if not values["code"]:
+                values["code"] = f"EMP{idx:04d}"
+            rows.append(values)
+    if legacy:
+        # 従来形式では部署・役職などを既定値にそろえる
+        return rows, {"code", "name", "email", "department", "division", "group", "team", "position", "role"}
+    return rows, set(columns) | {"code"}
+
+
+class _RosterSync:
+    def __init__(self, managed_fields: set[str], default_department: Department, result: EmployeeImportResult):
+        self.managed_fields = managed_fields
+        self.default_department = default_department
+        self.result = result
+        self.departments: dict[str, Department] = {}
+        for department in Department.objects.order_by("id"):
+            self.departments.setdefault(department.name, department)
+
+    def desired_fields(self, row: dict[str, str]) -> dict[str, Any]:
+        fields: dict[str, Any] = {"name": row["name"], "is_active": True}
+        for field_name in ("email", "division", "group", "team", "position"):
+            if field_name in self.managed_fields:
+                fields[field_name] = row.get(field_name, "")
+        if "department" in self.managed_fields:
+            department_name = row.get("department", "")
+            department = self.departments.get(department_name) if department_name else None
+            if department_name and department is None:
+                self.result.unknown_departments.add(department_name)
+            fields["department_id"] = (department or self.default_department).pk
+        for field_name, choices in CHOICE_FIELDS.items():
+            if field_name in self.managed_fields:
+                fields[field_name] = _choice_value(choices, row.get(field_name, "")) or Employee._meta.get_field(
+                    field_name
+                ).default
+        return fields
+
+
+def _apply(
+    rows: list[dict[str, str]],
+    managed_fields: set[str],
+    deactivate_missing: bool,
+    batch_size: int,
+    result: EmployeeImportResult,
+) -> None:
+    default_department, _ = Department.objects.get_or_create(
+        name=DEFAULT_DEPARTMENT_NAME, level=DEFAULT_DEPARTMENT_LEVEL
+    )
+    sync = _RosterSync(managed_fields, default_department, result)
+    affiliations = AffiliationResolver()
+    existing = Employee.objects.in_bulk(field_name="code")
+
+    desired: dict[str, dict[str, Any]] = {}
+    for row in rows:
+        if row["code"] in desired:
+            result.duplicates.append(row["code"])
+        desired[row["code"]] = sync.desired_fields(row)
+
+    to_create = []
+    to_update = []
+    changed_fields: set[str] = set()
+    for code, fields in desired.items():
+        employee = existing.get(code)
+        if employee is None:
+            if "department_id" not in fields:
+                fields["department_id"] = default_department.pk
+            employee = Employee(code=code, **fields)
+            affiliations.assign(employee)
+            to_create.append(employee)
+            continue
+        changes = [name for name, value in fields.items() if getattr(employee, name) != value]
+        for name in changes:
+            setattr(employee, name, fields[name])
+        # 係・班の部署は bulk 操作で保存シグナルを通らないためここで解決する
+        changes += affiliations.assign(employee)
+        if not changes:
+            result.unchanged += 1
+            continue
+        changed_fields.update(changes)
+        to_update.append(employee)
+
+    to_deactivate = []
+    if deactivate_missing:
+        for code, employee in existing.items():
+            if code not in desired and employee.is_active:
+                employee.is_active = False
+                to_deactivate.append(employee)
+
+    Employee.objects.bulk_create(to_create, batch_size=batch_size)
+    if to_update:
+        Employee.objects.bulk_update(to_update, sorted(changed_fields), batch_size=batch_size)
+    if to_deactivate:
+        Employee.objects.bulk_update(to_deactivate, ["is_active"], batch_size=batch_size)
+    result.inserted = len(to_create)
+    result.updated = len(to_update)
+    result.deactivated = len(to_deactivate)
+
+
+def import_employees(
+    csv_path: Path | str,
+    deactivate_missing: bool = False,
+    dry_run: bool = False,
+    batch_size: int = 500,
+    encoding: str = "utf-8-sig",
+) -> EmployeeImportResult:
+    """名簿 CSV を従業員マスタに同期する。dry_run では差分を反映した後にロールバックする。"""
+    rows, managed_fields = read_roster(csv_path, encoding)
+    result = EmployeeImportResult()
+    try:
+        with transaction.atomic():
+            _apply(rows, managed_fields, deactivate_missing, batch_size, result)
+            if dry_run:
+                raise DryRunRollback
+            if result.inserted or result.updated or result.deactivated:
+                # 一括登録・更新は保存シグナルを通らない
+                reference_data.bump(reference_data.EMPLOYEES)
+            if result.updated or result.deactivated:
+                # 氏名・所属の変更は分析集計に影響する
+                analytics.invalidate_terms()
+    except DryRunRollback:
+        pass
+    return result
@@ -2,27 +2,15 @@ from __future__ import annotations
 
 import datetime
 
-from django.db.models import F
-from django.utils import timezone
-
-from proposals.models import ImprovementProposal
+from proposals.services import sequences
 
 
 def generate_management_no() -> str:
     """Generate a unique management number yyyyMMdd-XXX."""
-    today = datetime.date.today()
-    prefix = today.strftime("%Y%m%d")
-    existing = (
-        ImprovementProposal.objects.filter(management_no__startswith=f"{prefix}-")
-        .order_by("-management_no")
-        .values_list("management_no", flat=True)
-        .first()
-    )
-    if existing:
-        try:
-            last_seq = int(existing.split("-")[-1])
-        except ValueError:
-            last_seq = 0
-    else:
-        last_seq = 0
-    return f"{prefix}-{last_seq + 1:03d}"
+    return generate_management_numbers(1)[0]
+
+
+def generate_management_numbers(count: int) -> list[str]:
+    """Reserve ``count`` consecutive management numbers for today in one step."""
+    prefix = datetime.date.today().strftime("%Y%m%d")
+    return sequences.allocate_management_numbers(prefix, count)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from proposals.models import ImageBlob, ImprovementProposal, ProposalImage
+from proposals.services.images import ImageVariants
+
+logger = logging.getLogger(__name__)
+
+# 提案画像の内容アドレス保存。アップロードを SHA-256 をキーに blobs/<先頭2文字>/<ハッシュ><拡張子> へ1回だけ保存し、
+# 同じ写真を複数の提案に添付・再アップロードしてもファイルと派生画像を共有する。
+# 参照数（ImageBlob.ref_count）は ProposalImage の作成・削除で増減し、0 のものは gc_image_blobs が削除する。
+
+BLOB_DIR = "blobs"
+TMP_DIR = "tmp"
+LEGACY_DIR = "proposals"
+
+
+def _media_root() -> Path:
+    return Path(settings.MEDIA_ROOT)
+
+
+def blob_relative_path(digest: str, ext: str) -> str:
+    return f"{BLOB_DIR}/{digest[:2]}/{digest}{ext}"
+
+
+def store(file_obj, sha256: str | None = None) -> ImageBlob:
+    """アップロードを一時ファイルに書きながらハッシュを取り、同じ内容の blob があればそれを返す。
+
+    呼び出し元のトランザクション内で行を select_for_update し、参照が付く前に GC が消さないようにする。
+    検証済みの sha256 が分かっていて同じ内容の blob があれば、ファイルを読まずにそれを返す。
+    """
+    if sha256:
+        blob = ImageBlob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is not None:
+            return blob
+    ext = (Path(getattr(file_obj, "name", "") or "").suffix or ".jpg").lower()
+    tmp_dir = _media_root() / BLOB_DIR / TMP_DIR
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix=ext, delete=False) as dest:
+        for chunk in file_obj.chunks() if hasattr(file_obj, "chunks") else [file_obj.read()]:
+            digest.update(chunk)
+            dest.write(chunk)
+            size += len(chunk)
+    tmp_path = Path(dest.name)
+    sha256 = digest.hexdigest()
+
+    try:
+        blob = ImageBlob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is None:
+            relative_path = blob_relative_path(sha256, ext)
+            absolute_path = _media_root() / relative_path
+            absolute_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, absolute_path)
+            blob, created = ImageBlob.objects.get_or_create(
+                sha256=sha256, defaults={"path": relative_path, "size": size}
+            )
+            if not created and blob.path != relative_path:
+                # 同時に同じ内容が別の拡張子で登録された
+                absolute_path.unlink(missing_ok=True)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return blob
+
+
+def mark_processed(blob: ImageBlob, variants: ImageVariants) -> ImageBlob:
+    """派生画像の作成結果を blob に記録する（先に他のワーカーが記録していればそれを返す）。"""
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().get(pk=blob.pk)
+        if not blob.is_processed:
+            blob.path = variants.original
+            blob.medium_path = variants.medium
+            blob.thumbnail_path = variants.thumbnail
+            blob.is_processed = True
+            blob.save(update_fields=["path", "medium_path", "thumbnail_path", "is_processed"])
+    return blob
+
+
+def variants_of(blob: ImageBlob) -> ImageVariants:
+    return ImageVariants(original=blob.path, medium=blob.medium_path, thumbnail=blob.thumbnail_path)
+
+
+def add_reference(blob_id: int, delta: int) -> None:
+    ImageBlob.objects.filter(pk=blob_id).update(ref_count=F("ref_count") + delta)
+
+
+def recount() -> int:
+    """一括操作などでずれた参照数を ProposalImage から数え直し、直した件数を返す。"""
+    fixed = 0
+    for blob in ImageBlob.objects.annotate(actual=Count("images")).exclude(ref_count=F("actual")):
+        ImageBlob.objects.filter(pk=blob.pk).update(ref_count=blob.actual)
+        fixed += 1
+    return fixed
+
+
+@dataclass
+class GcResult:
+    blobs: int = 0
+    files: int = 0
+    bytes: int = 0
+
+
+def _remove(path: Path, result: GcResult, dry_run: bool) -> None:
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return
+    if not dry_run:
+        path.unlink(missing_ok=True)
+    result.files += 1
+    result.bytes += size
+
+
+def _blob_files(blob: ImageBlob) -> set[Path]:
+    root = _media_root()
+    paths = {root / p for p in (blob.path, blob.medium_path, blob.thumbnail_path) if p}
+    # 派生画像の作成前に残ったアップロード（拡張子違い）も含める
+    paths.update((root / blob.path).parent.glob(f"{blob.sha256}.*"))
+    return paths
+
+
+def _referenced_legacy_paths() -> set[str]:
+    referenced = set()
+    for row in ProposalImage.objects.filter(blob__isnull=True).values_list(
+        "image_path", "medium_path", "thumbnail_path"
+    ):
+        referenced.update(p for p in row if p)
+    for row in ImprovementProposal.objects.values_list("before_image_path", "after_image_path"):
+        referenced.update(p for p in row if p)
+    return referenced
+
+
+def collect_garbage(grace_seconds: int | None = None, dry_run: bool = False) -> GcResult:
+    """参照されなくなった画像ファイルを削除する。
+
+    - 参照数 0 の blob（提案の削除で ProposalImage が消えたもの）の行とファイル
+    - blobs/ 配下で対応する行のないファイル（中断したアップロードの一時ファイルなど）
+    - blob 導入前の proposals/<管理No>/ 配下で、どの画像・提案からも参照されないファイル
+
+    アップロード中のファイルを消さないよう、grace_seconds より新しいものは残す。
+    """
+    if grace_seconds is None:
+        grace_seconds = getattr(settings, "IMAGE_BLOB_GC_GRACE_SECONDS", 86400)
+    result = GcResult()
+    recount()
+
+    threshold = timezone.now() - timedelta(seconds=grace_seconds)
+    orphan_ids = list(
+        ImageBlob.objects.filter(ref_count=0, created_at__lt=threshold).values_list("pk", flat=True)
+    )
+    for blob_id in orphan_ids:
+        with transaction.atomic():
+            # 同じ内容のアップロードが参照を付けた直後なら残す
+            blob = ImageBlob.objects.select_for_update().filter(pk=blob_id).first()
+            if blob is None or ProposalImage.objects.filter(blob=blob).exists():
+                continue
+            for path in _blob_files(blob):
+                _remove(path, result, dry_run)
+            if not dry_run:
+                blob.delete()
+            result.blobs += 1
+
+    cutoff = time.time() - grace_seconds
+    root = _media_root()
+    blob_dir = root / BLOB_DIR
+    if blob_dir.is_dir():
+        known = set(ImageBlob.objects.values_list("sha256", flat=True))
+        for path in blob_dir.rglob("*"):
+            if not path.is_file() or path.stat().st_mtime >= cutoff:
+                continue
+            if path.parent.name == TMP_DIR or path.name.split(".", 1)[0] not in known:
+                _remove(path, result, dry_run)
+
+    legacy_dir = root / LEGACY_DIR
+    if legacy_dir.is_dir():
+        referenced = _referenced_legacy_paths()
+        for path in legacy_dir.rglob("*"):
+            if not path.is_file() or path.stat().st_mtime >= cutoff:
+                continue
+            if str(path.relative_to(root)).replace("\\", "/") not in referenced:
+                _remove(path, result, dry_run)
+        if not dry_run:
+            # 提案の削除で空になったディレクトリも消す
+            for directory in sorted(legacy_dir.iterdir()):
+                if directory.is_dir() and not any(directory.iterdir()):
+                    directory.rmdir()
+
+    logger.info("[images] gc removed %s blobs / %s files (%s bytes)", result.blobs, result.files, result.bytes)
+    return result
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import logging
+from concurrent.futures import Executor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from proposals.models import ImageBlob, ImageJob, ImprovementProposal, ProposalImage
+from proposals.services import image_blobs, media
+from proposals.services.images import ImageVariants, build_variants
+
+logger = logging.getLogger(__name__)
+
+# 提案画像の派生画像作成をリクエストの外で行う。提出時はアップロードを保存して ImageJob を登録するだけにし
+# （画像は「処理中」でアップロードのまま表示）、run_image_worker が複数ジョブをプロセスプールで並列に処理する。
+# ジョブは画像ごとに登録し、同じ内容（ImageBlob）の画像は1回だけ変換して、完了時にその blob を参照する処理中の画像をまとめて完了にする。
+
+ACTIVE_STATUSES = (ImageJob.Status.PENDING, ImageJob.Status.RUNNING)
+
+
+def is_async() -> bool:
+    return getattr(settings, "IMAGE_PROCESSING_ASYNC", True)
+
+
+def enqueue(image: ProposalImage) -> ImageJob:
+    """派生画像の作成を画像ごとに登録する（呼び出し元のトランザクションに含まれる）。
+
+    同じ blob のジョブは同時に処理しないよう claim_batch が順に取り出し、2件目以降は変換済みの結果を反映するだけになる。
+    """
+    return ImageJob.objects.create(image=image)
+
+
+def attach(
+    proposal: ImprovementProposal, file_obj, kind: str, display_order: int, *, sha256: str | None = None
+) -> ProposalImage:
+    """アップロードを内容の SHA-256 で保存して提案の画像として登録する。
+
+    同じ写真は既存のファイル・派生画像を共有し、未変換なら非同期モードではジョブを登録して処理中で返す。
+    """
+    blob = image_blobs.store(file_obj, sha256=sha256)
+    if blob.is_processed:
+        variants = image_blobs.variants_of(blob)
+        status = ProposalImage.Status.READY
+    elif is_async():
+        # 派生画像は run_image_worker が作る（それまではアップロードのまま表示し、版なしで再検証させる）
+        variants = ImageVariants(original=blob.path)
+        status = ProposalImage.Status.PROCESSING
+    else:
+        # 長辺上限付きの原本（EXIF 除去）と中サイズ・サムネイルを作る
+        blob = image_blobs.mark_processed(blob, build_variants(blob.path))
+        variants = image_blobs.variants_of(blob)
+        status = ProposalImage.Status.READY
+    image = ProposalImage.objects.create(
+        proposal=proposal,
+        kind=kind,
+        blob=blob,
+        image_path=variants.original,
+        medium_path=variants.medium,
+        thumbnail_path=variants.thumbnail,
+        status=status,
+        version=media.image_version(blob, variants.original) if status == ProposalImage.Status.READY else "",
+        display_order=display_order,
+    )
+    if status == ProposalImage.Status.PROCESSING:
+        enqueue(image)
+    return image
+
+
+def enqueue_missing() -> int:
+    """派生画像がなくジョブを登録したことのない画像（既存データなど）のジョブを登録する。"""
+    images = ProposalImage.objects.filter(medium_path="", jobs__isnull=True)
+    return len(ImageJob.objects.bulk_create(ImageJob(image=image) for image in images))
+
+
+def requeue_stale(stale_seconds: int | None = None) -> int:
+    """処理中のまま一定時間経過したジョブ（ワーカー停止など）を待機中に戻す。"""
+    if stale_seconds is None:
+        stale_seconds = getattr(settings, "IMAGE_JOB_STALE_SECONDS", 600)
+    threshold = timezone.now() - timedelta(seconds=stale_seconds)
+    return ImageJob.objects.filter(status=ImageJob.Status.RUNNING, started_at__lt=threshold).update(
+        status=ImageJob.Status.PENDING, started_at=None
+    )
+
+
+def claim_batch(limit: int) -> list[ImageJob]:
+    """待機中のジョブを取り出して処理中にする（複数ワーカーでも重複しない）。"""
+    now = timezone.now()
+    with transaction.atomic():
+        # 同じ blob を別のワーカーが変換中のジョブは、その完了後に取り出す
+        busy_blobs = ImageJob.objects.filter(
+            status=ImageJob.Status.RUNNING, image__blob__isnull=False
+        ).values("image__blob_id")
+        jobs = list(
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImageJob.Status.PENDING)
+            .exclude(image__blob_id__in=busy_blobs)
+            .order_by("created_at", "id")[:limit]
+        )
+        if jobs:
+            ImageJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=ImageJob.Status.RUNNING, started_at=now, attempts=F("attempts") + 1
+            )
+    return list(ImageJob.objects.filter(pk__in=[job.pk for job in jobs]).select_related("image__blob"))
+
+
+def _apply(image: ProposalImage, variants: ImageVariants) -> None:
+    raw_path = image.image_path
+    image.image_path = variants.original
+    image.medium_path = variants.medium
+    image.thumbnail_path = variants.thumbnail
+    image.status = ProposalImage.Status.READY
+    image.version = media.image_version(image.blob if image.blob_id else None, variants.original)
+    image.save(update_fields=["image_path", "medium_path", "thumbnail_path", "status", "version"])
+
+    # 提案の代表画像パスも原本に合わせ、一覧・詳細の版数（updated_at）を進める
+    proposal = ImprovementProposal.objects.select_for_update().get(pk=image.proposal_id)
+    updated_fields = ["updated_at"]
+    for field in ("before_image_path", "after_image_path"):
+        if getattr(proposal, field) == raw_path:
+            setattr(proposal, field, variants.original)
+            updated_fields.append(field)
+    proposal.save(update_fields=updated_fields)
+
+
+def _complete(job: ImageJob, variants: ImageVariants | None) -> bool:
+    """variants が None なら blob の変換済みの結果を使う。
+
+    処理中に画像・提案が削除されていた場合は反映せず、作った派生画像を片付けてジョブを失敗にし False を返す。
+    """
+    try:
+        with transaction.atomic():
+            image = ProposalImage.objects.select_for_update().select_related("blob").filter(pk=job.image_id).first()
+            if image is None:
+                raise ProposalImage.DoesNotExist(f"image {job.image_id} was deleted")
+            images = [image]
+            if image.blob_id:
+                blob = image_blobs.mark_processed(image.blob, variants) if variants else image.blob
+                variants = image_blobs.variants_of(blob)
+                # 同じ blob の画像（先に完了したジョブで反映済みのものを除く）をまとめて完了にする
+                images = list(
+                    ProposalImage.objects.filter(blob=blob, status=ProposalImage.Status.PROCESSING).select_related("blob")
+                )
+            for target in images:
+                _apply(target, variants)
+
+            job.status = ImageJob.Status.SUCCEEDED
+            job.error = ""
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "error", "finished_at"])
+    except (ObjectDoesNotExist, DatabaseError) as exc:
+        logger.warning("[images] job %s could not be applied: %s", job.pk, exc)
+        if variants:
+            _discard(job, variants)
+        # 画像の削除（CASCADE）でジョブ行も消えている場合は何もしない
+        ImageJob.objects.filter(pk=job.pk).update(
+            status=ImageJob.Status.FAILED, error=str(exc), finished_at=timezone.now()
+        )
+        return False
+    return True
+
+
+def finish_processed() -> int:
+    """blob が変換済みなのに処理中のままの画像（ジョブの取りこぼしなど）を完了にし、件数を返す。"""
+    finished = 0
+    stale = ProposalImage.objects.filter(status=ProposalImage.Status.PROCESSING, blob__is_processed=True)
+    for image in stale.select_related("blob"):
+        with transaction.atomic():
+            locked = (
+                ProposalImage.objects.select_for_update()
+                .filter(pk=image.pk, status=ProposalImage.Status.PROCESSING)
+                .first()
+            )
+            if locked is None:
+                continue
+            _apply(locked, image_blobs.variants_of(image.blob))
+            ImageJob.objects.filter(image=locked, status=ImageJob.Status.PENDING).update(
+                status=ImageJob.Status.SUCCEEDED, finished_at=timezone.now()
+            )
+        finished += 1
+    return finished
+
+
+def _discard(job: ImageJob, variants: ImageVariants) -> None:
+    """反映できなかった派生画像を削除する（blob に記録済みのもの・原本は gc_image_blobs に任せる）。"""
+    blob = ImageBlob.objects.filter(pk=job.image.blob_id).first() if job.image.blob_id else None
+    kept = {blob.medium_path, blob.thumbnail_path} if blob and blob.is_processed else set()
+    for path in (variants.medium, variants.thumbnail):
+        if path and path not in kept:
+            (Path(settings.MEDIA_ROOT) / path).unlink(missing_ok=True)
+
+
+def _fail(job: ImageJob, error: BaseException) -> None:
+    job.error = str(error)
+    if job.attempts >= getattr(settings, "IMAGE_JOB_MAX_ATTEMPTS", 3):
+        logger.error("[images] job %s gave up after %s attempts: %s", job.pk, job.attempts, error)
+        job.status = ImageJob.Status.FAILED
+        job.finished_at = timezone.now()
+        # 原本はアップロードのまま表示を続ける
+        failed = ProposalImage.objects.filter(pk=job.image_id)
+        if job.image.blob_id:
+            failed = ProposalImage.objects.filter(blob_id=job.image.blob_id, status=ProposalImage.Status.PROCESSING)
+        failed.update(status=ProposalImage.Status.FAILED)
+    else:
+        logger.warning("[images] job %s attempt %s failed: %s", job.pk, job.attempts, error)
+        job.status = ImageJob.Status.PENDING
+        job.started_at = None
+    job.save(update_fields=["status", "error", "finished_at", "started_at"])
+
+
+def _source(job: ImageJob) -> str | None:
+    """変換するファイル。blob が変換済みなら None。"""
+    blob = job.image.blob
+    if blob is not None:
+        return None if blob.is_processed else blob.path
+    return job.image.image_path
+
+
+def process(jobs: list[ImageJob], executor: Executor | None = None) -> int:
+    """ジョブの画像を処理する（executor があれば画像ごとに並列）。完了件数を返す。
+
+    同じファイルを参照するジョブは1回だけ変換する。子プロセスは画像ファイルの変換だけを行い、
+    DB の更新は呼び出し元のプロセスで行う。
+    """
+    sources = list(dict.fromkeys(source for source in map(_source, jobs) if source is not None))
+    results: dict[str, ImageVariants | Exception] = {}
+    if executor is None:
+        for source in sources:
+            try:
+                results[source] = build_variants(source)
+            except Exception as exc:
+                results[source] = exc
+    else:
+        futures = {source: executor.submit(build_variants, source) for source in sources}
+        for source, future in futures.items():
+            try:
+                results[source] = future.result()
+            except Exception as exc:
+                results[source] = exc
+
+    succeeded = 0
+    for job in jobs:
+        source = _source(job)
+        result = results[source] if source is not None else None
+        if isinstance(result, Exception):
+            _fail(job, result)
+            continue
+        if _complete(job, result):
+            succeeded += 1
+    return succeeded
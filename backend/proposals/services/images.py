@@ -1,10 +1,27 @@
 from __future__ import annotations
 
+import logging
+from dataclasses import dataclass
 from pathlib import Path
 from typing import IO, Optional
 from uuid import uuid4
 
 from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# 提案画像の保存と派生画像の作成。アップロードはそのまま保存し、build_variants が
+# EXIF の向きを反映したうえで EXIF を除いた長辺上限付きの原本と、中サイズ・サムネイルを作る。
+
+VARIANT_SUFFIXES = {"medium": "medium", "thumbnail": "thumb"}
+
+
+@dataclass
+class ImageVariants:
+    original: str
+    medium: str = ""
+    thumbnail: str = ""
 
 
 def save_proposal_image(file_obj, management_no: str, kind: str, *, suffix: Optional[str] = None) -> str:
@@ -19,3 +36,86 @@ def save_proposal_image(file_obj, management_no: str, kind: str, *, suffix: Opti
         for chunk in file_obj.chunks() if hasattr(file_obj, "chunks") else [file_obj.read()]:
             dest.write(chunk)
     return str(relative_path).replace("\\", "/")
+
+
+def _media_path(relative_path: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / relative_path
+
+
+def _relative(path: Path) -> str:
+    return str(path.relative_to(Path(settings.MEDIA_ROOT))).replace("\\", "/")
+
+
+def variant_format() -> tuple[str, str]:
+    """派生画像の (Pillow の形式名, 拡張子)。IMAGE_VARIANT_FORMAT が WEBP 以外なら JPEG。"""
+    if getattr(settings, "IMAGE_VARIANT_FORMAT", "WEBP").upper() == "WEBP":
+        return "WEBP", ".webp"
+    return "JPEG", ".jpg"
+
+
+def _save(image: Image.Image, destination: Path, image_format: str, icc_profile: bytes | None) -> None:
+    options = {"optimize": True} if image_format in ("JPEG", "PNG") else {}
+    if image_format == "JPEG":
+        options["quality"] = getattr(settings, "IMAGE_JPEG_QUALITY", 85)
+        options["progressive"] = True
+    elif image_format == "WEBP":
+        options["quality"] = getattr(settings, "IMAGE_WEBP_QUALITY", 80)
+        options["method"] = 4
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    # exif を渡さないため EXIF（撮影位置など）は保存されない
+    image.save(destination, image_format, **options)
+
+
+def _flatten(image: Image.Image, keep_alpha: bool) -> Image.Image:
+    if keep_alpha and image.mode in ("RGBA", "LA", "P"):
+        return image.convert("RGBA")
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image.convert("RGBA"), mask=image.convert("RGBA").getchannel("A"))
+        return background
+    return image.convert("RGB") if image.mode != "RGB" else image
+
+
+def build_variants(relative_path: str) -> ImageVariants:
+    """保存済みのアップロードから原本（長辺上限・EXIF 除去）と中サイズ・サムネイルを作る。
+
+    画像として読めないファイルは原本をそのまま残し、派生画像なし（表示は原本）とする。
+    """
+    source = _media_path(relative_path)
+    original_max = getattr(settings, "IMAGE_ORIGINAL_MAX_SIZE", 2560)
+    medium_size = getattr(settings, "IMAGE_MEDIUM_SIZE", 1280)
+    thumbnail_size = getattr(settings, "IMAGE_THUMBNAIL_SIZE", 320)
+    try:
+        with Image.open(source) as opened:
+            # JPEG はデコード時に縮小して読み込む（長辺上限を下回らない範囲）
+            opened.draft("RGB", (original_max, original_max))
+            icc_profile = opened.info.get("icc_profile")
+            has_alpha = opened.mode in ("RGBA", "LA") or "transparency" in opened.info
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        logger.warning("[images] %s is not a readable image, keeping it as is: %s", relative_path, exc)
+        return ImageVariants(original=relative_path)
+
+    # 原本: 透過 PNG は PNG、それ以外は JPEG で保存し直す
+    image.thumbnail((original_max, original_max), Image.Resampling.LANCZOS)
+    original_format, original_ext = ("PNG", ".png") if has_alpha else ("JPEG", ".jpg")
+    image = _flatten(image, keep_alpha=has_alpha)
+    original = source.with_suffix(original_ext)
+    _save(image, original, original_format, icc_profile)
+    if original != source:
+        source.unlink(missing_ok=True)
+
+    image_format, ext = variant_format()
+    paths = {}
+    for name, size in (("medium", medium_size), ("thumbnail", thumbnail_size)):
+        # サムネイルは中サイズから縮小する（原本からより速い）
+        image = image.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        if image_format == "JPEG":
+            image = _flatten(image, keep_alpha=False)
+        destination = source.with_name(f"{source.stem}.{VARIANT_SUFFIXES[name]}{ext}")
+        _save(image, destination, image_format, icc_profile)
+        paths[name] = _relative(destination)
+    return ImageVariants(original=_relative(original), medium=paths["medium"], thumbnail=paths["thumbnail"])
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+from django.db import transaction
+from django.db.models import Max
+
+from proposals.models import Department, Employee, ImprovementProposal, ProposalApproval
+from proposals.services import analytics, sequences
+from proposals.services.workflow import compute_stage_state
+
+# 過去実績（CSV）の一括取込。部署・従業員は最初に1回だけ読み込んで辞書で引き、
+# 提案と承認は chunk_size 行ごとに bulk_create して行ごとのクエリを発行しない（チャンク単位でコミット）。
+
+CLASSIFICATION_MAP = {
+    "努力": ImprovementProposal.ProposalClassification.EFFORT,
+    "努力提案": ImprovementProposal.ProposalClassification.EFFORT,
+    "アイデア": ImprovementProposal.ProposalClassification.IDEA,
+    "アイディア": ImprovementProposal.ProposalClassification.IDEA,
+    "優秀": ImprovementProposal.ProposalClassification.EXCELLENT,
+}
+IMPORTED_BY = "過去実績取込"
+
+
+class DryRunRollback(Exception):
+    """dry-run で全件処理した後にロールバックするための例外。"""
+
+
+@dataclass
+class ImportResult:
+    total: int = 0
+    created: int = 0
+    skipped: int = 0
+    departments_created: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "total": self.total,
+            "created": self.created,
+            "skipped": self.skipped,
+            "departments_created": len(self.departments_created),
+        }
+
+
+def _clean_money(value):
+    if value is None or pd.isna(value):
+        return None
+    text = str(value)
+    digits = re.sub(r"[^\d\.]", "", text)
+    if not digits:
+        return None
+    try:
+        return Decimal(digits)
+    except Exception:
+        return None
+
+
+def _clean_float(value):
+    try:
+        if pd.isna(value):
+            return None
+    except Exception:
+        pass
+    try:
+        return float(value)
+    except Exception:
+        return None
+
+
+def _pick(row: dict, *names):
+    """列名の候補から最初に値がある列を返す（欠損値は None）。"""
+    for name in names:
+        if name in row and not pd.isna(row[name]):
+            return row[name]
+    return None
+
+
+def _division_name(name) -> str | None:
+    if name is None or str(name).strip() == "":
+        return None
+    name = str(name).strip()
+    if name.endswith("事業部") or name.endswith("課"):
+        return name
+    return f"{name}事業部"
+
+
+class _Lookups:
+    """部署（部）と従業員を1回で読み込んだ辞書。"""
+
+    def __init__(self, result: ImportResult):
+        self.result = result
+        self.departments: dict[str, Department] = {}
+        for department in Department.objects.filter(level="division").order_by("id"):
+            self.departments.setdefault(department.name, department)
+        self.employees_by_department: dict[tuple[str, int], Employee] = {}
+        self.employees_by_name: dict[str, Employee] = {}
+        for employee in Employee.objects.all():
+            self.employees_by_department.setdefault((employee.name, employee.department_id), employee)
+            self.employees_by_name.setdefault(employee.name, employee)
+        self.existing_management_nos = set(
+            ImprovementProposal.objects.filter(management_no__startswith="IMP-").values_list("management_no", flat=True)
+        )
+
+    def department(self, raw_name) -> Department | None:
+        name = _division_name(raw_name)
+        if name is None:
+            return None
+        department = self.departments.get(name)
+        if department is None:
+            department = Department.objects.create(name=name, level="division", display_id=0)
+            self.departments[name] = department
+            self.result.departments_created.append(name)
+        return department
+
+    def employee(self, name: str, department: Department | None) -> Employee | None:
+        if not name:
+            return None
+        if department is not None:
+            return self.employees_by_department.get((name, department.pk))
+        return self.employees_by_name.get(name)
+
+
+def _build_proposal(row: dict, index: int, lookups: _Lookups) -> tuple[ImprovementProposal, list[ProposalApproval]] | None:
+    from proposals.views import calculate_classification_points
+
+    term = int(_pick(row, "期") or 0)
+    quarter = _clean_float(_pick(row, "四半期"))
+    serial = _clean_float(_pick(row, "通し"))
+    year = int(_pick(row, "年") or 0)
+    month = int(_pick(row, "月") or 1)
+    day = int(_pick(row, "日") or 1)
+    submitted_at = datetime(year, month, day, 9, 0, 0)
+
+    serial_number = int(serial) if serial is not None and not math.isnan(serial) else None
+    # Build a stable management number to avoid duplicates
+    management_no = f"IMP-{term}-{serial_number if serial_number is not None else index:04d}-{index:03d}"
+    if management_no in lookups.existing_management_nos:
+        return None
+    lookups.existing_management_nos.add(management_no)
+
+    department = lookups.department(_pick(row, "部門", "部、課"))
+    proposer_name = str(_pick(row, "氏名") or "").strip()
+    employee = lookups.employee(proposer_name, department)
+
+    classification_label = str(_pick(row, "判定区分") or "").strip()
+    classification_value = CLASSIFICATION_MAP.get(classification_label, ImprovementProposal.ProposalClassification.EFFORT)
+    theme = str(_pick(row, "テーマ") or "").strip()
+
+    proposal = ImprovementProposal(
+        management_no=management_no,
+        submitted_at=submitted_at,
+        department=department,
+        proposer=employee,
+        proposer_name=proposer_name or "不明",
+        deployment_item=theme or "",
+        problem_summary=theme or "（未入力）",
+        improvement_plan=theme or "（未入力）",
+        improvement_result="",
+        effect_details=theme or "",
+        reduction_hours=_clean_float(_pick(row, "削減工数\n[Hr/月]", "削減工数[Hr/月]")),
+        effect_amount=_clean_money(_pick(row, " 月額効果\n[\\/月] ", "月額効果[¥/月]")),
+        proposal_classification=classification_value,
+        classification_points=calculate_classification_points(classification_value),
+        term=term or None,
+        quarter=int(quarter) if quarter is not None else None,
+        serial_number=serial_number,
+        # 事業部列は効果部門として保持
+        contribution_business=str(_pick(row, "事業部") or ""),
+        mindset_score=_clean_float(_pick(row, "マインド")),
+        idea_score=_clean_float(_pick(row, "アイデア")),
+        hint_score=_clean_float(_pick(row, "ヒント")),
+    )
+
+    # Create approvals (all approved)
+    approvals = []
+    for stage in ProposalApproval.Stage:
+        is_manager = stage == ProposalApproval.Stage.MANAGER
+        approvals.append(
+            ProposalApproval(
+                stage=stage,
+                status=ProposalApproval.Status.APPROVED,
+                confirmed_name=IMPORTED_BY,
+                confirmed_at=submitted_at,
+                mindset_score=proposal.mindset_score if is_manager else None,
+                idea_score=proposal.idea_score if is_manager else None,
+                hint_score=proposal.hint_score if is_manager else None,
+                sdgs_flag=bool(row.get("SDGs")) if is_manager else False,
+                safety_flag=bool(row.get("安全")) if is_manager else False,
+            )
+        )
+    proposal.current_stage, proposal.current_status, proposal.is_completed = compute_stage_state(approvals)
+    return proposal, approvals
+
+
+def _save_chunk(built: list[tuple[ImprovementProposal, list[ProposalApproval]]]) -> None:
+    proposals = ImprovementProposal.objects.bulk_create([proposal for proposal, _ in built])
+    if any(proposal.pk is None for proposal in proposals):
+        # bulk_create で主キーが返らない DB（MySQL）は管理番号で引き直す
+        ids = dict(
+            ImprovementProposal.objects.filter(
+                management_no__in=[proposal.management_no for proposal in proposals]
+            ).values_list("management_no", "pk")
+        )
+        for proposal in proposals:
+            proposal.pk = ids[proposal.management_no]
+    approvals = []
+    for proposal, proposal_approvals in built:
+        for approval in proposal_approvals:
+            approval.proposal_id = proposal.pk
+            approvals.append(approval)
+    ProposalApproval.objects.bulk_create(approvals)
+
+
+def _sync_serial_sequences(terms: set[int]) -> None:
+    # 取込んだ通し番号の後から自動採番を続ける
+    for term, max_serial in (
+        ImprovementProposal.objects.filter(term__in=terms, serial_number__isnull=False)
+        .values("term")
+        .annotate(max_serial=Max("serial_number"))
+        .values_list("term", "max_serial")
+    ):
+        sequences.ensure_serial_at_least(term, max_serial)
+
+
+def _run(
+    rows: list[dict],
+    chunk_size: int,
+    dry_run: bool,
+    progress: Callable[[int, int, ImportResult], None] | None,
+) -> ImportResult:
+    result = ImportResult(total=len(rows))
+    lookups = _Lookups(result)
+    terms: set[int] = set()
+    for start in range(0, len(rows), chunk_size):
+        with transaction.atomic():
+            built = []
+            for index, row in enumerate(rows[start:start + chunk_size], start=start):
+                item = _build_proposal(row, index, lookups)
+                if item is None:
+                    result.skipped += 1
+                    continue
+                built.append(item)
+                if item[0].term:
+                    terms.add(item[0].term)
+            if built:
+                _save_chunk(built)
+            result.created += len(built)
+        if progress:
+            progress(min(start + chunk_size, len(rows)), len(rows), result)
+
+    if terms:
+        _sync_serial_sequences(terms)
+    if not dry_run and result.created:
+        # 取込後の初回参照時に分析集計を期単位で再構築する
+        analytics.invalidate_terms()
+    return result
+
+
+def import_jiseki(
+    source: Path | str | pd.DataFrame,
+    chunk_size: int = 500,
+    dry_run: bool = False,
+    encoding: str = "utf-8-sig",
+    progress: Callable[[int, int, ImportResult], None] | None = None,
+) -> ImportResult:
+    """過去実績 CSV を取り込む。dry_run では全件を同じ手順で処理した後にロールバックする。"""
+    df = source if isinstance(source, pd.DataFrame) else pd.read_csv(source, encoding=encoding)
+    rows = df.to_dict("records")
+    if not dry_run:
+        return _run(rows, chunk_size, dry_run, progress)
+
+    outcome: dict[str, ImportResult] = {}
+    try:
+        with transaction.atomic():
+            outcome["result"] = _run(rows, chunk_size, dry_run, progress)
+            raise DryRunRollback
+    except DryRunRollback:
+        pass
+    return outcome["result"]
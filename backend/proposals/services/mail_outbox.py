@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from itertools import groupby
+from typing import Iterable
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from proposals.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# 通知メールの送信箱。提出・承認のリクエストは EmailOutbox に行を追加するだけで SMTP に接続しない。
+# 送信は send_outbox_mail ワーカーが行い、同じ送信者のメールは1本の SMTP 接続でまとめて送る。
+
+SMTP_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+
+
+def enqueue(
+    kind: str,
+    subject: str,
+    body: str,
+    recipients: Iterable[str],
+    sender=None,
+    proposal=None,
+) -> EmailOutbox | None:
+    """送信待ちメールを登録する（呼び出し元のトランザクションに含まれる）。"""
+    recipients = list(dict.fromkeys(address for address in recipients if address))
+    if not recipients:
+        return None
+    return EmailOutbox.objects.create(
+        kind=kind,
+        subject=subject,
+        body=body,
+        recipients=recipients,
+        sender=sender if getattr(sender, "is_authenticated", False) else None,
+        proposal=proposal,
+    )
+
+
+def uses_smtp_backend() -> bool:
+    return settings.EMAIL_BACKEND == SMTP_BACKEND
+
+
+def sender_has_smtp(user) -> bool:
+    """送信者の UserProfile に SMTP 設定が揃っているか。"""
+    profile = getattr(user, "profile", None) if user is not None else None
+    return bool(
+        profile
+        and profile.smtp_host
+        and profile.smtp_user
+        and profile.smtp_password
+        and user.email
+    )
+
+
+def sender_connection(user):
+    """送信者の SMTP 設定による接続と From アドレス（設定がなければ既定の接続）。"""
+    if uses_smtp_backend() and sender_has_smtp(user):
+        profile = user.profile
+        # 開発環境では暗号化なしで接続（TLSをオフ）
+        connection = get_connection(
+            backend=SMTP_BACKEND,
+            host=profile.smtp_host,
+            port=profile.smtp_port or 587,
+            username=profile.smtp_user,
+            password=profile.smtp_password,
+            use_tls=False,
+            fail_silently=False,
+        )
+        return connection, user.email
+    return get_connection(fail_silently=False), settings.DEFAULT_FROM_EMAIL
+
+
+def retry_delay(attempts: int) -> timedelta:
+    base = getattr(settings, "EMAIL_OUTBOX_RETRY_BASE_SECONDS", 60)
+    ceiling = getattr(settings, "EMAIL_OUTBOX_RETRY_MAX_SECONDS", 3600)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), ceiling))
+
+
+def requeue_stale(stale_seconds: int | None = None) -> int:
+    """送信中のまま一定時間経過したメール（ワーカー停止など）を送信待ちに戻す。"""
+    if stale_seconds is None:
+        stale_seconds = getattr(settings, "EMAIL_OUTBOX_STALE_SECONDS", 600)
+    threshold = timezone.now() - timedelta(seconds=stale_seconds)
+    return EmailOutbox.objects.filter(
+        status=EmailOutbox.Status.SENDING, locked_at__lt=threshold
+    ).update(status=EmailOutbox.Status.PENDING, locked_at=None)
+
+
+def claim_batch(limit: int | None = None) -> list[EmailOutbox]:
+    """送信期限を迎えたメールを取り出して送信中にする（複数ワーカーでも重複しない）。"""
+    if limit is None:
+        limit = getattr(settings, "EMAIL_OUTBOX_BATCH_SIZE", 50)
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.Status.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        if messages:
+            EmailOutbox.objects.filter(pk__in=[message.pk for message in messages]).update(
+                status=EmailOutbox.Status.SENDING, locked_at=now
+            )
+    return messages
+
+
+def _mark_failed_attempt(message: EmailOutbox, error: Exception) -> None:
+    message.attempts += 1
+    message.last_error = str(error)
+    message.locked_at = None
+    if message.attempts >= getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 6):
+        message.status = EmailOutbox.Status.FAILED
+        logger.error("[mail] outbox id=%s gave up after %s attempts: %s", message.pk, message.attempts, error)
+    else:
+        message.status = EmailOutbox.Status.PENDING
+        message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+        logger.warning("[mail] outbox id=%s attempt %s failed: %s", message.pk, message.attempts, error)
+    message.save(update_fields=["attempts", "last_error", "locked_at", "status", "next_attempt_at"])
+
+
+def _mark_sent(message: EmailOutbox) -> None:
+    message.attempts += 1
+    message.status = EmailOutbox.Status.SENT
+    message.sent_at = timezone.now()
+    message.locked_at = None
+    message.last_error = ""
+    message.save(update_fields=["attempts", "status", "sent_at", "locked_at", "last_error"])
+
+
+def _deliver_sender_group(sender, messages: list[EmailOutbox]) -> int:
+    """同じ送信者のメールを1本の接続で送る。接続に失敗したときは全件を再送待ちにする。"""
+    try:
+        connection, from_email = sender_connection(sender)
+        connection.open()
+    except Exception as exc:
+        for message in messages:
+            _mark_failed_attempt(message, exc)
+        return 0
+
+    sent = 0
+    try:
+        for message in messages:
+            email = EmailMessage(
+                subject=message.subject,
+                body=message.body,
+                from_email=from_email,
+                to=message.recipients,
+                connection=connection,
+            )
+            try:
+                email.send(fail_silently=False)
+            except Exception as exc:
+                _mark_failed_attempt(message, exc)
+                continue
+            _mark_sent(message)
+            sent += 1
+            logger.info("[mail] outbox id=%s sent to=%s from=%s", message.pk, message.recipients, from_email)
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            logger.warning("[mail] failed to close connection for sender=%s", getattr(sender, "pk", None))
+    return sent
+
+
+def deliver_pending(limit: int | None = None) -> tuple[int, int]:
+    """送信期限を迎えたメールを1バッチ送信する。(取り出した件数, 送信できた件数) を返す。"""
+    messages = claim_batch(limit)
+    if not messages:
+        return 0, 0
+    # 送信者の SMTP 設定を1回で読み込む
+    senders = {
+        message.sender_id: message.sender
+        for message in EmailOutbox.objects.filter(pk__in=[m.pk for m in messages]).select_related("sender__profile")
+    }
+    messages.sort(key=lambda message: (message.sender_id or 0, message.pk))
+    sent = 0
+    for sender_id, group in groupby(messages, key=lambda message: message.sender_id):
+        sent += _deliver_sender_group(senders.get(sender_id), list(group))
+    return len(messages), sent
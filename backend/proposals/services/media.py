@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core.signing import Signer
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
+
+# 提案画像の URL と配信。URL には ?v=<版>（ProposalImage.version）を付け、内容が変われば URL も変わるため
+# ブラウザ・nginx は1年間再取得せずに使える。版は書込時に決めて保存し、URL を作るたびにファイルを stat しない。
+# MEDIA_SENDFILE_BACKEND を設定すると /api/media/ の署名付き URL を返し、API がログインと署名を確かめたうえで
+# nginx（X-Accel-Redirect）/ Apache など（X-Sendfile）にファイル本体の送信を任せる。
+
+SENDFILE_BACKENDS = ("nginx", "sendfile", "django")
+PROTECTED_URL_PREFIX = "/api/media/"
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_signer = Signer(salt="proposals.media")
+
+
+def sendfile_backend() -> str:
+    backend = getattr(settings, "MEDIA_SENDFILE_BACKEND", "")
+    return backend if backend in SENDFILE_BACKENDS else ""
+
+
+def fingerprint(relative_path: str) -> str:
+    """ファイルの指紋（更新時刻とサイズ）。ファイルがなければ空。"""
+    try:
+        stat = os.stat(absolute_path(relative_path))
+    except (OSError, ValueError):
+        return ""
+    return hashlib.sha1(f"{stat.st_mtime_ns}:{stat.st_size}".encode()).hexdigest()[:12]
+
+
+def image_version(blob, original_path: str) -> str:
+    """変換済みの画像の版。blob はパスが内容で決まるため SHA-256、blob 導入前のファイルは書込時の指紋。"""
+    return blob.sha256[:12] if blob is not None else fingerprint(original_path)
+
+
+def absolute_path(relative_path: str) -> Path:
+    """MEDIA_ROOT 配下の絶対パス（外に出るパスは SuspiciousFileOperation）。"""
+    return Path(safe_join(settings.MEDIA_ROOT, relative_path))
+
+
+def signature(relative_path: str, version: str) -> str:
+    return _signer.signature(f"{relative_path}?{version}")
+
+
+def verify(relative_path: str, version: str, value: str) -> bool:
+    return bool(value) and constant_time_compare(signature(relative_path, version), value)
+
+
+def media_path(relative_path: str, version: str = "") -> str:
+    """MEDIA_ROOT からの相対パスを版付きの URL パスにする。"""
+    relative_path = str(relative_path).lstrip("/")
+    if sendfile_backend():
+        query = {"v": version, "s": signature(relative_path, version)}
+        return f"{PROTECTED_URL_PREFIX}{quote(relative_path)}?{urlencode(query)}"
+    url = f"{settings.MEDIA_URL.rstrip('/')}/{relative_path}"
+    return f"{url}?{urlencode({'v': version})}" if version else url
+
+
+def content_type(relative_path: str) -> str:
+    return mimetypes.guess_type(relative_path)[0] or "application/octet-stream"
+
+
+def accel_redirect_path(relative_path: str) -> str:
+    prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+    return f"{prefix.rstrip('/')}/{quote(relative_path)}"
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import caches
+
+from proposals.models import Department
+from proposals.services import cache_versions
+
+# 参照データ（部署一覧・在籍従業員一覧）のキャッシュ。データセットごとの版数をキーに含めて
+# シリアライズ済みの一覧を保存し、版数を ETag として返す（If-None-Match が一致すれば 304）。
+# 版数は DB（CacheVersion）に置き、Department / Employee の保存・削除シグナル（proposals.signals）と一括取込で更新する。
+# 一覧そのものはプロセスごとのキャッシュでよい（版数が変われば別のキーになるため、どのプロセスも古い一覧を返さない）。
+
+DEPARTMENTS = "departments"
+EMPLOYEES = "employees"
+
+
+def _cache():
+    return caches[getattr(settings, "REFERENCE_DATA_CACHE", "default")]
+
+
+def _ttl() -> int:
+    return getattr(settings, "REFERENCE_DATA_TTL", 300)
+
+
+def _version_name(dataset: str) -> str:
+    return f"reference:{dataset}"
+
+
+def versions(*datasets: str) -> tuple[str, ...]:
+    """データセットの現在の版数（1 クエリ）。"""
+    current = cache_versions.current(*(_version_name(dataset) for dataset in datasets))
+    return tuple(current[_version_name(dataset)] for dataset in datasets)
+
+
+def bump(*datasets: str) -> None:
+    """版数を更新する（保存と同じトランザクションで更新し、ロールバック時は元に戻る）。"""
+    datasets = datasets or (DEPARTMENTS, EMPLOYEES)
+    cache_versions.bump(*(_version_name(dataset) for dataset in datasets))
+
+
+def etag(dataset: str, current: str) -> str:
+    return f'"{dataset}-{current}"'
+
+
+def cached(dataset: str, variant: str, builder: Callable[[], Any]) -> tuple[str, Any]:
+    """(版数, データ)。現在の版でキャッシュがなければ builder で作って保存する。"""
+    (current,) = versions(dataset)
+    key = f"proposals:reference:{dataset}:{current}:{variant}"
+    cache = _cache()
+    data = cache.get(key)
+    if data is None:
+        data = builder()
+        cache.set(key, data, _ttl())
+    return current, data
+
+
+def department_levels() -> dict[int, str]:
+    """部署ID → 階層（level）。"""
+    _, levels = cached(DEPARTMENTS, "levels", lambda: dict(Department.objects.values_list("id", "level")))
+    return levels
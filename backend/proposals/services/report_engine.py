@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import islice
+from types import SimpleNamespace
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+from proposals.models import ImprovementProposal, ProposalApproval
+from proposals.services import fiscal
+from proposals.services.reports import (
+    PERSON_SUMMARY_COLUMNS,
+    SUMMARY_COLUMNS,
+    _normalize_text_list,
+    _share_weights,
+    _to_decimal,
+    department_month_frame,
+    employment_label,
+    person_summary_frame,
+)
+
+# 列指向の集計エンジン。
+# 提案を1回だけ走査して「提案」表と「共同提案者」縦持ち表（共同提案者なしの提案は1行）を作り、
+# 件数按分・ポイント・削減時間・効果額を整数（1/100 単位）で持って groupby / pivot で集計する。
+# 出力は reports.build_summary_dataframe / build_person_summary / build_department_month_matrix と一致する。
+
+CONTRIBUTION_COLUMNS = [
+    "pid", "position", "has_contributor", "keep", "share_percent", "share_units", "share_exact",
+    "is_primary", "has_employee", "employee_name", "employee_dept", "entry_name",
+    "employment", "points_cents", "reward_yen",
+]
+
+
+def _cents(value: Any) -> int:
+    return int((value * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def _share_units(share: Decimal) -> tuple[int, bool]:
+    """share_percent を 1/100 単位の整数に変換する（小数2桁を超える端数があれば False）。"""
+    if share <= 0:
+        return 0, True
+    scaled = share * 100
+    return int(scaled), scaled == scaled.to_integral_value()
+
+
+def explode_proposals(
+    proposals: Iterable[ImprovementProposal],
+    term_number: int,
+    department_filter: str | None = None,
+    start: int = 1,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """提案表（index=pid）と共同提案者の縦持ち表を返す。start は通し番号の補完に使う連番の開始値。"""
+    proposal_rows = []
+    contribution_rows = []
+    for i, p in enumerate(proposals, start):
+        submitted_at = p.submitted_at.astimezone(timezone.get_current_timezone()) if p.submitted_at else None
+
+        approvals = {a.stage: a for a in p.approvals.all()}
+        manager_approval = approvals.get(ProposalApproval.Stage.MANAGER)
+        committee_approval = approvals.get(ProposalApproval.Stage.COMMITTEE)
+        mindset = getattr(committee_approval, "mindset_score", None) or getattr(manager_approval, "mindset_score", None)
+        idea = getattr(committee_approval, "idea_score", None) or getattr(manager_approval, "idea_score", None)
+        hint = getattr(committee_approval, "hint_score", None) or getattr(manager_approval, "hint_score", None)
+
+        dept_name = p.department.name if p.department else ""
+        contributors = getattr(p, "_prefetched_objects_cache", {}).get("contributors")
+        if contributors is None:
+            contributors = list(p.contributors.select_related("employee__department"))
+
+        keep = [True] * len(contributors)
+        if department_filter and contributors:
+            keep = [
+                (c.employee and c.employee.department and c.employee.department.name == department_filter)
+                or (not c.employee and dept_name == department_filter)
+                for c in contributors
+            ]
+            if not any(keep):
+                continue
+        elif department_filter:
+            continue
+
+        sdgs_checked = bool(getattr(manager_approval, "sdgs_flag", False))
+        safety_checked = bool(getattr(manager_approval, "safety_flag", False))
+        effect_dept = _normalize_text_list(p.contribution_business)
+        pid = len(proposal_rows)
+        proposal_rows.append({
+            "期": p.term or (fiscal.fiscal_term(submitted_at) if submitted_at else None),
+            "四半期": p.quarter or (fiscal.fiscal_quarter(submitted_at) if submitted_at else None),
+            "通し番号": p.serial_number or i,
+            "年": submitted_at.year if submitted_at else None,
+            "月": submitted_at.month if submitted_at else None,
+            "日": submitted_at.day if submitted_at else None,
+            "提案部門": dept_name,
+            "効果部門": effect_dept.split(",")[0].strip() if effect_dept else "",
+            "提案者": p.proposer_name,
+            "雇用形態": employment_label(p.proposer),
+            "改善テーマ": p.deployment_item,
+            "マインドセット": mindset,
+            "アイデア工夫": idea,
+            "みんなのヒント": hint,
+            "判定区分": p.committee_classification or p.proposal_classification or "通常",
+            "保留": "",
+            "提案ポイント": p.classification_points or 0,
+            "報奨金": "",
+            "効果額": p.effect_amount or 0.0,
+            "削減時間": p.reduction_hours or 0.0,
+            "出金": "",
+            "効果内容・効果算出": p.effect_details or "",
+            "sdgs_checked": sdgs_checked,
+            "safety_checked": safety_checked,
+        })
+
+        if not contributors:
+            contribution_rows.append((
+                pid, 0, False, True, None, 0, True, True, False, None, None, None, None, None, None,
+            ))
+            continue
+        for position, (contrib, kept) in enumerate(zip(contributors, keep)):
+            employee = getattr(contrib, "employee", None)
+            share = _to_decimal(getattr(contrib, "share_percent", None)) or Decimal("0")
+            units, exact = _share_units(share)
+            points = _to_decimal(getattr(contrib, "classification_points_share", None))
+            reward = _to_decimal(getattr(contrib, "reward_amount", None))
+            contribution_rows.append((
+                pid,
+                position,
+                True,
+                bool(kept),
+                share,
+                units,
+                exact,
+                bool(getattr(contrib, "is_primary", False)),
+                employee is not None,
+                getattr(employee, "name", None),
+                getattr(getattr(employee, "department", None), "name", None),
+                getattr(contrib, "employee_name", None),
+                employment_label(employee) if employee else "",
+                _cents(points) if points is not None else None,
+                int(reward.quantize(Decimal("0"), rounding=ROUND_HALF_UP)) if reward is not None else None,
+            ))
+
+    proposal_df = pd.DataFrame(proposal_rows)
+    contribution_df = pd.DataFrame(contribution_rows, columns=CONTRIBUTION_COLUMNS)
+    if proposal_df.empty:
+        return proposal_df, contribution_df
+
+    contribution_df["share_cents"] = share_cents(contribution_df)
+    contribution_df = contribution_df[contribution_df["keep"]].reset_index(drop=True)
+
+    in_term = proposal_df["期"] == term_number
+    proposal_df = proposal_df[in_term].copy()
+    contribution_df = contribution_df[contribution_df["pid"].isin(proposal_df.index)].reset_index(drop=True)
+    return proposal_df, contribution_df
+
+
+def share_cents(contribution_df: pd.DataFrame) -> pd.Series:
+    """件数按分（合計100）を最大剰余法で求める（reports._share_weights と同じ丸め）。
+
+    比率 units / total の 100 倍を整数除算し、余りの大きい順（同値は並び順）に残りを配る。
+    余りが同値のまま配分境界をまたぐ提案は、Decimal の丸め誤差で順序が変わりうるため
+    _share_weights で個別に計算する。
+    """
+    frame = contribution_df[contribution_df["has_contributor"]]
+    result = pd.Series(100, index=contribution_df.index, dtype="int64")
+    if frame.empty:
+        return result
+
+    pid = frame["pid"]
+    units = frame["share_units"].astype("int64")
+    total = units.groupby(pid).transform("sum")
+    equal = total <= 0
+    units = units.where(~equal, 1)
+    total = total.where(~equal, units.groupby(pid).transform("size"))
+
+    scaled = units * 100
+    floor = scaled // total
+    remainder = scaled % total
+    remaining = 100 - floor.groupby(pid).transform("sum")
+
+    ordered = pd.DataFrame({"pid": pid, "remainder": remainder, "position": frame["position"]})
+    ordered = ordered.sort_values(["pid", "remainder", "position"], ascending=[True, False, True], kind="stable")
+    ordered = ordered.assign(rank=ordered.groupby("pid").cumcount(), remaining=remaining)
+    cents = floor + (ordered["rank"] < ordered["remaining"]).reindex(frame.index).astype("int64")
+
+    # 配分境界の前後で余りが同値（均等割りを除く）の提案と、小数2桁を超える share は従来計算で確定
+    last_in = ordered[ordered["rank"] == ordered["remaining"] - 1].set_index("pid")["remainder"]
+    first_out = ordered[ordered["rank"] == ordered["remaining"]].set_index("pid")["remainder"]
+    tied = last_in == first_out.reindex(last_in.index)
+    ambiguous = (pid.isin(tied[tied].index) & ~equal) | pid.isin(pid[~frame["share_exact"]])
+    for _, group in frame[ambiguous].groupby("pid", sort=False):
+        group = group.sort_values("position")
+        weights = _share_weights([SimpleNamespace(share_percent=share) for share in group["share_percent"]])
+        cents.loc[group.index] = [int(weight * 100) for weight in weights]
+
+    result.loc[frame.index] = cents.astype("int64")
+    return result
+
+
+def _decimal_cents(value: int) -> Decimal:
+    return Decimal(int(value)).scaleb(-2)
+
+
+def _amount_cents(values: pd.Series) -> pd.Series:
+    return values.map(lambda value: _cents(_to_decimal(value) or Decimal("0"))).astype("int64")
+
+
+def _score_int(values: pd.Series, mask: pd.Series) -> list:
+    """reports._safe_int 相当（主提案者のみ、欠損は空文字）。"""
+    present = mask & values.notna()
+    ints = values.where(present, 0).astype("int64")
+    return [int(v) if p else "" for v, p in zip(ints.to_numpy(), present.to_numpy())]
+
+
+def _contributions_with_proposals(proposal_df: pd.DataFrame, contribution_df: pd.DataFrame) -> pd.DataFrame:
+    """共同提案者行に提案の列を結合し、集計キーと整数化した金額列を付ける。"""
+    merged = contribution_df.join(proposal_df, on="pid")
+    has_contributor = merged["has_contributor"]
+    dept_default = merged["提案部門"].where(merged["提案部門"].astype(bool), "未設定")
+    person_default = merged["提案者"].where(merged["提案者"].fillna("").astype(bool), "未設定")
+    merged["dept_key"] = merged["employee_dept"].where(
+        has_contributor & merged["employee_dept"].fillna("").astype(bool), dept_default
+    )
+    merged["person_key"] = merged["employee_name"].where(
+        has_contributor & merged["employee_name"].fillna("").astype(bool), person_default
+    )
+
+    # ポイント・報奨金の按分が未設定なら（部門フィルター後の）人数で均等割り
+    contributor_count = merged.groupby("pid")["pid"].transform("size").astype("int64")
+    total_points = merged["提案ポイント"].map(lambda value: int(_to_decimal(value) or 0)).astype("int64")
+    points_default = (2 * total_points * 100 + contributor_count) // (2 * contributor_count)
+    reward_default = (2 * total_points * 300 + contributor_count) // (2 * contributor_count)
+    merged["points_cents"] = (
+        merged["points_cents"].where(merged["points_cents"].notna(), points_default)
+        .where(has_contributor, total_points * 100).astype("int64")
+    )
+    merged["reward_yen"] = (
+        merged["reward_yen"].where(merged["reward_yen"].notna(), reward_default)
+        .where(has_contributor, total_points * 300).astype("int64")
+    )
+    merged["reduction_cents"] = _amount_cents(merged["削減時間"]).where(merged["is_primary"], 0)
+    merged["effect_cents"] = _amount_cents(merged["効果額"]).where(merged["is_primary"], 0)
+    for column in ("マインドセット", "アイデア工夫", "みんなのヒント"):
+        scores = pd.to_numeric(merged[column], errors="coerce")
+        present = scores.notna()
+        merged[f"{column}_sum"] = (scores.fillna(0).astype("int64") * merged["share_cents"]).where(present, 0)
+        merged[f"{column}_w"] = merged["share_cents"].where(present, 0)
+    return merged
+
+
+def summary_frame(merged: pd.DataFrame) -> pd.DataFrame:
+    """実績まとめシート（共同提案者ごとに1行）。"""
+    if merged.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    has_contributor = merged["has_contributor"]
+    primary = merged["is_primary"]
+    blank = pd.Series("", index=merged.index, dtype=object)
+
+    name = merged["employee_name"].where(merged["employee_name"].fillna("").astype(bool), merged["entry_name"])
+    name = name.where(name.fillna("").astype(bool), merged["提案者"]).where(has_contributor, merged["提案者"])
+    dept = merged["employee_dept"].where(merged["employee_dept"].fillna("").astype(bool), merged["提案部門"])
+    dept = dept.where(has_contributor, merged["提案部門"])
+    employment = merged["employment"].where(has_contributor, merged["雇用形態"].fillna(""))
+
+    columns = {
+        "期": merged["期"].tolist(),
+        "四半期": merged["四半期"].tolist(),
+        "通し番号": merged["通し番号"].tolist(),
+        "年": merged["年"].tolist(),
+        "月": merged["月"].tolist(),
+        "日": merged["日"].tolist(),
+        "提案部門": dept.tolist(),
+        "効果部門": merged["効果部門"].tolist(),
+        "提案者": name.tolist(),
+        "雇用形態": employment.tolist(),
+        "共同提案": np.where(primary, "主", "共同").tolist(),
+        "件数": (merged["share_cents"] / 100).tolist(),
+        "改善テーマ": merged["改善テーマ"].tolist(),
+        "マインド": _score_int(pd.to_numeric(merged["マインドセット"], errors="coerce"), primary),
+        "アイデア": _score_int(pd.to_numeric(merged["アイデア工夫"], errors="coerce"), primary),
+        "ヒント": _score_int(pd.to_numeric(merged["みんなのヒント"], errors="coerce"), primary),
+        "SDGs": np.where(primary & merged["sdgs_checked"], "○", "").tolist(),
+        "安全": np.where(primary & merged["safety_checked"], "○", "").tolist(),
+        "判定区分": merged["判定区分"].tolist(),
+        "保留": merged["保留"].tolist(),
+        "提案ポイント": (merged["points_cents"] / 100).tolist(),
+        "報奨金": merged["reward_yen"].tolist(),
+        "月額効果[¥/月]": merged["効果額"].where(primary, blank).tolist(),
+        "削減工数[Hr/月]": merged["削減時間"].where(primary, blank).tolist(),
+        "出金": merged["出金"].tolist(),
+        "効果内容・効果算出": merged["効果内容・効果算出"].tolist(),
+    }
+    return pd.DataFrame(columns, columns=SUMMARY_COLUMNS)
+
+
+def person_totals(merged: pd.DataFrame) -> pd.DataFrame:
+    """(部署, 提案者) ごとの整数累計（1/100 単位）。チャンクごとの結果は combine_totals で合算できる。"""
+    return merged.groupby(["dept_key", "person_key"], sort=False).agg(
+        count=("share_cents", "sum"),
+        mindset_sum=("マインドセット_sum", "sum"),
+        mindset_w=("マインドセット_w", "sum"),
+        idea_sum=("アイデア工夫_sum", "sum"),
+        idea_w=("アイデア工夫_w", "sum"),
+        hint_sum=("みんなのヒント_sum", "sum"),
+        hint_w=("みんなのヒント_w", "sum"),
+        proposal_points=("points_cents", "sum"),
+        reduction=("reduction_cents", "sum"),
+        effect=("effect_cents", "sum"),
+    )
+
+
+def department_totals(merged: pd.DataFrame) -> pd.DataFrame:
+    """部署×月の件数按分の整数累計（1/100 単位、pivot）。"""
+    dated = merged[merged["月"].notna()]
+    return dated.assign(month=dated["月"].astype("int64")).pivot_table(
+        index="dept_key", columns="month", values="share_cents", aggfunc="sum", fill_value=0, sort=False
+    )
+
+
+def combine_totals(totals: pd.DataFrame | None, chunk: pd.DataFrame) -> pd.DataFrame:
+    if totals is None or totals.empty:
+        return chunk
+    combined = pd.concat([totals, chunk]).fillna(0).astype("int64")
+    return combined.groupby(level=list(range(combined.index.nlevels)), sort=False).sum()
+
+
+def person_summary_from_totals(totals: pd.DataFrame | None) -> pd.DataFrame:
+    if totals is None or totals.empty:
+        return pd.DataFrame(columns=PERSON_SUMMARY_COLUMNS)
+    summary = {
+        key: {name: _decimal_cents(value) for name, value in values.items()}
+        for key, values in totals.to_dict(orient="index").items()
+    }
+    return person_summary_frame(summary)
+
+
+def department_matrix_from_totals(totals: pd.DataFrame | None) -> pd.DataFrame:
+    month_numbers = fiscal.fiscal_month_sequence()
+    if totals is None or totals.empty:
+        columns = ["部署"] + [f"{month}月" for month in month_numbers] + ["年間合計"]
+        return pd.DataFrame(columns=columns)
+    dept_totals = {
+        dept_name: {month: _decimal_cents(row.get(month, 0)) for month in month_numbers}
+        for dept_name, row in totals.to_dict(orient="index").items()
+    }
+    return department_month_frame(dept_totals)
+
+
+def person_summary(merged: pd.DataFrame) -> pd.DataFrame:
+    """部署別氏名一覧（(部署, 提案者) ごとの groupby 集計）。"""
+    return person_summary_from_totals(None if merged.empty else person_totals(merged))
+
+
+def department_month_matrix(merged: pd.DataFrame) -> pd.DataFrame:
+    """特殊ポイント判定表（部署×月の件数按分を pivot）。"""
+    return department_matrix_from_totals(None if merged.empty else department_totals(merged))
+
+
+def iter_merged_chunks(
+    proposals: Iterable[ImprovementProposal],
+    term_number: int,
+    chunk_size: int = 500,
+    department_filter: str | None = None,
+) -> Iterator[pd.DataFrame]:
+    """提案を chunk_size 件ずつ展開した共同提案者行を返す（通し番号の連番は全体で通す）。"""
+    iterator = iter(proposals)
+    start = 1
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        proposal_df, contribution_df = explode_proposals(chunk, term_number, department_filter, start=start)
+        start += len(chunk)
+        if not proposal_df.empty:
+            yield _contributions_with_proposals(proposal_df, contribution_df)
+
+
+def build_report_frames(
+    proposals: Iterable[ImprovementProposal],
+    term_number: int,
+    department_filter: str | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """(実績まとめ, 部署別氏名一覧, 特殊ポイント判定) を返す。"""
+    proposal_df, contribution_df = explode_proposals(proposals, term_number, department_filter)
+    if proposal_df.empty:
+        merged = pd.DataFrame()
+    else:
+        merged = _contributions_with_proposals(proposal_df, contribution_df)
+    return summary_frame(merged), person_summary(merged), department_month_matrix(merged)
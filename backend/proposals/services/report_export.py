@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import math
+import tempfile
+from datetime import datetime
+from typing import IO, Any, Iterable
+
+import pandas as pd
+from django.db.models import Count, QuerySet
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+from proposals.models import ImprovementProposal
+from proposals.services import fiscal
+from proposals.services.report_engine import (
+    combine_totals,
+    department_matrix_from_totals,
+    department_totals,
+    iter_merged_chunks,
+    person_summary_from_totals,
+    person_totals,
+    summary_frame,
+)
+from proposals.services.reports import SUMMARY_COLUMNS
+
+# 期別実績レポートの書き出し（openpyxl write-only）。
+# 実績まとめは提案を chunk_size 件ずつ展開しながら行を追記し、部署別氏名一覧・特殊ポイント判定は
+# 集計値（人数・部署数に比例）だけを保持するので、期間・部署数が増えてもメモリ使用量は一定に近い。
+
+_THIN = Side(style="thin")
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+
+
+def _header(sheet, columns: Iterable[str]) -> list[WriteOnlyCell]:
+    """pandas.to_excel と同じ見出しスタイル（太字・罫線・中央寄せ）。"""
+    cells = []
+    for column in columns:
+        cell = WriteOnlyCell(sheet, value=column)
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+        cells.append(cell)
+    return cells
+
+
+def _cell_value(value: Any) -> Any:
+    """to_excel と同様に欠損値・空文字は空セルにする。"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _append_frame(sheet, frame: pd.DataFrame) -> None:
+    for row in frame.itertuples(index=False, name=None):
+        sheet.append([_cell_value(value) for value in row])
+
+
+def summary_row_count(queryset: QuerySet, term_number: int) -> int:
+    """実績まとめの行数（共同提案者数、共同提案者なしの提案は1行）を先に数える。"""
+    rows = (
+        queryset.select_related(None).prefetch_related(None).order_by()
+        .annotate(contributor_count=Count("contributors", distinct=True))
+        .values_list("term", "submitted_at", "contributor_count")
+    )
+    total = 0
+    for term, submitted_at, contributor_count in rows.iterator():
+        if not term and submitted_at is not None:
+            term = fiscal.fiscal_term(submitted_at.astimezone(timezone.get_current_timezone()))
+        if term == term_number:
+            total += max(contributor_count, 1)
+    return total
+
+
+def write_term_report(
+    queryset: QuerySet[ImprovementProposal],
+    term_number: int,
+    output: IO[bytes],
+    chunk_size: int = 500,
+) -> None:
+    """期別実績レポート（3シート）を output に書き出す。"""
+    workbook = Workbook(write_only=True)
+    summary_sheet = workbook.create_sheet("実績まとめ")
+    summary_sheet.append([f"{term_number}期_改善実績まとめ"])
+    summary_sheet.append([f"対象期: {term_number}期"])
+    summary_sheet.append([f"作成日時: {datetime.now().strftime('%Y-%m-%d %H:%M')}"])
+    summary_sheet.append([f"登録件数: {summary_row_count(queryset, term_number)}"])
+    summary_sheet.append(_header(summary_sheet, SUMMARY_COLUMNS))
+
+    people = None
+    departments = None
+    for merged in iter_merged_chunks(queryset.iterator(chunk_size=chunk_size), term_number, chunk_size):
+        _append_frame(summary_sheet, summary_frame(merged))
+        people = combine_totals(people, person_totals(merged))
+        departments = combine_totals(departments, department_totals(merged))
+
+    for title, frame in (
+        ("部署別氏名一覧", person_summary_from_totals(people)),
+        ("特殊ポイント判定", department_matrix_from_totals(departments)),
+    ):
+        sheet = workbook.create_sheet(title)
+        sheet.append(_header(sheet, frame.columns))
+        _append_frame(sheet, frame)
+
+    workbook.save(output)
+
+
+def export_term_report(queryset: QuerySet[ImprovementProposal], term_number: int) -> IO[bytes]:
+    """一時ファイルに書き出したレポートを先頭に巻き戻して返す（close で削除される）。"""
+    output = tempfile.TemporaryFile(suffix=".xlsx")
+    try:
+        write_term_report(queryset, term_number, output)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
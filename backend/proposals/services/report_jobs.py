@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from proposals.models import ReportDataVersion, ReportJob
+from proposals.services.report_export import write_term_report
+from proposals.services.reports import term_report_queryset
+
+logger = logging.getLogger(__name__)
+
+# 期別レポートは run_report_worker が作成し、期 × データ版数ごとに成果物を保持する。
+# 版数は提案の承認・編集（analytics.refresh_proposal）と部署・従業員の変更（analytics.invalidate_terms）で加算される。
+
+
+def artifact_root() -> Path:
+    return Path(getattr(settings, "REPORT_ARTIFACT_ROOT", Path(settings.BASE_DIR) / "report_artifacts"))
+
+
+def data_version(term_number: int) -> str:
+    versions = dict(
+        ReportDataVersion.objects.filter(
+            term__in=[ReportDataVersion.GLOBAL_TERM, term_number]
+        ).values_list("term", "version")
+    )
+    return f"{versions.get(ReportDataVersion.GLOBAL_TERM, 0)}.{versions.get(term_number, 0)}"
+
+
+def bump_data_version(terms: Iterable[int | None] = ()) -> None:
+    """指定期（省略時は全期共通）の版数を加算する。"""
+    targets = {term for term in terms if term is not None} or {ReportDataVersion.GLOBAL_TERM}
+    for term in targets:
+        updated = ReportDataVersion.objects.filter(term=term).update(version=F("version") + 1)
+        if not updated:
+            ReportDataVersion.objects.get_or_create(term=term, defaults={"version": 1})
+
+
+def artifact_path(job: ReportJob) -> Path | None:
+    if not job.file_path:
+        return None
+    path = artifact_root() / job.file_path
+    return path if path.exists() else None
+
+
+def cached_report(term_number: int) -> ReportJob | None:
+    """現在のデータ版数で作成済みのレポートジョブ（成果物あり）。"""
+    job = (
+        ReportJob.objects.filter(
+            term=term_number,
+            data_version=data_version(term_number),
+            status=ReportJob.Status.SUCCEEDED,
+        )
+        .exclude(file_path="")
+        .first()
+    )
+    return job if job and artifact_path(job) else None
+
+
+def request_report(term_number: int, user=None) -> ReportJob:
+    """レポート作成を依頼する。同じ版数の作成済み・作成待ちジョブがあればそれを返す。"""
+    version = data_version(term_number)
+    existing = ReportJob.objects.filter(
+        term=term_number,
+        data_version=version,
+        status__in=[ReportJob.Status.PENDING, ReportJob.Status.RUNNING, ReportJob.Status.SUCCEEDED],
+    ).first()
+    if existing and (existing.status != ReportJob.Status.SUCCEEDED or artifact_path(existing)):
+        return existing
+    return ReportJob.objects.create(
+        term=term_number,
+        data_version=version,
+        requested_by=user if getattr(user, "is_authenticated", False) else None,
+    )
+
+
+def claim_next_job() -> ReportJob | None:
+    """待機中のジョブを1件取り出して作成中にする（複数ワーカーでも重複しない）。"""
+    with transaction.atomic():
+        job = (
+            ReportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ReportJob.Status.PENDING)
+            .order_by("created_at", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ReportJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at"])
+    return job
+
+
+def requeue_stale_jobs(stale_seconds: int | None = None) -> int:
+    """作成中のまま一定時間経過したジョブ（ワーカー停止など）を待機中に戻す。"""
+    if stale_seconds is None:
+        stale_seconds = getattr(settings, "REPORT_JOB_STALE_SECONDS", 1800)
+    threshold = timezone.now() - timedelta(seconds=stale_seconds)
+    return ReportJob.objects.filter(
+        status=ReportJob.Status.RUNNING, started_at__lt=threshold
+    ).update(status=ReportJob.Status.PENDING, started_at=None)
+
+
+def run_job(job: ReportJob) -> ReportJob:
+    """ジョブのレポートを作成して成果物を保存する。"""
+    # 依頼後にデータが変わっていれば最新の版数で作成する
+    job.data_version = data_version(job.term)
+    relative_path = Path(f"term_{job.term}") / f"kaizen_term_{job.term}_v{job.data_version}_{job.pk}.xlsx"
+    destination = artifact_root() / relative_path
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_suffix(".partial")
+    try:
+        with partial.open("wb") as output:
+            write_term_report(term_report_queryset(job.term), job.term, output)
+        os.replace(partial, destination)
+    except Exception as exc:
+        logger.exception("[report] job %s failed", job.pk)
+        partial.unlink(missing_ok=True)
+        job.status = ReportJob.Status.FAILED
+        job.error = str(exc)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at", "data_version"])
+        return job
+
+    job.status = ReportJob.Status.SUCCEEDED
+    job.file_path = str(relative_path).replace("\\", "/")
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "file_path", "error", "finished_at", "data_version"])
+    _discard_superseded(job)
+    return job
+
+
+def _discard_superseded(job: ReportJob) -> None:
+    """同じ期の古い版数の成果物を削除する（ジョブ行は履歴として残す）。"""
+    superseded = ReportJob.objects.filter(term=job.term, status=ReportJob.Status.SUCCEEDED).exclude(
+        data_version=job.data_version
+    ).exclude(file_path="")
+    for old in superseded:
+        path = artifact_path(old)
+        if path:
+            path.unlink(missing_ok=True)
+    superseded.update(file_path="")
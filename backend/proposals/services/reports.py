@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 import ast
-from datetime import datetime
+from datetime import datetime, time
 from io import BytesIO
 from decimal import Decimal, ROUND_HALF_UP, ROUND_DOWN, InvalidOperation
 from collections import defaultdict
 from typing import Iterable, Any
 
 import pandas as pd
+from django.db.models import Q
 from django.utils import timezone
 
 from proposals.models import ImprovementProposal, ProposalApproval
@@ -33,13 +34,27 @@ def employment_label(employee):
     return ""
 
 
+def term_report_queryset(term_number: int):
+    """改善委員承認済みの指定期の提案（export / analytics 共通）。"""
+    start_date, end_date = fiscal.term_date_range(term_number)
+    start_dt = datetime.combine(start_date, time.min)
+    end_dt = datetime.combine(end_date, time.max)
+    return (
+        ImprovementProposal.objects.filter(
+            Q(term=term_number) | (Q(term__isnull=True) & Q(submitted_at__range=(start_dt, end_dt))),
+            approvals__stage=ProposalApproval.Stage.COMMITTEE,
+            approvals__status=ProposalApproval.Status.APPROVED
+        )
+        .select_related("department", "section", "group", "team", "proposer")
+        .prefetch_related("approvals__confirmed_by", "contributors__employee__department")
+    )
+
+
 def generate_term_report(proposals: Iterable[ImprovementProposal], term_number: int) -> BytesIO:
-    # 1. Build the main summary dataframe
-    summary_df, raw_df = build_summary_dataframe(proposals, term_number)
-    
-    # 2. Build derived summaries
-    person_summary = build_person_summary(raw_df)
-    department_summary = build_department_month_matrix(raw_df, term_number)
+    from proposals.services.report_engine import build_report_frames
+
+    # 1-2. Build the summary and derived sheets (columnar engine, same output as build_* below)
+    summary_df, person_summary, department_summary = build_report_frames(proposals, term_number)
 
     # 3. Write to Excel
     buffer = BytesIO()
@@ -58,6 +73,8 @@ def generate_term_report(proposals: Iterable[ImprovementProposal], term_number:
     return buffer
 
 
+# build_summary_dataframe / build_person_summary / build_department_month_matrix は行単位の従来実装。
+# 帳票・分析は report_engine（列指向）を使い、こちらは出力一致テストの基準として残す。
 def build_summary_dataframe(
     proposals: Iterable[ImprovementProposal],
     term_number: int,
@@ -277,15 +294,16 @@ def build_summary_dataframe(
     return pd.DataFrame(summary_rows, columns=SUMMARY_COLUMNS), raw_df
 
 
+PERSON_SUMMARY_COLUMNS = [
+    "部署", "提案者", "件数", "平均マインド", "平均アイデア",
+    "平均ヒント", "合計ポイント", "提案ポイント", "削減時間合計[Hr/月]", "効果額合計[¥/月]"
+]
+
+
 def build_person_summary(df: pd.DataFrame) -> pd.DataFrame:
-    columns = [
-        "部署", "提案者", "件数", "平均マインド", "平均アイデア",
-        "平均ヒント", "合計ポイント", "提案ポイント", "削減時間合計[Hr/月]", "効果額合計[¥/月]"
-    ]
     if df.empty:
-        return pd.DataFrame(columns=columns)
+        return pd.DataFrame(columns=PERSON_SUMMARY_COLUMNS)
 
-    dept_col, person_col, count_col, mindset_col, idea_col, hint_col, points_col, proposal_points_col, reduction_col, effect_col = columns
     summary: dict[tuple[str, str], dict[str, Decimal]] = {}
 
     for _, row in df.iterrows():
@@ -368,6 +386,13 @@ def build_person_summary(df: pd.DataFrame) -> pd.DataFrame:
             entry["effect"] += effect_val
             entry["proposal_points"] += proposal_points_total
 
+    return person_summary_frame(summary)
+
+
+def person_summary_frame(summary: dict[tuple[str, str], dict[str, Decimal]]) -> pd.DataFrame:
+    """(部署, 提案者) ごとの累計値から部署別氏名一覧を作る。"""
+    columns = PERSON_SUMMARY_COLUMNS
+    dept_col, person_col, count_col, mindset_col, idea_col, hint_col, points_col, proposal_points_col, reduction_col, effect_col = columns
     rows = []
 
     def avg(sum_val: Decimal, weight: Decimal):
@@ -444,6 +469,13 @@ def build_department_month_matrix(df: pd.DataFrame, term_number: int) -> pd.Data
         else:
             dept_totals[dept_default][month] += Decimal("1")
 
+    return department_month_frame(dept_totals)
+
+
+def department_month_frame(dept_totals: dict[str, dict[int, Decimal]]) -> pd.DataFrame:
+    """部署×月の件数累計から特殊ポイント判定表を作る。"""
+    month_numbers = fiscal.fiscal_month_sequence()
+    columns = ["部署"] + [f"{month}月" for month in month_numbers] + ["年間合計"]
     rows = []
     for dept_name, month_map in dept_totals.items():
         row = {"部署": dept_name}
@@ -466,15 +498,16 @@ def get_analytics_summary(
     Generate analytics data for the frontend dashboard.
     Returns a dictionary containing list of records for person summary and department matrix.
     """
-    summary_df, raw_df = build_summary_dataframe(proposals, term_number, department_filter=department_filter)
-    
+    from proposals.services.report_engine import build_report_frames
+
+    summary_df, person_summary, department_summary = build_report_frames(
+        proposals, term_number, department_filter=department_filter
+    )
+
     # If no data, return empty lists instead of None to avoid 500s.
-    if summary_df is None or raw_df is None or raw_df.empty:
+    if summary_df.empty:
         return {"person_summary": [], "department_summary": []}
-    
-    person_summary = build_person_summary(raw_df)
-    department_summary = build_department_month_matrix(raw_df, term_number)
-    
+
     return {
         "person_summary": person_summary.to_dict(orient="records") if person_summary is not None else [],
         "department_summary": department_summary.to_dict(orient="records") if department_summary is not None else [],
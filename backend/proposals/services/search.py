@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, Q, QuerySet, Value, When
+from django.db.models.expressions import RawSQL
+
+from proposals.models import ImprovementProposal
+
+# MySQL FULLTEXT (ngram parser) index improvement_fulltext_idx の対象カラム
+FULLTEXT_COLUMNS = (
+    "deployment_item",
+    "problem_summary",
+    "improvement_plan",
+    "improvement_result",
+    "effect_details",
+)
+
+
+def fulltext_available() -> bool:
+    return connection.vendor == "mysql"
+
+
+def _uses_fulltext(keyword: str) -> bool:
+    """FULLTEXT で検索できるか（ngram_token_size 未満の語は索引に載らず一致しない）。"""
+    return fulltext_available() and len(keyword) >= settings.SEARCH_NGRAM_TOKEN_SIZE
+
+
+def _match_sql() -> str:
+    table = connection.ops.quote_name(ImprovementProposal._meta.db_table)
+    columns = ", ".join(f"{table}.{connection.ops.quote_name(col)}" for col in FULLTEXT_COLUMNS)
+    return f"MATCH ({columns}) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+
+
+def _fallback_q(keyword: str) -> Q:
+    """FULLTEXT が使えない DB 向けの LIKE 検索条件。"""
+    condition = Q(management_no__icontains=keyword) | Q(proposer_name__icontains=keyword)
+    for column in FULLTEXT_COLUMNS:
+        condition |= Q(**{f"{column}__icontains": keyword})
+    return condition
+
+
+def filter_proposals(queryset: QuerySet, keyword: str) -> QuerySet:
+    """テーマ・本文の全文検索で絞り込む。
+
+    FULLTEXT を使う場合、管理No・提案者名は前方一致で照合する（索引が効くよう部分一致にはしない）。
+    FULLTEXT が使えない DB や ngram_token_size 未満の短い語は、すべての列を部分一致で照合する。
+    """
+    if not _uses_fulltext(keyword):
+        return queryset.filter(_fallback_q(keyword))
+    return queryset.filter(
+        Q(pk__in=RawSQL(
+            f"SELECT id FROM {connection.ops.quote_name(ImprovementProposal._meta.db_table)} WHERE {_match_sql()}",
+            (keyword,),
+        ))
+        | Q(management_no__startswith=keyword)
+        | Q(proposer_name__startswith=keyword)
+    )
+
+
+def _identifier_match(keyword: str) -> Case:
+    """管理No の完全一致を 2、管理No・提案者名の前方一致を 1 とする順位。"""
+    return Case(
+        When(management_no=keyword, then=Value(2)),
+        When(Q(management_no__startswith=keyword) | Q(proposer_name__startswith=keyword), then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def rank_proposals(queryset: QuerySet, keyword: str) -> QuerySet:
+    """全文検索の関連度（relevance）で並べた提案を返す。
+
+    管理No・提案者名で一致したものは本文の関連度に関わらず先頭に並べる（本文に語を含まなくても返す）。
+    FULLTEXT を使う場合、管理No・提案者名は前方一致で照合する。FULLTEXT を使えない場合は filter_proposals と同じく
+    部分一致で絞り込み、関連度は 0 として提出日時の新しい順に並べる。
+    """
+    queryset = queryset.annotate(identifier_match=_identifier_match(keyword))
+    if not _uses_fulltext(keyword):
+        return (
+            queryset.filter(_fallback_q(keyword))
+            .annotate(relevance=Value(0.0, output_field=FloatField()))
+            .order_by("-identifier_match", "-submitted_at", "-id")
+        )
+    return (
+        queryset.annotate(relevance=RawSQL(_match_sql(), (keyword,), output_field=FloatField()))
+        .filter(Q(relevance__gt=0) | Q(identifier_match__gt=0))
+        .order_by("-identifier_match", "-relevance", "-submitted_at", "-id")
+    )
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from proposals.models import ImprovementProposal, Sequence
+
+# キーごとの採番カウンター（Sequence 行）を SELECT ... FOR UPDATE でロックして加算する。
+# 既存データとの互換のため、キーの初回利用時だけ既存の最大値から開始値を求める（以降は表を走査しない）。
+# 行ロックは呼び出し元のトランザクション終了まで保持されるので、同じキーの採番は直列化され重複しない。
+
+
+def allocate(key: str, count: int = 1, initial: Callable[[], int] | int = 0) -> range:
+    """key の次の値から count 個をまとめて払い出す（一括取込では必要数を1回で確保する）。"""
+    if count < 1:
+        raise ValueError("count must be positive")
+    with transaction.atomic():
+        row = Sequence.objects.select_for_update().filter(key=key).first()
+        if row is None:
+            start = initial() if callable(initial) else initial
+            try:
+                with transaction.atomic():
+                    Sequence.objects.create(key=key, value=start)
+            except IntegrityError:
+                # 同時に作成された場合は相手の行を使う
+                pass
+            row = Sequence.objects.select_for_update().get(key=key)
+        first = row.value + 1
+        row.value += count
+        row.save(update_fields=["value", "updated_at"])
+    return range(first, first + count)
+
+
+def ensure_at_least(key: str, value: int) -> None:
+    """手入力・取込で払い出し済みの値を使った場合に、カウンターを value 以上へ進める。"""
+    with transaction.atomic():
+        if not Sequence.objects.filter(key=key, value__lt=value).update(value=value):
+            try:
+                with transaction.atomic():
+                    Sequence.objects.get_or_create(key=key, defaults={"value": value})
+            except IntegrityError:
+                Sequence.objects.filter(key=key, value__lt=value).update(value=value)
+
+
+# --- 管理番号（yyyyMMdd-XXX、日ごとに連番） ---
+
+def management_no_key(prefix: str) -> str:
+    return f"management_no:{prefix}"
+
+
+def _max_management_seq(prefix: str) -> int:
+    highest = 0
+    for management_no in ImprovementProposal.objects.filter(
+        management_no__startswith=f"{prefix}-"
+    ).values_list("management_no", flat=True):
+        try:
+            highest = max(highest, int(management_no.split("-")[-1]))
+        except ValueError:
+            continue
+    return highest
+
+
+def allocate_management_numbers(prefix: str, count: int = 1) -> list[str]:
+    numbers = allocate(management_no_key(prefix), count, initial=lambda: _max_management_seq(prefix))
+    return [f"{prefix}-{number:03d}" for number in numbers]
+
+
+# --- 通し番号（期ごとに連番） ---
+
+def serial_key(term: int) -> str:
+    return f"serial_number:{term}"
+
+
+def allocate_serial_numbers(term: int, count: int = 1) -> range:
+    return allocate(
+        serial_key(term),
+        count,
+        initial=lambda: ImprovementProposal.objects.filter(term=term).aggregate(Max("serial_number"))["serial_number__max"] or 0,
+    )
+
+
+def ensure_serial_at_least(term: int, serial_number: int) -> None:
+    ensure_at_least(serial_key(term), serial_number)
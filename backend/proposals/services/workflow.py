@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Iterable
+
+from django.utils import timezone
+
+from proposals.models import ImprovementProposal, ProposalApproval
+
+COMPLETED_STAGE = "completed"
+STAGE_ORDER = [stage.value for stage in ProposalApproval.Stage]
+STAGE_STATE_FIELDS = ["current_stage", "current_status", "is_completed"]
+
+
+def compute_stage_state(approvals: Iterable[ProposalApproval]) -> tuple[str, str, bool]:
+    """Return (current_stage, current_status, is_completed) for the approvals.
+
+    The current stage is the first stage in workflow order that is not yet
+    approved. Missing approval rows count as pending.
+    """
+    statuses = {approval.stage: approval.status for approval in approvals}
+    for stage in STAGE_ORDER:
+        status = statuses.get(stage, ProposalApproval.Status.PENDING)
+        if status != ProposalApproval.Status.APPROVED:
+            return stage, status, False
+    return COMPLETED_STAGE, ProposalApproval.Status.APPROVED, True
+
+
+def refresh_stage_state(
+    proposal: ImprovementProposal,
+    approvals: Iterable[ProposalApproval] | None = None,
+) -> bool:
+    """Recompute the denormalized stage columns and save them if changed."""
+    if approvals is None:
+        approvals = ProposalApproval.objects.filter(proposal=proposal).only("stage", "status")
+    current_stage, current_status, is_completed = compute_stage_state(approvals)
+    if (
+        proposal.current_stage == current_stage
+        and proposal.current_status == current_status
+        and proposal.is_completed == is_completed
+    ):
+        return False
+    proposal.current_stage = current_stage
+    proposal.current_status = current_status
+    proposal.is_completed = is_completed
+    proposal.save(update_fields=STAGE_STATE_FIELDS + ["updated_at"])
+    return True
+
+
+def refresh_stage_states(proposals: Iterable[ImprovementProposal]) -> int:
+    """Bulk variant of ``refresh_stage_state``; returns the number of proposals updated."""
+    proposals = list(proposals)
+    approvals_by_proposal: dict[int, list[ProposalApproval]] = defaultdict(list)
+    for approval in ProposalApproval.objects.filter(
+        proposal_id__in=[proposal.pk for proposal in proposals]
+    ).only("proposal_id", "stage", "status"):
+        approvals_by_proposal[approval.proposal_id].append(approval)
+
+    now = timezone.now()
+    changed = []
+    for proposal in proposals:
+        state = compute_stage_state(approvals_by_proposal[proposal.pk])
+        if (proposal.current_stage, proposal.current_status, proposal.is_completed) == state:
+            continue
+        proposal.current_stage, proposal.current_status, proposal.is_completed = state
+        proposal.updated_at = now
+        changed.append(proposal)
+    if changed:
+        ImprovementProposal.objects.bulk_update(changed, STAGE_STATE_FIELDS + ["updated_at"])
+    return len(changed)
+
+
+def stages_after(stage: str) -> list[str]:
+    """Stages that come after ``stage``, followed by the completed marker."""
+    index = STAGE_ORDER.index(stage)
+    return STAGE_ORDER[index + 1:] + [COMPLETED_STAGE]
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Department, Employee, ImprovementProposal, ProposalImage, UserProfile
+from .services import affiliations, analytics, approvers, department_tree, fiscal, image_blobs, reference_data, report_jobs
+
+User = get_user_model()
+
+# 承認者ディレクトリに影響する User の列（last_login のみの更新などでは破棄しない）
+APPROVER_USER_FIELDS = {"email", "is_active"}
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_on_profile_change(sender, **kwargs):
+    approvers.invalidate()
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_user_save(sender, update_fields=None, **kwargs):
+    if update_fields is None or APPROVER_USER_FIELDS & set(update_fields):
+        approvers.invalidate()
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Department)
+def invalidate_on_delete(sender, **kwargs):
+    # Department 削除時は担当部署が SET_NULL（UserProfile のシグナルは発火しない）
+    approvers.invalidate()
+
+
+@receiver(pre_save, sender=Department)
+def reject_department_cycle(sender, instance, raw=False, **kwargs):
+    # 管理画面・API はフォーム／シリアライザーで検証済み。ここはそれ以外の保存経路の最終防衛
+    if not raw and department_tree.creates_cycle(instance):
+        raise ValidationError({"parent": department_tree.CYCLE_ERROR})
+
+
+@receiver(post_save, sender=Department)
+def sync_department_closure(sender, instance, raw=False, **kwargs):
+    # loaddata（raw）では親が未登録の場合があるため、取込後に rebuild_department_tree を実行する
+    if not raw:
+        department_tree.sync_department(instance)
+
+
+@receiver(pre_delete, sender=Department)
+def detach_department_children(sender, instance, **kwargs):
+    department_tree.detach_children(instance)
+
+
+@receiver(pre_save, sender=Employee)
+def resolve_employee_affiliation(sender, instance, raw=False, update_fields=None, **kwargs):
+    # 列を指定した保存では解決した係・班の部署が保存されないため、全列保存のときだけ解決する
+    if not raw and update_fields is None:
+        affiliations.AffiliationResolver.for_employee(instance).assign(instance)
+
+
+@receiver(post_save, sender=Department)
+def relink_affiliated_employees(sender, instance, raw=False, **kwargs):
+    # 係・班の部署より先に登録された従業員や、名称変更で一致しなくなった従業員の所属を付け替える
+    if not raw:
+        affiliations.relink(instance)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def bump_department_reference_data(sender, **kwargs):
+    # 従業員一覧も所属部署の内容を含む
+    reference_data.bump(reference_data.DEPARTMENTS, reference_data.EMPLOYEES)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def bump_employee_reference_data(sender, **kwargs):
+    reference_data.bump(reference_data.EMPLOYEES)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Employee)
+def invalidate_analytics_terms(sender, created=False, raw=False, **kwargs):
+    # 集計元行は部署名・従業員の所属を含む。新規作成はまだどの提案からも参照されないため対象外
+    # （一括取込は bulk_create / bulk_update のため取込処理の側で破棄する）
+    if not created and not raw:
+        analytics.invalidate_terms()
+
+
+@receiver(pre_delete, sender=ImprovementProposal)
+def collect_proposal_terms(sender, instance, **kwargs):
+    # 集計元行は CASCADE で先に消えるため削除前に期を控える（集計行のない未承認の提案も自身の期を対象にする）
+    terms = set(instance.analytics_rows.values_list("term", flat=True))
+    if instance.term is not None:
+        terms.add(instance.term)
+    elif instance.submitted_at is not None:
+        terms.add(fiscal.fiscal_term(instance.submitted_at))
+    instance._data_version_terms = terms
+
+
+@receiver(post_delete, sender=ImprovementProposal)
+def bump_proposal_data_version(sender, instance, **kwargs):
+    # API・管理画面（一括削除を含む）のどの経路の削除でも期別レポートと分析の版数を進める
+    terms = getattr(instance, "_data_version_terms", None)
+    if terms:
+        report_jobs.bump_data_version(terms)
+
+
+@receiver(post_save, sender=ProposalImage)
+def add_image_blob_reference(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw and instance.blob_id:
+        image_blobs.add_reference(instance.blob_id, 1)
+
+
+@receiver(post_delete, sender=ProposalImage)
+def release_image_blob_reference(sender, instance, **kwargs):
+    # 提案の削除（CASCADE）でも呼ばれる。参照数 0 のファイルは gc_image_blobs が削除する
+    if instance.blob_id:
+        image_blobs.add_reference(instance.blob_id, -1)
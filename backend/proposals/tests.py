@@ -1,3 +1,1625 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest import mock, skipIf
+from io import BytesIO, StringIO
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
 
-# Create your tests here.
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from PIL import Image
+
+from proposals.management.commands.explain_proposal_filters import LIST_FILTER_COMBINATIONS
+from proposals.models import (
+    AnalyticsContribution,
+    AnalyticsTerm,
+    ApprovalNotice,
+    ChunkedUpload,
+    Department,
+    DepartmentClosure,
+    EmailOutbox,
+    Employee,
+    ImageBlob,
+    ImageJob,
+    ImprovementProposal,
+    ProposalApproval,
+    ProposalContributor,
+    ProposalImage,
+    ReportJob,
+    UserProfile,
+)
+from proposals.serializers import ImprovementProposalSerializer, build_media_url
+from proposals.services import analytics, approvers, cache_versions, chunked_uploads, department_tree, digest, fiscal, image_jobs, mail_outbox, media, report_jobs, search, sequences, workflow
+from proposals.services.affiliations import AffiliationResolver
+from proposals.services.identifiers import generate_management_no
+from proposals.services.employee_import import import_employees
+from proposals.services.images import build_variants, save_proposal_image
+from proposals.services.jiseki_import import import_jiseki
+from proposals.services.report_engine import build_report_frames, share_cents
+from proposals.services.report_export import write_term_report
+from proposals.services.reports import (
+    _share_weights,
+    build_department_month_matrix,
+    build_person_summary,
+    build_summary_dataframe,
+    generate_term_report,
+    get_analytics_summary,
+    term_report_queryset,
+)
+
+
+class TempDirMixin:
+    """テストの間だけ使う一時ディレクトリと設定の差し替え（どちらも addCleanup で元に戻す）。"""
+
+    def make_temp_dir(self) -> Path:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return Path(directory.name)
+
+    def enable_settings(self, **options) -> None:
+        override = override_settings(**options)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class ProposalCursorPaginationTests(TestCase):
+    """一覧のカーソルは (submitted_at, id) のキーセットで、同じ提出日時が続いても欠け・重複なく OFFSET を使わないこと。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="製造部", level="division")
+        same_time = datetime(2025, 11, 1, 9)
+        for i in range(7):
+            ImprovementProposal.objects.create(
+                management_no=f"P-{i:04d}",
+                department=department,
+                submitted_at=same_time if i < 5 else same_time + timedelta(days=i),
+            )
+        cls.expected = list(
+            ImprovementProposal.objects.order_by("-submitted_at", "-id").values_list("management_no", flat=True)
+        )
+
+    def test_walks_pages_in_keyset_order(self):
+        seen = []
+        url = "/api/improvement-proposals/"
+        params = {"page_size": 2, "fields": "id,management_no"}
+        while url:
+            with self.assertNumQueries(4) as queries:  # ETag 集計 + 参照データの版数 + ページ + 承認の prefetch
+                data = self.client.get(url, params).json()
+            self.assertFalse(any("OFFSET" in query["sql"].upper() for query in queries.captured_queries))
+            self.assertLessEqual(len(data["results"]), 2)
+            seen += [row["management_no"] for row in data["results"]]
+            url, params = data["next"], None
+        self.assertEqual(seen, self.expected)
+
+    def test_page_size_all_and_invalid_cursor(self):
+        data = self.client.get("/api/improvement-proposals/", {"page_size": "all", "view": "summary"}).json()
+        self.assertEqual([row["management_no"] for row in data], self.expected)
+        self.assertEqual(self.client.get("/api/improvement-proposals/", {"cursor": "broken"}).status_code, 404)
+
+    def test_approver_scope_filters_before_paging(self):
+        # 管轄外の提案が先頭ページを埋めても、管轄の提案が1ページ目に入る
+        team = Department.objects.create(name="1班", level="team")
+        ImprovementProposal.objects.filter(management_no__in=["P-0000", "P-0001"]).update(team=team)
+        user = get_user_model().objects.create_user("leader", password="pw")
+        UserProfile.objects.create(user=user, role="supervisor", responsible_department=team)
+        self.client.force_login(user)
+
+        params = {"scope": "approver", "page_size": 2, "fields": "id,management_no"}
+        data = self.client.get("/api/improvement-proposals/", params).json()
+        self.assertEqual([row["management_no"] for row in data["results"]], ["P-0001", "P-0000"])
+        self.assertIsNone(data["next"])
+
+        user.profile.role = "admin"
+        user.profile.save()
+        data = self.client.get("/api/improvement-proposals/", params).json()
+        self.assertEqual([row["management_no"] for row in data["results"]], self.expected[:2])
+
+
+class ProposalStageFilterTests(TestCase):
+    """stage/status の一覧フィルターと backfill_proposal_stage が承認フローの順序どおりに状態を扱うこと。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="製造部", level="division")
+        Stage, Status = ProposalApproval.Stage, ProposalApproval.Status
+        # 管理No → 各段階の状態（行のない段階は未確認扱い）
+        cls.states = {
+            "S-0001": {},
+            "S-0002": {Stage.SUPERVISOR: Status.APPROVED},
+            "S-0003": {Stage.SUPERVISOR: Status.APPROVED, Stage.CHIEF: Status.APPROVED, Stage.MANAGER: Status.REJECTED},
+            "S-0004": {stage: Status.APPROVED for stage in Stage},
+        }
+        for i, (management_no, approvals) in enumerate(cls.states.items()):
+            proposal = ImprovementProposal.objects.create(
+                management_no=management_no, department=department, submitted_at=datetime(2025, 11, 1 + i, 9)
+            )
+            for stage, status in approvals.items():
+                ProposalApproval.objects.create(proposal=proposal, stage=stage, status=status)
+            workflow.refresh_stage_state(proposal)
+
+    def _list(self, **params):
+        data = self.client.get("/api/improvement-proposals/", {**params, "page_size": "all", "view": "summary"}).json()
+        return sorted(row["management_no"] for row in data)
+
+    def test_compute_stage_state_follows_workflow_order(self):
+        self.assertEqual(
+            list(ImprovementProposal.objects.order_by("management_no").values_list(
+                "current_stage", "current_status", "is_completed"
+            )),
+            [
+                ("supervisor", "pending", False),
+                ("chief", "pending", False),
+                ("manager", "rejected", False),
+                ("completed", "approved", True),
+            ],
+        )
+
+    def test_stage_status_filters(self):
+        self.assertEqual(self._list(stage="supervisor", status="pending"), ["S-0001"])
+        self.assertEqual(self._list(stage="manager", status="rejected"), ["S-0003"])
+        # approved は「その段階を通過済み」= 現在の段階がそれより後
+        self.assertEqual(self._list(stage="supervisor", status="approved"), ["S-0002", "S-0003", "S-0004"])
+        self.assertEqual(self._list(stage="manager", status="approved"), ["S-0004"])
+        self.assertEqual(self._list(status="completed"), ["S-0004"])
+
+    def test_backfill_corrects_stale_columns(self):
+        ImprovementProposal.objects.update(current_stage="supervisor", current_status="pending", is_completed=False)
+        out = StringIO()
+        call_command("backfill_proposal_stage", "--dry-run", stdout=out)
+        self.assertIn("4件中 3件が更新対象です", out.getvalue())
+        self.assertFalse(ImprovementProposal.objects.filter(is_completed=True).exists())
+
+        out = StringIO()
+        call_command("backfill_proposal_stage", "--batch-size", "2", stdout=out)
+        self.assertIn("4件中 3件を更新しました", out.getvalue())
+        self.test_compute_stage_state_follows_workflow_order()
+
+
+class ProposalProjectionTests(TestCase):
+    """?fields= は指定した項目だけを返し、不要な関連の prefetch を省くこと。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="製造部", level="division")
+        cls.proposal = ImprovementProposal.objects.create(
+            management_no="F-0001", department=department, proposer_name="山田", submitted_at=datetime(2025, 11, 1, 9)
+        )
+
+    def test_list_fields_use_summary(self):
+        data = self.client.get(
+            "/api/improvement-proposals/", {"fields": "id,management_no", "page_size": "all"}
+        ).json()
+        self.assertEqual(data, [{"id": self.proposal.pk, "management_no": "F-0001"}])
+
+    def test_detail_fields_skip_unused_prefetches(self):
+        url = f"/api/improvement-proposals/{self.proposal.pk}/"
+        with CaptureQueriesContext(connection) as full:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as projected:
+            data = self.client.get(url, {"fields": "management_no,proposer_name"}).json()
+        self.assertEqual(data, {"management_no": "F-0001", "proposer_name": "山田"})
+        self.assertLess(len(projected.captured_queries), len(full.captured_queries))
+
+
+class ExplainProposalFiltersTests(TestCase):
+    """explain_proposal_filters が一覧・export・analytics の各フィルター組み合わせの実行計画を出力すること。"""
+
+    def test_prints_plan_for_each_filter(self):
+        out = StringIO()
+        call_command("explain_proposal_filters", "--verbose-plan", stdout=out)
+        lines = out.getvalue().splitlines()
+        headers = [i for i, line in enumerate(lines) if line.startswith("[")]
+        self.assertEqual(len(headers), len(LIST_FILTER_COMBINATIONS) + 2)  # 一覧 + export + analytics
+        self.assertTrue(lines[headers[0]].endswith("list (no filter)"))
+        self.assertTrue(lines[headers[-1]].endswith("analytics term=52&month=4"))
+        for i in headers:
+            self.assertTrue(lines[i + 1].startswith("    "), lines[i])
+
+
+@skipIf(connection.vendor == "mysql", "FULLTEXT を使わない代替経路の確認")
+class ProposalSearchFallbackTests(TestCase):
+    """MySQL 以外では search アクションが部分一致に切り替わり、提出日時の新しい順で返すこと。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="製造部", level="division")
+        for i, (management_no, item) in enumerate([("K-0001", "治具の改善"), ("K-0002", "清掃手順"), ("K-0003", "改善"), ("K-00010", "清掃")]):
+            ImprovementProposal.objects.create(
+                management_no=management_no,
+                department=department,
+                deployment_item=item,
+                submitted_at=datetime(2025, 11, 1 + i, 9),
+            )
+
+    def test_search_falls_back_to_icontains(self):
+        data = self.client.get("/api/improvement-proposals/search/", {"q": "改善"}).json()
+        self.assertEqual([row["management_no"] for row in data], ["K-0003", "K-0001"])
+        self.assertTrue(all(row["relevance"] == 0 for row in data))
+
+    def test_identifier_matches_rank_first(self):
+        # 管理No の完全一致 > 前方一致（提出日時が新しくても後ろ）
+        data = self.client.get("/api/improvement-proposals/search/", {"q": "K-0001"}).json()
+        self.assertEqual([row["management_no"] for row in data], ["K-0001", "K-00010"])
+
+    def test_search_requires_keyword(self):
+        self.assertEqual(self.client.get("/api/improvement-proposals/search/").status_code, 400)
+
+    def test_short_keyword_skips_fulltext(self):
+        # ngram_token_size 未満の 1 文字は MySQL でも MATCH を使わず部分一致で検索する
+        with mock.patch.object(search, "fulltext_available", return_value=True), CaptureQueriesContext(connection) as ctx:
+            data = self.client.get("/api/improvement-proposals/search/", {"q": "清"}).json()
+            listed = self.client.get("/api/improvement-proposals/", {"q": "清", "search": "fulltext"}).json()
+        self.assertEqual([row["management_no"] for row in data], ["K-00010", "K-0002"])
+        self.assertEqual([row["management_no"] for row in listed["results"]], ["K-00010", "K-0002"])
+        self.assertFalse(any("MATCH" in query["sql"] for query in ctx.captured_queries))
+
+
+class AnalyticsAggregateTests(TestCase):
+    """分析ダッシュボードの集計元行（AnalyticsContribution）の無効化と再構築。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="製造部", level="division")
+        cls.employee = Employee.objects.create(code="E001", name="山田", department=cls.department)
+
+    def test_rows_follow_committee_approval_and_match_pandas_summary(self):
+        proposal = ImprovementProposal.objects.create(
+            management_no="A-0001",
+            department=self.department,
+            proposer_name="山田",
+            submitted_at=datetime(2025, 11, 4, 9),
+            reduction_hours=Decimal("1.50"),
+            effect_amount=Decimal("1200"),
+        )
+        ProposalContributor.objects.create(
+            proposal=proposal, employee=self.employee, is_primary=True, share_percent=Decimal("100")
+        )
+        analytics.refresh_proposal(proposal)
+        self.assertFalse(AnalyticsContribution.objects.exists())  # 委員承認前は集計対象外
+
+        ProposalApproval.objects.create(
+            proposal=proposal,
+            stage=ProposalApproval.Stage.COMMITTEE,
+            status=ProposalApproval.Status.APPROVED,
+            mindset_score=3,
+            idea_score=4,
+            hint_score=2,
+        )
+        analytics.refresh_proposal(proposal)
+        self.assertEqual(AnalyticsContribution.objects.filter(proposal=proposal).count(), 1)
+
+        term = fiscal.fiscal_term(proposal.submitted_at)
+        analytics.rebuild_term(term)
+        self.assertEqual(
+            analytics.get_analytics_summary(term), get_analytics_summary(term_report_queryset(term), term)
+        )
+
+    def test_department_and_employee_changes_invalidate_terms(self):
+        for change in (
+            lambda: self.department.save(),
+            lambda: self.employee.save(),
+            lambda: Employee.objects.create(code="E002", name="佐藤", department=self.department).delete(),
+        ):
+            AnalyticsTerm.objects.create(term=52)
+            before = report_jobs.data_version(52)
+            change()
+            self.assertFalse(AnalyticsTerm.objects.exists())
+            self.assertNotEqual(report_jobs.data_version(52), before)
+
+
+class ShareCentsTests(SimpleTestCase):
+    """report_engine.share_cents と reports._share_weights の最大剰余法が一致すること。"""
+
+    def test_matches_share_weights(self):
+        rnd = random.Random(7)
+        groups = [
+            ["33.33", "33.33", "33.33"],
+            ["33.34", "33.33", "33.33"],
+            ["50", "25", "0", "92", "8"],
+            ["50", "50", "25", "5", "50"],
+            ["0", "0", "0"],
+            ["0", "-5"],
+            ["100"],
+        ]
+        for _ in range(2000):
+            size = rnd.randint(1, 7)
+            groups.append([
+                str(rnd.choice([0, rnd.randint(1, 10000) / 100, rnd.randint(1, 100), 33.33, 50, 25]))
+                for _ in range(size)
+            ])
+
+        rows = []
+        for pid, shares in enumerate(groups):
+            for position, share in enumerate(shares):
+                value = Decimal(share)
+                units = int(value * 100) if value > 0 else 0
+                rows.append({
+                    "pid": pid,
+                    "position": position,
+                    "has_contributor": True,
+                    "share_percent": value,
+                    "share_units": units,
+                    "share_exact": value <= 0 or value * 100 == units,
+                })
+        cents = share_cents(pd.DataFrame(rows))
+
+        offset = 0
+        for shares in groups:
+            expected = [
+                int(weight * 100)
+                for weight in _share_weights([SimpleNamespace(share_percent=Decimal(s)) for s in shares])
+            ]
+            self.assertEqual(cents.iloc[offset:offset + len(shares)].tolist(), expected, shares)
+            offset += len(shares)
+
+
+class ReportEngineGoldenTests(TestCase):
+    """列指向エンジンの出力が従来の行単位実装（build_*）と完全に一致すること。"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rnd = random.Random(3)
+        departments = [Department.objects.create(name=name, level="division") for name in ("製造部", "品質部", "管理部")]
+        employees = [
+            Employee.objects.create(
+                code=f"E{i:03d}", name=f"社員{i}", department=departments[i % 3],
+                position="班長" if i % 4 == 0 else "",
+            )
+            for i in range(10)
+        ]
+        cls.term = fiscal.fiscal_term(datetime(2025, 11, 1))
+        share_patterns = [
+            [], ["100"], ["50", "50"], ["33.34", "33.33", "33.33"], ["33.33", "33.33", "33.33"],
+            ["0", "0", "0"], ["60", "25", "15"], ["12.5", "12.5", "75"],
+        ]
+        for i in range(60):
+            submitted_at = datetime(2025 + (i % 2), rnd.choice([10, 11, 1, 3, 9]), rnd.randint(1, 28), 9)
+            proposal = ImprovementProposal.objects.create(
+                management_no=f"G-{i:04d}",
+                department=rnd.choice(departments),
+                proposer_name="" if i % 13 == 0 else f"提案者{i % 7}",
+                deployment_item=f"テーマ{i}",
+                submitted_at=submitted_at,
+                term=cls.term if i % 3 else None,
+                serial_number=i if i % 5 else None,
+                classification_points=rnd.choice([None, 0, 1, 3, 5]),
+                reduction_hours=rnd.choice([None, Decimal("1.25"), Decimal("10")]),
+                effect_amount=rnd.choice([None, Decimal("2125"), Decimal("17000")]),
+                contribution_business=rnd.choice(["", "['製造', '品質']", "管理"]),
+            )
+            for stage in ProposalApproval.Stage.values:
+                ProposalApproval.objects.create(
+                    proposal=proposal,
+                    stage=stage,
+                    status=ProposalApproval.Status.APPROVED,
+                    mindset_score=rnd.choice([None, 1, 3]) if stage == ProposalApproval.Stage.MANAGER else None,
+                    idea_score=rnd.choice([None, 2, 4]) if stage != ProposalApproval.Stage.SUPERVISOR else None,
+                    hint_score=rnd.choice([None, 5]) if stage == ProposalApproval.Stage.MANAGER else None,
+                    sdgs_flag=bool(i % 2),
+                    safety_flag=bool(i % 3),
+                )
+            shares = share_patterns[i % len(share_patterns)]
+            for position, (employee, share) in enumerate(zip(rnd.sample(employees, len(shares)), shares)):
+                manual = position == 2 and i % 2 == 0
+                ProposalContributor.objects.create(
+                    proposal=proposal,
+                    employee=None if manual else employee,
+                    employee_name="手入力者" if manual else employee.name,
+                    is_primary=position == 0,
+                    share_percent=Decimal(share),
+                    classification_points_share=Decimal(rnd.randint(0, 250)) / 100,
+                    reward_amount=Decimal(rnd.randint(0, 900)),
+                )
+
+    def _legacy(self, department_filter=None):
+        summary_df, raw_df = build_summary_dataframe(
+            term_report_queryset(self.term), self.term, department_filter=department_filter
+        )
+        return summary_df, build_person_summary(raw_df), build_department_month_matrix(raw_df, self.term)
+
+    def test_matches_legacy_frames(self):
+        for department_filter in (None, "製造部", "品質部", "存在しない部署"):
+            with self.subTest(department=department_filter):
+                expected = self._legacy(department_filter)
+                actual = build_report_frames(
+                    term_report_queryset(self.term), self.term, department_filter=department_filter
+                )
+                for expected_frame, actual_frame in zip(expected, actual):
+                    pd.testing.assert_frame_equal(actual_frame, expected_frame)
+
+    def test_fixture_covers_shared_and_filtered_rows(self):
+        summary_df, person_df, department_df = build_report_frames(term_report_queryset(self.term), self.term)
+        self.assertIn("共同", set(summary_df["共同提案"]))
+        self.assertGreater(len(person_df), 5)
+        self.assertEqual(len(department_df), 3)
+
+    def test_aggregate_summary_matches_pandas_summary(self):
+        analytics.rebuild_term(self.term)
+        for department_filter in (None, "製造部", "存在しない部署"):
+            for month in (None, 11):
+                with self.subTest(department=department_filter, month=month):
+                    proposals = term_report_queryset(self.term)
+                    if month:
+                        proposals = proposals.filter(submitted_at__month=month)
+                    self.assertEqual(
+                        analytics.get_analytics_summary(self.term, department_filter=department_filter, month=month),
+                        get_analytics_summary(proposals, self.term, department_filter=department_filter),
+                    )
+
+    def test_unbuilt_term_is_served_without_rebuilding(self):
+        analytics.rebuild_term(self.term)
+        analytics.invalidate_terms()
+        with self.settings(ANALYTICS_USE_AGGREGATES=True):
+            response = self.client.get("/api/improvement-proposals/analytics/", {"term": self.term})
+        self.assertEqual(response.json(), get_analytics_summary(term_report_queryset(self.term), self.term))
+        self.assertFalse(analytics.is_built(self.term))
+
+        out = StringIO()
+        call_command("run_report_worker", "--once", stdout=out)
+        self.assertIn(f"{self.term}期の分析集計を再構築しました", out.getvalue())
+        self.assertEqual(analytics.pending_terms(), [])
+
+    def test_streaming_export_matches_in_memory_workbook(self):
+        def sheet_values(buffer):
+            workbook = load_workbook(buffer)
+            return {
+                sheet.title: [
+                    [cell.value for cell in row]
+                    for row in sheet.iter_rows()
+                    if not str(row[0].value or "").startswith("作成日時")
+                ]
+                for sheet in workbook.worksheets
+            }
+
+        expected = sheet_values(generate_term_report(term_report_queryset(self.term), self.term))
+        streamed = BytesIO()
+        write_term_report(term_report_queryset(self.term), self.term, streamed, chunk_size=7)
+        streamed.seek(0)
+        self.assertEqual(sheet_values(streamed), expected)
+
+
+class ReportJobTests(TempDirMixin, TestCase):
+    """レポートジョブはデータ版数が同じ間は成果物を再利用し、版数が変わると作り直すこと。"""
+
+    def setUp(self):
+        self.enable_settings(REPORT_ARTIFACT_ROOT=str(self.make_temp_dir()))
+        department = Department.objects.create(name="製造部", level="division")
+        self.term = fiscal.fiscal_term(datetime(2025, 11, 1))
+        ImprovementProposal.objects.create(
+            management_no="J-0001",
+            department=department,
+            proposer_name="提案者",
+            deployment_item="テーマ",
+            submitted_at=datetime(2025, 11, 1, 9),
+            term=self.term,
+        )
+
+    def test_job_lifecycle_and_version_reuse(self):
+        job = report_jobs.request_report(self.term)
+        self.assertEqual(job.status, ReportJob.Status.PENDING)
+        self.assertEqual(report_jobs.request_report(self.term).pk, job.pk)
+
+        claimed = report_jobs.claim_next_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertIsNone(report_jobs.claim_next_job())
+        job = report_jobs.run_job(claimed)
+        self.assertEqual(job.status, ReportJob.Status.SUCCEEDED)
+        first_path = report_jobs.artifact_path(job)
+        self.assertIsNotNone(first_path)
+        self.assertEqual(report_jobs.cached_report(self.term).pk, job.pk)
+        self.assertEqual(report_jobs.request_report(self.term).pk, job.pk)
+
+        report_jobs.bump_data_version([self.term])
+        self.assertIsNone(report_jobs.cached_report(self.term))
+        newer = report_jobs.request_report(self.term)
+        self.assertNotEqual(newer.pk, job.pk)
+        newer = report_jobs.run_job(report_jobs.claim_next_job())
+        self.assertEqual(newer.status, ReportJob.Status.SUCCEEDED)
+        self.assertFalse(first_path.exists())
+        load_workbook(report_jobs.artifact_path(newer))
+
+    def test_api_reports_pending_then_downloads(self):
+        response = self.client.post("/api/report-jobs/", {"term": self.term}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["id"]
+        self.assertEqual(self.client.get(f"/api/report-jobs/{job_id}/download/").status_code, 409)
+
+        report_jobs.run_job(report_jobs.claim_next_job())
+        detail = self.client.get(f"/api/report-jobs/{job_id}/").json()
+        self.assertEqual(detail["status"], ReportJob.Status.SUCCEEDED)
+        download = self.client.get(f"/api/report-jobs/{job_id}/download/")
+        self.assertEqual(download.status_code, 200)
+        load_workbook(BytesIO(b"".join(download.streaming_content)))
+
+    def test_any_proposal_delete_bumps_its_term(self):
+        # 集計行のない（委員承認前の）提案でも、管理画面の一括削除と同じ QuerySet.delete で版数が進む
+        before = report_jobs.data_version(self.term)
+        ImprovementProposal.objects.filter(management_no="J-0001").delete()
+        self.assertNotEqual(report_jobs.data_version(self.term), before)
+
+        proposal = ImprovementProposal.objects.create(
+            management_no="J-0002", department=Department.objects.get(), submitted_at=datetime(2025, 11, 2, 9)
+        )
+        before = report_jobs.data_version(self.term)
+        proposal.delete()  # term 未設定は提出日時の期
+        self.assertNotEqual(report_jobs.data_version(self.term), before)
+
+
+class EmailOutboxTests(TestCase):
+    """通知メールは送信箱に登録され、ワーカーが送信者ごとに接続をまとめて送信・再送すること。"""
+
+    def setUp(self):
+        User = get_user_model()
+        self.department = Department.objects.create(name="製造部", level="division")
+        manager = User.objects.create_user("manager", email="manager@example.com", password="x")
+        UserProfile.objects.create(user=manager, role="manager", responsible_department=self.department)
+        self.senders = [
+            User.objects.create_user(f"sender{i}", email=f"sender{i}@example.com", password="x") for i in range(2)
+        ]
+
+    def _enqueue(self, sender, subject="件名"):
+        return mail_outbox.enqueue(EmailOutbox.Kind.APPROVAL, subject, "本文", ["to@example.com"], sender=sender)
+
+    def test_submit_queues_without_sending(self):
+        employee = Employee.objects.create(code="E001", name="提案者", department=self.department)
+        response = self.client.post(
+            "/api/improvement-proposals/",
+            {
+                "department": self.department.pk,
+                "proposer_name": "提案者",
+                "deployment_item": "テーマ",
+                "problem_summary": "問題",
+                "improvement_plan": "改善",
+                "effect_details": "効果",
+                "contributors": json.dumps([{"employee": employee.pk, "is_primary": True}]),
+            },
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(mail.outbox, [])
+        queued = EmailOutbox.objects.get()
+        self.assertEqual(queued.kind, EmailOutbox.Kind.SUBMISSION)
+        self.assertEqual(queued.recipients, ["manager@example.com"])
+
+        self.assertEqual(mail_outbox.deliver_pending(), (1, 1))
+        self.assertEqual(mail.outbox[0].to, ["manager@example.com"])
+        self.assertEqual(EmailOutbox.objects.get().status, EmailOutbox.Status.SENT)
+
+    def test_reuses_one_connection_per_sender(self):
+        for sender in (self.senders[0], self.senders[1], self.senders[0], None):
+            self._enqueue(sender)
+        with mock.patch.object(mail_outbox, "sender_connection", wraps=mail_outbox.sender_connection) as connect:
+            self.assertEqual(mail_outbox.deliver_pending(), (4, 4))
+        self.assertEqual(connect.call_count, 3)
+        self.assertEqual(len(mail.outbox), 4)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_BASE_SECONDS=60)
+    def test_retries_with_backoff_then_fails(self):
+        queued = self._enqueue(self.senders[0])
+        with mock.patch("proposals.services.mail_outbox.EmailMessage.send", side_effect=OSError("down")):
+            self.assertEqual(mail_outbox.deliver_pending(), (1, 0))
+            queued.refresh_from_db()
+            self.assertEqual((queued.status, queued.attempts), (EmailOutbox.Status.PENDING, 1))
+            self.assertGreater(queued.next_attempt_at, timezone.now() + timedelta(seconds=50))
+            # 再送時刻までは取り出さない
+            self.assertEqual(mail_outbox.deliver_pending(), (0, 0))
+
+            EmailOutbox.objects.filter(pk=queued.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(mail_outbox.deliver_pending(), (1, 0))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, queued.last_error), (EmailOutbox.Status.FAILED, 2, "down"))
+
+
+class ApproverDirectoryTests(TestCase):
+    """通知先の解決はキャッシュから行い、プロファイル・ユーザーの変更で破棄されること。"""
+
+    def setUp(self):
+        approvers.invalidate()
+        User = get_user_model()
+        self.division = Department.objects.create(name="製造部", level="division")
+        self.group = Department.objects.create(name="製造係", level="group", parent=self.division)
+        self.team = Department.objects.create(name="製造班", level="team", parent=self.group)
+
+        def profile(username, role, department=None):
+            user = User.objects.create_user(username, email=f"{username}@example.com", password="x")
+            return UserProfile.objects.create(user=user, role=role, responsible_department=department)
+
+        self.admin = profile("admin", "admin")
+        self.chief = profile("chief", "chief", self.group)
+        self.manager = profile("manager", "manager", self.division)
+        self.proposal = ImprovementProposal.objects.create(
+            management_no="A-0001",
+            department=self.division,
+            group=self.group,
+            team=self.team,
+            proposer_name="提案者",
+            submitted_at=timezone.now(),
+        )
+
+    def test_submission_walks_chain_and_caches(self):
+        # 管理者は常に宛先に含まれるので最初の班の段階で確定する
+        self.assertEqual(
+            approvers.submission_recipients(self.proposal), ("supervisor", self.team, ["admin@example.com"])
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            approvers.submission_recipients(self.proposal)
+            self.assertEqual(
+                approvers.next_stage_recipients(self.proposal, ProposalApproval.Stage.CHIEF),
+                ("manager", ["admin@example.com", "manager@example.com"]),
+            )
+            self.assertEqual(approvers.next_stage_recipients(self.proposal, ProposalApproval.Stage.COMMITTEE), (None, []))
+        # キャッシュ済みの間は版数の確認だけでプロファイルを読み直さない
+        self.assertTrue(all("proposals_cacheversion" in query["sql"] for query in ctx.captured_queries))
+
+        # 管理者がいなければ班長不在の班を飛ばして係長へ
+        self.admin.delete()
+        self.assertEqual(
+            approvers.submission_recipients(self.proposal), ("chief", self.group, ["chief@example.com"])
+        )
+
+    def test_profile_and_user_changes_invalidate(self):
+        self.admin.user.delete()
+        self.assertEqual(approvers.submission_recipients(self.proposal)[0], "chief")
+        self.chief.responsible_department = self.team
+        self.chief.role = "supervisor"
+        self.chief.save()
+        self.assertEqual(approvers.submission_recipients(self.proposal)[0], "supervisor")
+
+        self.chief.user.is_active = False
+        self.chief.user.save(update_fields=["is_active"])
+        self.assertEqual(approvers.submission_recipients(self.proposal)[0], "manager")
+
+        version = cache_versions.current(approvers.VERSION_NAME)
+        self.manager.user.save(update_fields=["last_login"])
+        self.assertEqual(cache_versions.current(approvers.VERSION_NAME), version)
+
+    def test_version_is_shared_through_database(self):
+        # 別プロセスでの変更（DB の版数の更新だけがこのプロセスに見える）でも、キャッシュ済みの古い宛先を使わない
+        self.assertEqual(approvers.submission_recipients(self.proposal)[0], "supervisor")
+        UserProfile.objects.filter(pk=self.admin.pk).update(role="chief", responsible_department=self.division)
+        self.assertEqual(approvers.submission_recipients(self.proposal)[0], "supervisor")  # シグナルなしの更新はキャッシュのまま
+        cache_versions.bump(approvers.VERSION_NAME)
+        self.assertEqual(approvers.submission_recipients(self.proposal)[0], "chief")
+
+
+@override_settings(EMAIL_DIGEST_WINDOW_SECONDS=600)
+class ApprovalDigestTests(TestCase):
+    """まとめ送信では宛先ごとに期間内の承認依頼を1通にまとめ、処理済みの依頼は除くこと。"""
+
+    def setUp(self):
+        approvers.invalidate()
+        User = get_user_model()
+        division = Department.objects.create(name="製造部", level="division")
+        group = Department.objects.create(name="製造係", level="group", parent=division)
+        for username in ("chief1", "chief2"):
+            user = User.objects.create_user(username, email=f"{username}@example.com", password="x")
+            UserProfile.objects.create(user=user, role="chief", responsible_department=group)
+        self.proposals = []
+        for i in range(3):
+            proposal = ImprovementProposal.objects.create(
+                management_no=f"D-{i:04d}",
+                department=division,
+                group=group,
+                proposer_name=f"提案者{i}",
+                submitted_at=timezone.now(),
+            )
+            for stage in ProposalApproval.Stage.values:
+                ProposalApproval.objects.create(proposal=proposal, stage=stage)
+            self.proposals.append(proposal)
+
+    def _approve(self, proposal, stage):
+        response = self.client.post(
+            f"/api/improvement-proposals/{proposal.pk}/approve/",
+            {"stage": stage, "status": "approved", "confirmed_name": "承認者"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_groups_notices_per_recipient(self):
+        for proposal in self.proposals:
+            self._approve(proposal, ProposalApproval.Stage.SUPERVISOR)
+        self.assertEqual(ApprovalNotice.objects.count(), 6)
+        self.assertFalse(EmailOutbox.objects.exists())
+
+        # まとめ期間内は登録しない
+        self.assertEqual(digest.flush_due(), 0)
+        # 期間中に次の段階へ進んだ提案は含めない
+        self._approve(self.proposals[0], ProposalApproval.Stage.CHIEF)
+
+        self.assertEqual(digest.flush_due(timezone.now() + timedelta(minutes=11)), 2)
+        self.assertEqual(mail_outbox.deliver_pending(), (2, 2))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ["chief1@example.com", "chief2@example.com"])
+        for message in mail.outbox:
+            self.assertIn("2件", message.subject)
+            self.assertIn("D-0001", message.body)
+            self.assertIn("D-0002", message.body)
+            self.assertNotIn("D-0000", message.body)
+        self.assertEqual(digest.flush_due(timezone.now() + timedelta(minutes=30)), 0)
+
+
+class BulkApprovalTests(TestCase):
+    """一括承認は1件ずつの approve と同じ結果になり、通し番号を連番で採番し、宛先ごとに1通だけ通知すること。"""
+
+    def setUp(self):
+        approvers.invalidate()
+        User = get_user_model()
+        self.division = Department.objects.create(name="製造部", level="division")
+        for username, role in (("manager", "manager"), ("committee", "committee")):
+            user = User.objects.create_user(username, email=f"{username}@example.com", password="x")
+            UserProfile.objects.create(user=user, role=role, responsible_department=self.division)
+        self.employees = [
+            Employee.objects.create(code=f"B{i:03d}", name=f"社員{i}", department=self.division) for i in range(3)
+        ]
+        self.term = fiscal.fiscal_term(datetime(2025, 11, 1))
+        ImprovementProposal.objects.create(
+            management_no="B-EXIST", department=self.division, submitted_at=timezone.now(),
+            term=self.term, serial_number=7,
+        )
+
+    def _proposals(self, prefix, count):
+        proposals = []
+        for i in range(count):
+            proposal = ImprovementProposal.objects.create(
+                management_no=f"{prefix}-{i:04d}",
+                department=self.division,
+                proposer_name=f"提案者{i}",
+                submitted_at=datetime(2025, 11, 1 + i, 9),
+            )
+            for stage in ProposalApproval.Stage.values:
+                ProposalApproval.objects.create(proposal=proposal, stage=stage)
+            for position, employee in enumerate(self.employees[: 1 + i % 3]):
+                ProposalContributor.objects.create(
+                    proposal=proposal, employee=employee, employee_name=employee.name, is_primary=position == 0
+                )
+            proposals.append(proposal)
+        return proposals
+
+    def _decisions(self):
+        return [
+            {"stage": "supervisor"},
+            {"stage": "chief"},
+            {
+                "stage": "manager",
+                "proposal_classification": ImprovementProposal.ProposalClassification.IDEA,
+                "scores": {"mindset": 3, "idea": 4, "hint": 5},
+                "sdgs_flag": True,
+                "safety_flag": False,
+            },
+            {
+                "stage": "committee",
+                "committee_classification": ImprovementProposal.ProposalClassification.IDEA,
+                "term": self.term,
+                "quarter": 3,
+            },
+        ]
+
+    def _snapshot(self, proposals):
+        rows = []
+        for proposal in proposals:
+            proposal.refresh_from_db()
+            rows.append((
+                proposal.current_stage,
+                proposal.is_completed,
+                proposal.classification_points,
+                proposal.committee_classification,
+                list(proposal.approvals.order_by("stage").values_list("status", "mindset_score", "sdgs_flag")),
+                list(proposal.contributors.values_list("classification_points_share", "reward_amount")),
+                AnalyticsContribution.objects.filter(proposal=proposal).count(),
+            ))
+        return rows
+
+    def test_matches_single_approvals(self):
+        single = self._proposals("S", 3)
+        bulk = self._proposals("M", 3)
+        for decision in self._decisions():
+            payload = {"status": "approved", "confirmed_name": "承認者", **decision}
+            for proposal in single:
+                response = self.client.post(
+                    f"/api/improvement-proposals/{proposal.pk}/approve/", payload, content_type="application/json"
+                )
+                self.assertEqual(response.status_code, 200, response.content)
+            response = self.client.post(
+                "/api/improvement-proposals/bulk-approve/",
+                {**payload, "ids": [proposal.pk for proposal in bulk] + [999999]},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertEqual(response.json()["skipped"], [999999])
+
+        self.assertEqual(self._snapshot(bulk), self._snapshot(single))
+        self.assertTrue(all(row[1] for row in self._snapshot(bulk)))
+        # 1件ずつの採番（8〜10）の後にまとめて連番で採番される
+        self.assertEqual([proposal.serial_number for proposal in bulk], [11, 12, 13])
+
+    def test_queues_one_email_per_recipient(self):
+        proposals = self._proposals("Q", 4)
+        for stage in ("supervisor", "chief"):
+            response = self.client.post(
+                "/api/improvement-proposals/bulk-approve/",
+                {"ids": [proposal.pk for proposal in proposals], "stage": stage,
+                 "status": "approved", "confirmed_name": "承認者"},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+        queued = EmailOutbox.objects.filter(kind=EmailOutbox.Kind.DIGEST)
+        self.assertEqual([message.recipients for message in queued], [["manager@example.com"]])
+        self.assertIn("4件", queued[0].subject)
+
+    def test_rejects_unknown_ids(self):
+        response = self.client.post(
+            "/api/improvement-proposals/bulk-approve/",
+            {"ids": [999998, 999999], "stage": "supervisor", "status": "approved", "confirmed_name": "承認者"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["skipped"], [999998, 999999])
+
+
+class SequenceAllocatorTests(TestCase):
+    """採番カウンターは既存データの最大値から続き、まとめて確保した範囲を重複なく払い出すこと。"""
+
+    def test_seeds_from_existing_rows_and_allocates_blocks(self):
+        department = Department.objects.create(name="製造部", level="division")
+        for management_no, serial in (("20250401-009", 3), ("20250401-012", 41)):
+            ImprovementProposal.objects.create(
+                management_no=management_no, department=department, submitted_at=timezone.now(),
+                term=52, serial_number=serial,
+            )
+        self.assertEqual(sequences.allocate_management_numbers("20250401", 2), ["20250401-013", "20250401-014"])
+        self.assertEqual(sequences.allocate_management_numbers("20250402"), ["20250402-001"])
+        self.assertEqual(list(sequences.allocate_serial_numbers(52, 3)), [42, 43, 44])
+
+        sequences.ensure_serial_at_least(52, 60)
+        sequences.ensure_serial_at_least(52, 10)
+        self.assertEqual(list(sequences.allocate_serial_numbers(52)), [61])
+        sequences.ensure_serial_at_least(53, 5)
+        self.assertEqual(list(sequences.allocate_serial_numbers(53)), [6])
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class SequenceConcurrencyTests(TransactionTestCase):
+    """複数スレッドから同時に採番しても重複・欠番が出ないこと（行ロックが効く DB で実行）。"""
+
+    THREADS = 8
+    ROUNDS = 20
+
+    def _run_threads(self, target):
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker():
+            try:
+                barrier.wait()
+                target()
+            except Exception as exc:  # pragma: no cover - 失敗時の報告用
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_management_numbers_are_unique(self):
+        issued = []
+        lock = threading.Lock()
+
+        def allocate():
+            for _ in range(self.ROUNDS):
+                number = generate_management_no()
+                with lock:
+                    issued.append(number)
+
+        self._run_threads(allocate)
+        sequence_numbers = sorted(int(number.split("-")[-1]) for number in issued)
+        self.assertEqual(sequence_numbers, list(range(1, self.THREADS * self.ROUNDS + 1)))
+
+    def test_concurrent_serial_blocks_do_not_overlap(self):
+        issued = []
+        lock = threading.Lock()
+
+        def allocate():
+            for round_number in range(self.ROUNDS):
+                block = sequences.allocate_serial_numbers(52, 1 + round_number % 4)
+                with lock:
+                    issued.extend(block)
+
+        self._run_threads(allocate)
+        self.assertEqual(sorted(issued), list(range(1, len(issued) + 1)))
+
+
+class JisekiImportTests(TestCase):
+    """過去実績の一括取込は dry-run で何も登録せず、本取込で全段階承認済みの提案を登録し、再取込ではスキップすること。"""
+
+    def _frame(self):
+        return pd.DataFrame([
+            {"期": 52, "四半期": 1, "通し": 5, "年": 2025, "月": 10, "日": 3, "部門": "製造", "氏名": "山田",
+             "判定区分": "アイデア", "テーマ": "治具改善", "マインド": 3, "アイデア": 4, "ヒント": 2},
+            {"期": 52, "四半期": 2, "通し": 9, "年": 2026, "月": 1, "日": 20, "部門": "品質", "氏名": "佐藤",
+             "判定区分": "優秀", "テーマ": "検査短縮", "マインド": None, "アイデア": None, "ヒント": None},
+            {"期": 52, "四半期": 2, "通し": None, "年": 2026, "月": 2, "日": 1, "部門": "製造", "氏名": "",
+             "判定区分": "", "テーマ": "", "マインド": None, "アイデア": None, "ヒント": None},
+        ])
+
+    def test_dry_run_then_import_then_skip(self):
+        division = Department.objects.create(name="製造事業部", level="division")
+        employee = Employee.objects.create(code="E001", name="山田", department=division)
+
+        result = import_jiseki(self._frame(), chunk_size=2, dry_run=True)
+        self.assertEqual((result.created, result.skipped, result.departments_created), (3, 0, ["品質事業部"]))
+        self.assertFalse(ImprovementProposal.objects.exists())
+        self.assertFalse(Department.objects.filter(name="品質事業部").exists())
+
+        progress = []
+        result = import_jiseki(self._frame(), chunk_size=2, progress=lambda done, total, _: progress.append((done, total)))
+        self.assertEqual((result.created, result.skipped), (3, 0))
+        self.assertEqual(progress, [(2, 3), (3, 3)])
+        first = ImprovementProposal.objects.get(management_no="IMP-52-0005-000")
+        self.assertEqual((first.proposer, first.department, first.classification_points), (employee, division, 4))
+        self.assertTrue(first.is_completed)
+        self.assertEqual(ProposalApproval.objects.filter(status=ProposalApproval.Status.APPROVED).count(), 12)
+        third = ImprovementProposal.objects.get(management_no="IMP-52-0002-002")
+        self.assertEqual((third.proposer, third.proposer_name, third.department), (None, "不明", division))
+
+        result = import_jiseki(self._frame(), chunk_size=2)
+        self.assertEqual((result.created, result.skipped), (0, 3))
+        self.assertEqual(list(sequences.allocate_serial_numbers(52)), [10])
+
+
+class EmployeeImportTests(TestCase):
+    """従業員名簿の取込は社員番号で差分を取り、新規・更新・変更なし・無効化を件数で返すこと。"""
+
+    def _write(self, text):
+        handle = tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8-sig", delete=False)
+        with handle:
+            handle.write(text)
+        self.addCleanup(os.unlink, handle.name)
+        return handle.name
+
+    def test_diff_and_deactivate_missing(self):
+        production = Department.objects.create(name="製造部", level="department")
+        unchanged = Employee.objects.create(code="E001", name="山田", department=production, team="1班")
+        renamed = Employee.objects.create(code="E002", name="佐藤", department=production)
+        missing = Employee.objects.create(code="E003", name="鈴木", department=production)
+        csv_path = self._write(
+            "社員番号,氏名,部署,班,権限,雇用形態\n"
+            "E001,山田,製造部,1班,staff,社員\n"
+            "E002,佐藤花子,製造部,,班長,regular\n"
+            "E004,高橋,品質部,2班,,パート\n"
+        )
+
+        result = import_employees(csv_path, deactivate_missing=True, dry_run=True)
+        self.assertEqual(result.as_dict(), {"inserted": 1, "updated": 1, "unchanged": 1, "deactivated": 1})
+        self.assertFalse(Employee.objects.filter(code="E004").exists())
+        missing.refresh_from_db()
+        self.assertTrue(missing.is_active)
+
+        result = import_employees(csv_path, deactivate_missing=True)
+        self.assertEqual(result.as_dict(), {"inserted": 1, "updated": 1, "unchanged": 1, "deactivated": 1})
+        self.assertEqual(result.unknown_departments, {"品質部"})
+        renamed.refresh_from_db()
+        self.assertEqual((renamed.name, renamed.role), ("佐藤花子", Employee.Role.SUPERVISOR))
+        created = Employee.objects.get(code="E004")
+        self.assertEqual(
+            (created.department.name, created.team, created.role, created.employment_type),
+            ("未設定", "2班", Employee.Role.STAFF, Employee.EmploymentType.PART_TIME),
+        )
+        missing.refresh_from_db()
+        self.assertFalse(missing.is_active)
+        unchanged.refresh_from_db()
+        self.assertTrue(unchanged.is_active)
+
+        result = import_employees(csv_path)
+        self.assertEqual(result.as_dict(), {"inserted": 0, "updated": 0, "unchanged": 3, "deactivated": 0})
+
+    def test_legacy_name_only_roster(self):
+        csv_path = self._write("名簿\n山田\n\n佐藤\n")
+        result = import_employees(csv_path)
+        self.assertEqual(result.inserted, 2)
+        self.assertEqual(
+            sorted(Employee.objects.values_list("code", "name", "department__name")),
+            [("EMP0001", "山田", "未設定"), ("EMP0003", "佐藤", "未設定")],
+        )
+
+
+class DepartmentTreeTests(TestCase):
+    """部署階層の閉包テーブルが追加・付け替え・削除に追従し、従業員一覧の部署絞り込みが配下を含むこと。"""
+
+    def _names(self, department):
+        return set(Department.objects.descendants_of(department).values_list("name", flat=True))
+
+    def test_closure_follows_save_and_delete(self):
+        division = Department.objects.create(name="製造部", level="division")
+        section = Department.objects.create(name="製造課", level="section", parent=division)
+        group = Department.objects.create(name="組立係", level="group", parent=section)
+        team = Department.objects.create(name="1班", level="team", parent=group)
+        other = Department.objects.create(name="品質部", level="division")
+
+        self.assertEqual(self._names(division), {"製造部", "製造課", "組立係", "1班"})
+        below = Department.objects.descendants_of(division, include_self=False)
+        self.assertEqual(set(below.values_list("name", flat=True)), {"製造課", "組立係", "1班"})
+        above = Department.objects.ancestors_of(team).order_by("descendant_links__depth")
+        self.assertEqual(list(above.values_list("name", flat=True)), ["1班", "組立係", "製造課", "製造部"])
+
+        group.parent = other
+        group.save()
+        self.assertEqual(self._names(division), {"製造部", "製造課"})
+        self.assertEqual(self._names(other), {"品質部", "組立係", "1班"})
+        self.assertEqual(DepartmentClosure.objects.get(ancestor=other, descendant=team).depth, 2)
+
+        with self.assertRaises(ValidationError):
+            other.parent = team
+            other.save()
+
+        group.delete()
+        self.assertEqual(self._names(other), {"品質部"})
+        self.assertEqual(self._names(team), {"1班"})
+        self.assertFalse(DepartmentClosure.objects.filter(ancestor=other, descendant=team).exists())
+
+        snapshot = set(DepartmentClosure.objects.values_list("ancestor_id", "descendant_id", "depth"))
+        department_tree.rebuild()
+        self.assertEqual(set(DepartmentClosure.objects.values_list("ancestor_id", "descendant_id", "depth")), snapshot)
+
+    def test_admin_rejects_cycle_as_form_error(self):
+        division = Department.objects.create(name="製造部", level="division")
+        section = Department.objects.create(name="製造課", level="section", parent=division)
+        self.client.force_login(get_user_model().objects.create_superuser("admin", password="pw"))
+
+        response = self.client.post(
+            f"/admin/proposals/department/{division.pk}/change/",
+            {"name": "製造部", "level": "division", "display_id": 0, "parent": section.pk},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["adminform"].form.errors["parent"], [department_tree.CYCLE_ERROR])
+        division.refresh_from_db()
+        self.assertIsNone(division.parent_id)
+
+    def test_employee_filter_includes_descendants_in_one_query(self):
+        division = Department.objects.create(name="製造部", level="division")
+        group = Department.objects.create(name="組立係", level="group", parent=division)
+        Department.objects.create(name="1班", level="team", parent=group)
+        other = Department.objects.create(name="品質部", level="division")
+        Employee.objects.create(code="E1", name="山田", department=division, team="1班")
+        Employee.objects.create(code="E2", name="佐藤", department=other, group="組立係")
+        Employee.objects.create(code="E3", name="鈴木", department=division)
+        Employee.objects.create(code="E4", name="高橋", department=other)
+
+        with self.assertNumQueries(2):  # 参照データの版数 + 従業員
+            response = self.client.get("/api/employees/", {"department": division.pk})
+        self.assertEqual(sorted(row["code"] for row in response.json()), ["E1", "E2", "E3"])
+
+        response = self.client.patch(
+            f"/api/departments/{division.pk}/", {"parent": group.pk}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class EmployeeAffiliationTests(TestCase):
+    """係・班の名称は同じ階層の部署に解決され、部署絞り込みは別階層の同名部署と取り違えないこと。"""
+
+    def test_affiliation_resolves_by_level(self):
+        production = Department.objects.create(name="製造部", level="division")
+        quality = Department.objects.create(name="品質部", level="division")
+        assembly = Department.objects.create(name="組立係", level="group", parent=production)
+        # 製造部の係と同じ名前の班が品質部にある
+        Department.objects.create(name="検査", level="group", parent=production)
+        inspection_team = Department.objects.create(name="検査", level="team", parent=quality)
+
+        worker = Employee.objects.create(code="E1", name="山田", department=production, group="組立係")
+        inspector = Employee.objects.create(code="E2", name="佐藤", department=quality, team="検査")
+        self.assertEqual((worker.group_department, worker.team_department), (assembly, None))
+        self.assertEqual((inspector.group_department, inspector.team_department), (None, inspection_team))
+
+        response = self.client.get("/api/employees/", {"department": production.pk})
+        self.assertEqual([row["code"] for row in response.json()], ["E1"])
+        self.assertEqual(response.json()[0]["group_department"], assembly.pk)
+
+        inspector.team = ""
+        inspector.save()
+        self.assertIsNone(inspector.team_department_id)
+        response = self.client.get("/api/employees/", {"department": quality.pk})
+        self.assertEqual([row["code"] for row in response.json()], ["E2"])
+
+    def test_save_looks_up_only_its_own_affiliation(self):
+        production = Department.objects.create(name="製造部", level="division")
+        Department.objects.create(name="組立係", level="group", parent=production)
+        worker = Employee(code="E1", name="山田", department=production, group="組立係")
+        with self.assertNumQueries(1):
+            resolver = AffiliationResolver.for_employee(worker)
+        self.assertEqual(list(resolver.by_name), [("group", "組立係")])
+        with self.assertNumQueries(0):
+            AffiliationResolver.for_employee(Employee(code="E2", name="佐藤"))
+
+    def test_department_save_relinks_employees(self):
+        production = Department.objects.create(name="製造部", level="division")
+        worker = Employee.objects.create(code="E1", name="山田", department=production, group="塗装係")
+        self.assertIsNone(worker.group_department_id)
+
+        painting = Department.objects.create(name="塗装係", level="group", parent=production)
+        worker.refresh_from_db()
+        self.assertEqual(worker.group_department, painting)
+
+        painting.name = "塗装第一係"
+        painting.save()
+        worker.refresh_from_db()
+        self.assertIsNone(worker.group_department_id)
+
+
+class ReferenceDataCacheTests(TestCase):
+    """部署・在籍従業員の一覧は版数を ETag として返し、未変更なら版数の読み込みだけで 304、保存後は新しい一覧を返すこと。"""
+
+    def setUp(self):
+        caches["reference"].clear()
+        self.division = Department.objects.create(name="製造部", level="division")
+        Employee.objects.create(code="E1", name="山田", department=self.division)
+
+    def test_departments_and_employees_revalidate(self):
+        for path, params in (("/api/departments/", {"page_size": 200}), ("/api/employees/", {})):
+            first = self.client.get(path, params)
+            self.assertEqual(first.status_code, 200)
+            etag = first["ETag"]
+            with self.assertNumQueries(1):
+                cached = self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(cached.status_code, 304)
+            with self.assertNumQueries(1):
+                self.assertEqual(self.client.get(path, params).json(), first.json())
+
+        etag = self.client.get("/api/employees/")["ETag"]
+        Employee.objects.create(code="E2", name="佐藤", department=self.division)
+        response = self.client.get("/api/employees/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(row["code"] for row in response.json()), ["E1", "E2"])
+
+        etag = self.client.get("/api/departments/", {"level": "division"})["ETag"]
+        self.division.name = "第一製造部"
+        self.division.save()
+        response = self.client.get("/api/departments/", {"level": "division"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual([row["name"] for row in response.json()], ["第一製造部"])
+        self.assertEqual(self.client.get("/api/employees/").json()[0]["department_detail"]["name"], "第一製造部")
+
+    def test_version_is_shared_through_database(self):
+        # 別プロセスでの保存（DB の版数の加算だけがこのプロセスに見える）でも、キャッシュ済みの古い一覧を返さない
+        etag = self.client.get("/api/employees/")["ETag"]
+        Employee.objects.bulk_create([Employee(code="E2", name="佐藤", department=self.division)])
+        cache_versions.bump("reference:employees")
+        response = self.client.get("/api/employees/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(row["code"] for row in response.json()), ["E1", "E2"])
+
+class ProposalConditionalGetTests(TestCase):
+    """提案の一覧・詳細・分析は版数が同じ間 304 を返し、承認・削除の後は新しい内容を返すこと。"""
+
+    def setUp(self):
+        caches["reference"].clear()
+        self.division = Department.objects.create(name="製造部", level="division")
+        self.term = fiscal.fiscal_term(datetime(2025, 11, 1))
+        self.proposals = []
+        for i in range(2):
+            proposal = ImprovementProposal.objects.create(
+                management_no=f"C-{i:04d}", department=self.division, proposer_name=f"提案者{i}",
+                submitted_at=datetime(2025, 11, 1 + i, 9), term=self.term,
+            )
+            for stage in ProposalApproval.Stage.values:
+                ProposalApproval.objects.create(proposal=proposal, stage=stage)
+            self.proposals.append(proposal)
+
+    def _revalidate(self, path, params, response):
+        return self.client.get(path, params, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_list_and_detail(self):
+        path, params = "/api/improvement-proposals/", {"view": "summary"}
+        listing = self.client.get(path, params)
+        self.assertEqual(listing.status_code, 200)
+        with self.assertNumQueries(2):  # 件数・更新日時の集計 + 参照データの版数
+            self.assertEqual(self._revalidate(path, params, listing).status_code, 304)
+
+        detail_path = f"/api/improvement-proposals/{self.proposals[0].pk}/"
+        detail = self.client.get(detail_path)
+        self.assertIn("Last-Modified", detail)
+        self.assertEqual(self._revalidate(detail_path, {}, detail).status_code, 304)
+
+        # 承認段階が変わらない確認コメントだけでも版数が変わる
+        response = self.client.post(
+            f"/api/improvement-proposals/{self.proposals[0].pk}/approve/",
+            {"stage": "committee", "status": "pending", "comment": "確認中", "confirmed_name": "委員"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self._revalidate(detail_path, {}, detail).status_code, 200)
+        listing_after_approval = self._revalidate(path, params, listing)
+        self.assertEqual(listing_after_approval.status_code, 200)
+
+        self.proposals[1].delete()
+        response = self._revalidate(path, params, listing_after_approval)
+        self.assertEqual([row["management_no"] for row in response.json()["results"]], ["C-0000"])
+
+    def test_analytics(self):
+        path, params = "/api/improvement-proposals/analytics/", {"term": self.term}
+        first = self.client.get(path, params)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self._revalidate(path, params, first).status_code, 304)
+        report_jobs.bump_data_version([self.term])
+        self.assertEqual(self._revalidate(path, params, first).status_code, 200)
+
+
+@override_settings(IMAGE_ORIGINAL_MAX_SIZE=300, IMAGE_MEDIUM_SIZE=120, IMAGE_THUMBNAIL_SIZE=40)
+class ImageVariantTests(TempDirMixin, SimpleTestCase):
+    """提案画像は EXIF の向きを反映して EXIF を除いた原本と WebP の中サイズ・サムネイルになり、画像でないファイルはそのまま残すこと。"""
+
+    def setUp(self):
+        self.enable_settings(MEDIA_ROOT=str(self.make_temp_dir()))
+
+    def _upload(self, name, content):
+        return SimpleNamespace(name=name, read=lambda: content)
+
+    def test_orientation_size_and_variants(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # 90度回転して表示
+        exif[0x010F] = "CameraMaker"
+        buffer = BytesIO()
+        Image.new("RGB", (600, 400), (200, 30, 30)).save(buffer, "JPEG", exif=exif.tobytes())
+        raw = save_proposal_image(self._upload("photo.JPG", buffer.getvalue()), "IMG-1", "before", suffix="1")
+
+        variants = build_variants(raw)
+        self.assertEqual(variants.original, "proposals/IMG-1/before-1.jpg")
+        self.assertEqual(variants.medium, "proposals/IMG-1/before-1.medium.webp")
+        self.assertEqual(variants.thumbnail, "proposals/IMG-1/before-1.thumb.webp")
+        media_root = Path(settings.MEDIA_ROOT)
+        self.assertFalse((media_root / raw).exists())
+        with Image.open(media_root / variants.original) as original:
+            self.assertEqual(original.size, (200, 300))
+            self.assertEqual(dict(original.getexif()), {})
+        for path, size in ((variants.medium, (80, 120)), (variants.thumbnail, (27, 40))):
+            with Image.open(media_root / path) as variant:
+                self.assertEqual((variant.format, variant.size), ("WEBP", size))
+
+        with override_settings(IMAGE_VARIANT_FORMAT="JPEG"):
+            self.assertTrue(build_variants(variants.original).thumbnail.endswith(".thumb.jpg"))
+
+    def test_unreadable_file_is_kept(self):
+        raw = save_proposal_image(self._upload("scan.heic", b"not an image"), "IMG-2", "after", suffix="1")
+        self.assertEqual(build_variants(raw).__dict__, {"original": raw, "medium": "", "thumbnail": ""})
+        self.assertTrue((Path(settings.MEDIA_ROOT) / raw).exists())
+
+
+class ImageJobTests(TempDirMixin, TestCase):
+    """非同期モードでは画像を処理中で登録し、run_image_worker が派生画像を作って代表画像パスを置き換えること。"""
+
+    def setUp(self):
+        self.enable_settings(MEDIA_ROOT=str(self.make_temp_dir()), IMAGE_PROCESSING_ASYNC=True)
+        self.proposal = ImprovementProposal.objects.create(
+            management_no="IMGJOB-1",
+            department=Department.objects.create(name="製造部", level="division"),
+            submitted_at=timezone.now(),
+        )
+
+    def _queue(self, index):
+        buffer = BytesIO()
+        Image.new("RGB", (800, 600), (20, 120, 200)).save(buffer, "PNG")
+        upload = SimpleNamespace(name=f"photo{index}.png", read=lambda: buffer.getvalue())
+        raw = save_proposal_image(upload, self.proposal.management_no, "before", suffix=str(index))
+        image = ProposalImage.objects.create(
+            proposal=self.proposal, kind="before", image_path=raw, status=ProposalImage.Status.PROCESSING,
+            display_order=index,
+        )
+        image_jobs.enqueue(image)
+        return image
+
+    def test_worker_processes_jobs(self):
+        images = [self._queue(index) for index in range(3)]
+        self.proposal.before_image_path = images[0].image_path
+        self.proposal.save()
+        detail = self.client.get(f"/api/improvement-proposals/{self.proposal.pk}/").json()
+        self.assertEqual([image["status"] for image in detail["before_images"]], ["processing"] * 3)
+
+        call_command("run_image_worker", "--once", "--processes", "2", "--batch-size", "2", stdout=StringIO())
+        self.assertFalse(ImageJob.objects.exclude(status=ImageJob.Status.SUCCEEDED).exists())
+        for image in images:
+            image.refresh_from_db()
+            self.assertEqual(image.status, ProposalImage.Status.READY)
+            self.assertTrue(image.image_path.endswith(".jpg"))
+            self.assertTrue(image.thumbnail_path.endswith(".thumb.webp"))
+        self.proposal.refresh_from_db()
+        self.assertEqual(self.proposal.before_image_path, images[0].image_path)
+
+        ProposalImage.objects.create(proposal=self.proposal, kind="after", image_path="legacy/old.jpg")
+        self.assertEqual(image_jobs.enqueue_missing(), 1)
+        self.assertEqual(image_jobs.enqueue_missing(), 0)
+
+    def test_failed_job_retries_then_gives_up(self):
+        image = self._queue(1)
+        with override_settings(IMAGE_JOB_MAX_ATTEMPTS=2), mock.patch(
+            "proposals.services.image_jobs.build_variants", side_effect=RuntimeError("boom")
+        ):
+            self.assertEqual(image_jobs.process(image_jobs.claim_batch(5)), 0)
+            self.assertEqual(ImageJob.objects.get().status, ImageJob.Status.PENDING)
+            image_jobs.process(image_jobs.claim_batch(5))
+        job = ImageJob.objects.get()
+        self.assertEqual((job.status, job.attempts, job.error), (ImageJob.Status.FAILED, 2, "boom"))
+        image.refresh_from_db()
+        self.assertEqual(image.status, ProposalImage.Status.FAILED)
+
+    def test_image_deleted_mid_job_does_not_stop_worker(self):
+        deleted, kept = self._queue(1), self._queue(2)
+        jobs = image_jobs.claim_batch(5)
+        deleted_job = next(job for job in jobs if job.image_id == deleted.pk)
+        variants = build_variants(deleted.image_path)
+        deleted.delete()
+
+        self.assertFalse(image_jobs._complete(deleted_job, variants))
+        self.assertFalse((Path(settings.MEDIA_ROOT) / variants.thumbnail).exists())
+        self.assertEqual(image_jobs.process([job for job in jobs if job is not deleted_job]), 1)
+        kept.refresh_from_db()
+        self.assertEqual(kept.status, ProposalImage.Status.READY)
+
+
+class ImageBlobTests(TempDirMixin, TestCase):
+    """同じ内容の画像は1つの blob を共有して1回だけ変換し、参照がなくなったファイルは gc_image_blobs で削除されること。"""
+
+    def setUp(self):
+        self.media_root = self.make_temp_dir()
+        self.enable_settings(MEDIA_ROOT=str(self.media_root), IMAGE_PROCESSING_ASYNC=True)
+        self.department = Department.objects.create(name="製造部", level="division")
+        buffer = BytesIO()
+        Image.new("RGB", (640, 480), (90, 160, 40)).save(buffer, "JPEG")
+        self.content = buffer.getvalue()
+
+    def _proposal(self, management_no):
+        return ImprovementProposal.objects.create(
+            management_no=management_no, department=self.department, submitted_at=timezone.now()
+        )
+
+    def _attach(self, proposal, name="photo.jpg"):
+        upload = SimpleNamespace(name=name, read=lambda: self.content)
+        return ImprovementProposalSerializer()._save_images(proposal, [upload], ProposalImage.Kind.BEFORE)
+
+    def test_duplicate_uploads_share_one_blob(self):
+        first, second = self._proposal("BLOB-1"), self._proposal("BLOB-2")
+        self._attach(first)
+        self._attach(second, name="copy.JPG")
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(ImageJob.objects.count(), 2)
+
+        call_command("run_image_worker", "--once", "--processes", "1", stdout=StringIO())
+        self.assertFalse(ImageJob.objects.exclude(status=ImageJob.Status.SUCCEEDED).exists())
+        blob.refresh_from_db()
+        self.assertTrue(blob.is_processed)
+        self.assertEqual(blob.path, f"blobs/{blob.sha256[:2]}/{blob.sha256}.jpg")
+        images = ProposalImage.objects.all()
+        self.assertEqual({(image.status, image.image_path, image.thumbnail_path) for image in images},
+                         {(ProposalImage.Status.READY, blob.path, blob.thumbnail_path)})
+
+        # 変換済みの内容は再アップロードでそのまま使う
+        third = self._proposal("BLOB-3")
+        self.assertEqual(self._attach(third), [blob.path])
+        self.assertEqual(third.images.get().status, ProposalImage.Status.READY)
+        self.assertEqual(ImageJob.objects.count(), 2)
+        self.assertEqual(len(list((self.media_root / "blobs").rglob("*.jpg"))), 1)
+
+    def test_worker_finishes_images_of_processed_blobs(self):
+        first, second = self._proposal("BLOB-1"), self._proposal("BLOB-2")
+        self._attach(first)
+        self._attach(second)
+        # 1件目のジョブだけ処理し、2件目の画像はジョブを失ったものとする
+        image_jobs.process(image_jobs.claim_batch(1))
+        ImageJob.objects.filter(status=ImageJob.Status.PENDING).delete()
+        ProposalImage.objects.filter(proposal=second).update(status=ProposalImage.Status.PROCESSING)
+
+        stdout = StringIO()
+        call_command("run_image_worker", "--once", "--processes", "1", stdout=stdout)
+        self.assertIn("1件 完了にしました", stdout.getvalue())
+        blob = ImageBlob.objects.get()
+        self.assertEqual(second.images.get().thumbnail_path, blob.thumbnail_path)
+        self.assertFalse(ProposalImage.objects.exclude(status=ProposalImage.Status.READY).exists())
+
+    def test_gc_removes_unreferenced_files(self):
+        kept, removed = self._proposal("BLOB-1"), self._proposal("BLOB-2")
+        self._attach(removed)
+        blob = ImageBlob.objects.get()
+        legacy_kept = self.media_root / "proposals" / "BLOB-1" / "before-1.jpg"
+        legacy_removed = self.media_root / "proposals" / "BLOB-2" / "before-1.jpg"
+        for path in (legacy_kept, legacy_removed):
+            path.parent.mkdir(parents=True)
+            path.write_bytes(self.content)
+        ProposalImage.objects.create(proposal=kept, kind="before", image_path="proposals/BLOB-1/before-1.jpg")
+
+        removed.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+
+        stdout = StringIO()
+        call_command("gc_image_blobs", "--dry-run", stdout=stdout)
+        self.assertIn("blob 0件", stdout.getvalue())
+        call_command("gc_image_blobs", "--grace-seconds", "0", stdout=StringIO())
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse((self.media_root / blob.path).exists())
+        self.assertFalse(legacy_removed.parent.exists())
+        self.assertTrue(legacy_kept.exists())
+
+
+class MediaUrlTests(TempDirMixin, TestCase):
+    """画像 URL は内容が変わると変わる指紋付きで、署名付き配信では署名を確かめて X-Accel-Redirect / X-Sendfile に任せること。"""
+
+    def setUp(self):
+        media_root = self.make_temp_dir()
+        self.enable_settings(MEDIA_ROOT=str(media_root))
+        self.path = "blobs/ab/photo.jpg"
+        self.file = media_root / self.path
+        self.file.parent.mkdir(parents=True)
+        self.file.write_bytes(b"jpeg-bytes")
+
+    def test_public_urls_carry_the_stored_version(self):
+        self.assertEqual(build_media_url(None, self.path, "0123abcd"), "/media/blobs/ab/photo.jpg?v=0123abcd")
+        # 版のない（処理中・旧データの）URL は nginx が毎回再検証させる
+        self.assertEqual(build_media_url(None, self.path), "/media/blobs/ab/photo.jpg")
+        legacy = media.fingerprint(self.path)
+        self.file.write_bytes(b"replaced-bytes")
+        self.assertNotEqual(media.fingerprint(self.path), legacy)
+
+    def test_serializing_blob_images_does_not_stat_files(self):
+        department = Department.objects.create(name="製造部", level="division")
+        proposal = ImprovementProposal.objects.create(
+            management_no="MEDIA-1", department=department, submitted_at=datetime(2025, 11, 1, 9),
+            before_image_path=self.path,
+        )
+        blob = ImageBlob.objects.create(sha256="ab" * 32, path=self.path, is_processed=True)
+        image = image_jobs.attach(proposal, SimpleNamespace(name="photo.jpg", read=lambda: b""), "before", 0,
+                                  sha256=blob.sha256)
+        self.assertEqual(image.version, blob.sha256[:12])
+        with mock.patch("proposals.services.media.fingerprint", side_effect=AssertionError("stat")):
+            data = self.client.get(f"/api/improvement-proposals/{proposal.pk}/").json()
+        self.assertEqual(data["before_image_path"], f"/media/{self.path}?v={blob.sha256[:12]}")
+        self.assertEqual(data["before_images"][0]["thumbnail_url"], data["before_image_path"])
+
+    def test_signed_urls_delegate_file_transfer(self):
+        with override_settings(MEDIA_SENDFILE_BACKEND="nginx"):
+            url = build_media_url(None, self.path, "0123abcd")
+            self.assertTrue(url.startswith("/api/media/blobs/ab/photo.jpg?v="))
+            # 署名付き URL だけではログインしていない利用者に配信しない
+            self.assertEqual(self.client.get(url).status_code, 403)
+            self.client.force_login(get_user_model().objects.create_user("viewer", password="pw"))
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["X-Accel-Redirect"], "/protected-media/blobs/ab/photo.jpg")
+            self.assertEqual(response["Content-Type"], "image/jpeg")
+            self.assertIn("immutable", response["Cache-Control"])
+            self.assertIn("private", response["Cache-Control"])
+            tampered = url[:-1] + ("1" if url.endswith("0") else "0")
+            self.assertEqual(self.client.get(tampered).status_code, 404)
+            self.assertEqual(self.client.get(url.replace("photo.jpg", "other.jpg")).status_code, 404)
+
+        with override_settings(MEDIA_SENDFILE_BACKEND="sendfile"):
+            response = self.client.get(build_media_url(None, self.path, "0123abcd"))
+            self.assertEqual(response["X-Sendfile"], str(self.file))
+        with override_settings(MEDIA_SENDFILE_BACKEND="django"):
+            response = self.client.get(build_media_url(None, self.path, "0123abcd"))
+            self.assertEqual(b"".join(response.streaming_content), b"jpeg-bytes")
+        # 公開配信のときは署名付き URL を受け付けない
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ChunkedUploadTests(TempDirMixin, TestCase):
+    """分割アップロードは一時ファイルに追記して途中から再開でき、SHA-256 を確かめてから提案に添付されること。"""
+
+    def setUp(self):
+        tmp = self.make_temp_dir()
+        self.enable_settings(
+            MEDIA_ROOT=str(tmp / "media"), CHUNKED_UPLOAD_ROOT=str(tmp / "uploads"), IMAGE_PROCESSING_ASYNC=True
+        )
+        buffer = BytesIO()
+        Image.effect_noise((400, 300), 64).convert("RGB").save(buffer, "PNG")
+        self.content = buffer.getvalue()
+        self.proposal = ImprovementProposal.objects.create(
+            management_no="UPLOAD-1",
+            department=Department.objects.create(name="製造部", level="division"),
+            submitted_at=timezone.now(),
+        )
+
+    def _start(self, sha256=None):
+        response = self.client.post(
+            "/api/uploads/",
+            {"filename": "large.png", "size": len(self.content), "sha256": sha256 or hashlib.sha256(self.content).hexdigest()},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["id"]
+
+    def _send(self, upload_id, offset, data):
+        return self.client.generic(
+            "PATCH", f"/api/uploads/{upload_id}/", data, content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_resume_and_attach(self):
+        upload_id = self._start()
+        half = len(self.content) // 2
+        self.assertEqual(self._send(upload_id, 0, self.content[:half]).json()["offset"], half)
+        # 送り直しで位置がずれていれば受信済みの位置を返す
+        conflict = self._send(upload_id, 0, self.content[:half])
+        self.assertEqual((conflict.status_code, conflict.json()["offset"]), (409, half))
+        self.assertEqual(self.client.get(f"/api/uploads/{upload_id}/").json()["offset"], half)
+        done = self._send(upload_id, half, self.content[half:]).json()
+        self.assertEqual((done["offset"], done["status"]), (len(self.content), "complete"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/api/uploads/{upload_id}/attach/", {"proposal": self.proposal.pk, "kind": "before"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 201)
+        image = ProposalImage.objects.get()
+        self.assertEqual((image.status, image.blob.sha256), ("processing", hashlib.sha256(self.content).hexdigest()))
+        self.proposal.refresh_from_db()
+        self.assertEqual(self.proposal.before_image_path, image.image_path)
+        self.assertFalse(any(Path(settings.CHUNKED_UPLOAD_ROOT).iterdir()))
+        self.assertEqual(
+            self.client.post(f"/api/uploads/{upload_id}/attach/", {"proposal": self.proposal.pk, "kind": "before"},
+                             content_type="application/json").status_code,
+            409,
+        )
+
+    def test_interrupted_chunk_keeps_received_bytes(self):
+        upload = ChunkedUpload.objects.get(pk=self._start())
+
+        class DroppedStream:
+            def __init__(self, data):
+                self.data = BytesIO(data)
+
+            def read(self, size):
+                block = self.data.read(min(size, 1000))
+                if not block:
+                    raise OSError("connection reset")
+                return block
+
+        self.assertEqual(chunked_uploads.append(upload, DroppedStream(self.content[:2500])), 2500)
+        self.assertEqual(ChunkedUpload.objects.get().offset, 2500)
+
+    def test_concurrent_chunks_do_not_overlap(self):
+        upload_id = self._start()
+        upload = ChunkedUpload.objects.get(pk=upload_id)
+        # 別のリクエストが書き込み中（ロックファイルあり）なら受信済みの位置を返す
+        with chunked_uploads.writing(upload) as acquired:
+            self.assertTrue(acquired)
+            conflict = self._send(upload_id, 0, self.content)
+            self.assertEqual((conflict.status_code, conflict.json()["offset"]), (409, 0))
+        # 受信中に offset が進んでいたら確定しない
+        ChunkedUpload.objects.filter(pk=upload_id).update(offset=10)
+        self.assertEqual(chunked_uploads.append(upload, BytesIO(self.content)), 0)
+        self.assertEqual(upload.offset, 10)
+
+        # 更新の止まったロック（ワーカー停止）は取り直す
+        ChunkedUpload.objects.filter(pk=upload_id).update(offset=0)
+        chunked_uploads.lock_path(upload).touch()
+        stale = time.time() - chunked_uploads.LOCK_STALE_SECONDS - 1
+        os.utime(chunked_uploads.lock_path(upload), (stale, stale))
+        self.assertEqual(self._send(upload_id, 0, self.content).json()["status"], "complete")
+        self.assertFalse(chunked_uploads.lock_path(upload).exists())
+
+    def test_checksum_mismatch_fails(self):
+        upload_id = self._start(sha256="0" * 64)
+        self.assertEqual(self._send(upload_id, 0, self.content).json()["status"], "failed")
+        self.assertFalse(any(Path(settings.CHUNKED_UPLOAD_ROOT).iterdir()))
+        bad = self.client.post("/api/uploads/", {"filename": "x.png", "size": 0, "sha256": "zz"}, content_type="application/json")
+        self.assertEqual(set(bad.json()), {"size", "sha256"})
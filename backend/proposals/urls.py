@@ -2,6 +2,7 @@ from rest_framework import routers
 from django.urls import path
 
 from .views import (
+    ChunkedUploadViewSet,
     DebugView,
     CurrentEmployeeView,
     DepartmentViewSet,
@@ -11,6 +12,8 @@ from .views import (
     ImprovementProposalViewSet,
     LoginView,
     LogoutView,
+    MediaFileView,
+    ReportJobViewSet,
 )
 
 router = routers.DefaultRouter()
@@ -19,10 +22,13 @@ router.register(r"users", UserViewSet)
 router.register(r"employees", EmployeeViewSet)
 router.register(r"permissions", UserPermissionViewSet)
 router.register(r"improvement-proposals", ImprovementProposalViewSet, basename="improvement-proposals")
+router.register(r"report-jobs", ReportJobViewSet)
+router.register(r"uploads", ChunkedUploadViewSet)
 
 urlpatterns = [
     path('debug/', DebugView.as_view(), name='debug'),
     path('auth/login/', LoginView.as_view(), name='auth-login'),
     path('auth/logout/', LogoutView.as_view(), name='auth-logout'),
     path("employees/me/", CurrentEmployeeView.as_view(), name="employees-me"),
+    path("media/<path:path>", MediaFileView.as_view(), name="media-file"),
 ] + router.urls
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import hashlib
+from collections import defaultdict
 from datetime import datetime, time
 
-from django.db.models import Count, F, Q, Max
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Max, Prefetch
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
 from django.contrib.auth import authenticate, login, logout
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt
 from django.middleware.csrf import get_token
 from django.utils import timezone
-from rest_framework import status, viewsets
+from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
@@ -17,75 +24,44 @@ from rest_framework.views import APIView
 
 from django.contrib.auth import get_user_model
 from .models import (
+    ChunkedUpload,
     Department,
     Employee,
     UserPermission,
     ImprovementProposal,
     ProposalApproval,
+    EmailOutbox,
     ProposalContributor,
+    ReportJob,
     UserProfile,
 )
 from .serializers import (
     ApprovalActionSerializer,
+    BulkApprovalActionSerializer,
+    ChunkedUploadAttachSerializer,
+    ChunkedUploadSerializer,
     DepartmentSerializer,
+    ProposalImageSerializer,
+    ReportJobSerializer,
     UserPermissionSerializer,
     UserSerializer,
     UserCreateUpdateSerializer,
     EmployeeSerializer,
     ImprovementProposalSerializer,
+    ImprovementProposalSummarySerializer,
 )
 
 User = get_user_model()
-from .services import fiscal
-from .services.reports import generate_term_report
-
-
-def get_smtp_connection_for_user(user):
-    """指定されたユーザーのSMTP設定を使用してメール接続を作成"""
-    from django.core.mail import get_connection
-    from django.conf import settings
-    import logging
-    logger = logging.getLogger(__name__)
-
-    if not user:
-        logger.info("[mail] no user -> default SMTP")
-        return None, settings.DEFAULT_FROM_EMAIL
-
-    try:
-        # ユーザーのプロファイルからSMTP設定を取得
-        if hasattr(user, 'profile') and user.profile:
-            profile = user.profile
-
-            # SMTP設定が全て揃っているか確認
-            if (profile.smtp_host and profile.smtp_user and
-                profile.smtp_password and user.email):
-
-                # ユーザーのSMTP設定を使用して接続を作成
-                # 開発環境では暗号化なしで接続（TLSをオフ）
-                connection = get_connection(
-                    backend='django.core.mail.backends.smtp.EmailBackend',
-                    host=profile.smtp_host,
-                    port=profile.smtp_port or 587,
-                    username=profile.smtp_user,
-                    password=profile.smtp_password,
-                    use_tls=False,  # 開発環境では証明書エラーを回避するためFalse
-                    fail_silently=False,
-                )
-                from_email = user.email
-                logger.info(
-                    "[mail] approval: use user SMTP user=%s host=%s port=%s from=%s",
-                    getattr(user, "username", None),
-                    profile.smtp_host,
-                    profile.smtp_port or 587,
-                    from_email,
-                )
-                return connection, from_email
-    except Exception as e:
-        logger.error("Error getting SMTP settings for user %s: %s", getattr(user, "username", None), e)
-
-    # フォールバック: デフォルト設定を使用
-    logger.warning("[mail] fallback default SMTP for user=%s", getattr(user, "username", None))
-    return None, settings.DEFAULT_FROM_EMAIL
+from .pagination import ProposalCursorPagination
+from .services import fiscal, workflow
+from .services import analytics as proposal_analytics
+from .services import approvers, chunked_uploads, digest, mail_outbox, media
+from .services import reference_data
+from .services import report_jobs, sequences
+from .services import search as proposal_search
+from .services.report_export import export_term_report
+from .services.reports import generate_term_report, term_report_queryset
+from .services.workflow import refresh_stage_state
 
 
 def calculate_classification_points(classification: str | None) -> int | None:
@@ -103,14 +79,19 @@ def calculate_classification_points(classification: str | None) -> int | None:
 
 def _distribute_classification_points(proposal: ImprovementProposal) -> None:
     """均等割りで提案ポイントと報奨金をProposalContributorに保存する。"""
-    from decimal import Decimal, ROUND_HALF_UP
-
     points = proposal.classification_points
     if points is None:
         return
     contributors = list(proposal.contributors.all())
     if not contributors:
         return
+    _assign_classification_point_shares(points, contributors)
+    ProposalContributor.objects.bulk_update(contributors, ["classification_points_share", "reward_amount"])
+
+
+def _assign_classification_point_shares(points: int, contributors: list[ProposalContributor]) -> None:
+    """提案ポイントと報奨金の均等割りを共同提案者に設定する（保存は呼び出し側）。"""
+    from decimal import Decimal, ROUND_HALF_UP
 
     total_points = Decimal(points)
     total_reward = total_points * Decimal("300")
@@ -137,7 +118,34 @@ def _distribute_classification_points(proposal: ImprovementProposal) -> None:
                 reward_share = (base_reward + remainder_reward).quantize(Decimal("0"), rounding=ROUND_HALF_UP)
         contrib.classification_points_share = points_share
         contrib.reward_amount = reward_share
-    ProposalContributor.objects.bulk_update(contributors, ["classification_points_share", "reward_amount"])
+
+
+def _version_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _with_validators(response, etag: str, last_modified=None):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # ブラウザに保存させ、毎回 If-None-Match / If-Modified-Since で再検証させる
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _not_modified(request, etag: str, last_modified=None):
+    """条件付き GET が一致すれば 304 応答（一致しなければ None）。"""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified.timestamp() if last_modified else None
+    )
+    return _with_validators(response, etag, last_modified) if response is not None else None
+
+
+def _reference_response(request, dataset: str, current: str, data):
+    """参照データの一覧を ETag 付きで返す（If-None-Match が一致すれば 304）。"""
+    etag = reference_data.etag(dataset, current)
+    return _not_modified(request, etag) or _with_validators(Response(data), etag)
 
 
 class DepartmentViewSet(viewsets.ModelViewSet):
@@ -153,11 +161,21 @@ class DepartmentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(level=level)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        level = request.query_params.get("level") or ""
+        current, data = reference_data.cached(
+            reference_data.DEPARTMENTS,
+            f"list:{level}",
+            lambda: self.get_serializer(self.get_queryset(), many=True).data,
+        )
+        return _reference_response(request, reference_data.DEPARTMENTS, current, data)
+
 
 class ImprovementProposalViewSet(viewsets.ModelViewSet):
     serializer_class = ImprovementProposalSerializer
     permission_classes = [AllowAny]
-    pagination_class = None
+    # submitted_at, id のキーセットでページング（?page_size=all で全件）
+    pagination_class = ProposalCursorPagination
 
     def create(self, request, *args, **kwargs):
         import logging
@@ -196,22 +214,114 @@ class ImprovementProposalViewSet(viewsets.ModelViewSet):
 
         return super().destroy(request, *args, **kwargs)
 
-    def get_queryset(self):
-        queryset = (
-            ImprovementProposal.objects.select_related(
-                "department", "section", "group", "team", "proposer", "created_by"
-            )
-            .prefetch_related("approvals__confirmed_by", "images", "contributors__employee")
-            .annotate(
-                total_approvals=Count("approvals", distinct=True),
-                approved_count=Count(
-                    "approvals",
-                    filter=Q(approvals__status=ProposalApproval.Status.APPROVED),
-                    distinct=True,
-                ),
+    def _representation_version(self) -> tuple[str, str]:
+        # 一覧・詳細には部署名・従業員名も含まれるため参照データの版数も加える
+        return reference_data.versions(reference_data.DEPARTMENTS, reference_data.EMPLOYEES)
+
+    def list(self, request, *args, **kwargs):
+        # 絞り込み後の件数と MAX(updated_at) を一覧の版数にする（削除は件数で検知）。
+        # 削除では MAX(updated_at) が変わらないことがあるため、一覧には Last-Modified を付けない
+        stats = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            total=Count("id"), latest=Max("updated_at")
+        )
+        latest = stats["latest"].isoformat() if stats["latest"] else ""
+        etag = _version_etag("list", stats["total"], latest, *self._representation_version())
+        return _not_modified(request, etag) or _with_validators(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            updated_at = (
+                ImprovementProposal.objects.filter(pk=kwargs.get(self.lookup_field))
+                .values_list("updated_at", flat=True)
+                .first()
             )
-            .order_by("-submitted_at")
+        except (TypeError, ValueError):
+            updated_at = None
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag = _version_etag(
+            "detail", kwargs.get(self.lookup_field), updated_at.isoformat(), *self._representation_version()
         )
+        last_modified = updated_at.replace(microsecond=0)
+        return _not_modified(request, etag, last_modified) or _with_validators(
+            super().retrieve(request, *args, **kwargs), etag, last_modified
+        )
+
+    # ?fields= で不要な場合に prefetch を省略できる関連と、それを必要とする出力フィールド
+    PROJECTION_PREFETCHES = {
+        "images": {"images", "before_images", "after_images", "before_image_path", "after_image_path"},
+        "contributors__employee": {"contributors"},
+    }
+
+    def _requested_fields(self) -> list[str] | None:
+        """?fields=a,b,c で指定された出力フィールド（一覧・詳細・検索のみ有効）。"""
+        if self.action not in ("list", "retrieve", "search"):
+            return None
+        raw = self.request.query_params.get("fields")
+        if not raw:
+            return None
+        fields = [name.strip() for name in raw.split(",") if name.strip()]
+        return fields or None
+
+    def _use_summary(self) -> bool:
+        """一覧で ?view=summary、または要求フィールドが軽量版で賄える場合に True。"""
+        if self.action == "search":
+            # 検索結果は既定で軽量版（?view=full で全項目）
+            return self.request.query_params.get("view") != "full"
+        if self.action != "list":
+            return False
+        if self.request.query_params.get("view") == "summary":
+            return True
+        fields = self._requested_fields()
+        return bool(fields) and set(fields) <= set(ImprovementProposalSummarySerializer.Meta.fields)
+
+    def get_serializer_class(self):
+        if self._use_summary():
+            return ImprovementProposalSummarySerializer
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self._requested_fields()
+        if fields:
+            kwargs.setdefault("fields", fields)
+        return super().get_serializer(*args, **kwargs)
+
+    @staticmethod
+    def _approver_scope(user) -> tuple[str | None, int | None]:
+        """(役職, 担当部署ID)。プロファイルがなければ従業員情報の役職・所属部署。"""
+        profile = getattr(user, "profile", None)
+        if profile is not None:
+            return profile.role, profile.responsible_department_id
+        employee = getattr(user, "employee_profile", None)
+        if employee is not None:
+            return employee.role, employee.department_id
+        return None, None
+
+    def get_queryset(self):
+        if self._use_summary():
+            queryset = (
+                ImprovementProposal.objects.select_related("department", "section", "group", "team")
+                .only(*ImprovementProposalSummarySerializer.QUERYSET_ONLY)
+                .prefetch_related(
+                    Prefetch(
+                        "approvals",
+                        queryset=ProposalApproval.objects.only("id", "proposal_id", "stage", "status"),
+                    )
+                )
+            )
+        else:
+            prefetches = ["approvals__confirmed_by", "images", "contributors__employee"]
+            fields = self._requested_fields()
+            if fields:
+                prefetches = [
+                    lookup for lookup in prefetches
+                    if lookup not in self.PROJECTION_PREFETCHES
+                    or self.PROJECTION_PREFETCHES[lookup] & set(fields)
+                ]
+            queryset = ImprovementProposal.objects.select_related(
+                "department", "section", "group", "team", "proposer", "created_by"
+            ).prefetch_related(*prefetches)
+        queryset = queryset.order_by("-submitted_at", "-id")
         params = self.request.query_params
         stage = params.get("stage")
         status_value = params.get("status")
@@ -229,12 +339,22 @@ class ImprovementProposalViewSet(viewsets.ModelViewSet):
         if department_id:
             queryset = queryset.filter(department_id=department_id)
 
-        if keyword:
-            queryset = queryset.filter(
-                Q(management_no__icontains=keyword)
-                | Q(proposer_name__icontains=keyword)
-                | Q(deployment_item__icontains=keyword)
-            )
+        if params.get("scope") == "approver":
+            # 承認センター: ログインユーザーの役職・担当部署が管轄する提案に絞る（ページングの前に絞り込む）
+            scope = approvers.scope_filter(*self._approver_scope(self.request.user))
+            if scope is not None:
+                queryset = queryset.filter(scope)
+
+        if keyword and self.action != "search":
+            if params.get("search") == "fulltext":
+                # テーマ・本文を FULLTEXT(ngram) インデックスで検索
+                queryset = proposal_search.filter_proposals(queryset, keyword)
+            else:
+                queryset = queryset.filter(
+                    Q(management_no__icontains=keyword)
+                    | Q(proposer_name__icontains=keyword)
+                    | Q(deployment_item__icontains=keyword)
+                )
 
         if term_value:
             try:
@@ -300,63 +420,37 @@ class ImprovementProposalViewSet(viewsets.ModelViewSet):
         status_choices = dict(ProposalApproval.Status.choices)
 
         if stage in stage_choices and status_value in status_choices:
-            # Filter for the current stage's status.
-            queryset = queryset.filter(approvals__stage=stage, approvals__status=status_value)
-
-            # Ensure all preceding stages are approved.
-            stages_order = [s[0] for s in ProposalApproval.Stage.choices]
-            if stage in stages_order:
-                current_stage_index = stages_order.index(stage)
-                for i in range(current_stage_index):
-                    preceding_stage = stages_order[i]
-                    queryset = queryset.filter(
-                        approvals__stage=preceding_stage,
-                        approvals__status=ProposalApproval.Status.APPROVED,
-                    )
-            queryset = queryset.distinct()
+            # 前段階が全て承認済み、かつ指定段階が指定ステータスの提案（非正規化列で判定）
+            if status_value == ProposalApproval.Status.APPROVED:
+                queryset = queryset.filter(current_stage__in=workflow.stages_after(stage))
+            else:
+                queryset = queryset.filter(current_stage=stage, current_status=status_value)
         elif status_value == "completed":
-            queryset = queryset.filter(approved_count=F("total_approvals"))
+            queryset = queryset.filter(is_completed=True)
 
         return queryset
 
-    @action(detail=True, methods=["post"])
-    def approve(self, request, pk=None):
-        from django.core.mail import send_mail
-        from django.conf import settings
-
-        proposal = self.get_object()
-        serializer = ApprovalActionSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
+    @staticmethod
+    def _fill_approval(approval: ProposalApproval, data: dict, user, confirmed_at) -> None:
+        """承認段階の行に承認内容を設定する（保存は呼び出し側）。"""
         stage = data["stage"]
-        status_val = data["status"]
-        term = data.get("term")
-        quarter = data.get("quarter")
-        proposal_classification = data.get("proposal_classification")
-        committee_classification = data.get("committee_classification")
-
-        approval = ProposalApproval.objects.filter(proposal=proposal, stage=stage).first()
-        if not approval:
-            return Response({"detail": "Invalid stage"}, status=status.HTTP_400_BAD_REQUEST)
-
-        approval.status = status_val
+        approval.status = data["status"]
         if "comment" in data:
             approval.comment = data.get("comment") or ""
         approval.confirmed_name = data["confirmed_name"]
-        approval.confirmed_at = timezone.now()
+        approval.confirmed_at = confirmed_at
         if stage == ProposalApproval.Stage.MANAGER:
             approval.sdgs_flag = bool(data.get("sdgs_flag"))
             approval.safety_flag = bool(data.get("safety_flag"))
-        
+
         # ログインユーザーのUserProfileまたはEmployee Profileを取得
-        user = request.user
         if hasattr(user, 'profile'):
             # UserProfileベース
             pass  # 特に追加で紐付ける情報がない場合は何もしない
         elif hasattr(user, 'employee_profile'):
             # Employeeベース
             approval.confirmed_by = user.employee_profile
-            
+
         scores = data.get("scores") or {}
         if stage == ProposalApproval.Stage.MANAGER:
             approval.mindset_score = scores.get("mindset")
@@ -364,11 +458,16 @@ class ImprovementProposalViewSet(viewsets.ModelViewSet):
             approval.hint_score = scores.get("hint")
         else:
             approval.mindset_score = approval.idea_score = approval.hint_score = None
-        
-        approval.save()
 
-        if stage == ProposalApproval.Stage.MANAGER and status_val == ProposalApproval.Status.APPROVED:
-            updated_fields = []
+    @staticmethod
+    def _apply_decision_fields(proposal: ImprovementProposal, data: dict) -> list[str]:
+        """部門長・改善委員の承認内容を提案に設定し、更新した列を返す（通し番号・ポイント配分は除く）。"""
+        stage = data["stage"]
+        if data["status"] != ProposalApproval.Status.APPROVED:
+            return []
+        updated_fields = []
+        if stage == ProposalApproval.Stage.MANAGER:
+            proposal_classification = data.get("proposal_classification")
             if proposal_classification:
                 proposal.proposal_classification = proposal_classification
                 updated_fields.append("proposal_classification")
@@ -376,150 +475,283 @@ class ImprovementProposalViewSet(viewsets.ModelViewSet):
                 proposal.classification_points = points
                 updated_fields.append("classification_points")
             # 評価基準スコアを提案テーブルに保存
+            scores = data.get("scores") or {}
             if scores:
                 proposal.mindset_score = scores.get("mindset")
                 proposal.idea_score = scores.get("idea")
                 proposal.hint_score = scores.get("hint")
                 updated_fields.extend(["mindset_score", "idea_score", "hint_score"])
-            # 提案ポイントを共同提案者に均等配分
-            if proposal.classification_points is not None:
-                _distribute_classification_points(proposal)
-            if updated_fields:
-                proposal.save(update_fields=updated_fields)
-
-        if stage == ProposalApproval.Stage.COMMITTEE and status_val == ProposalApproval.Status.APPROVED:
-            updated_fields = []
+        elif stage == ProposalApproval.Stage.COMMITTEE:
+            committee_classification = data.get("committee_classification")
             if committee_classification:
                 proposal.committee_classification = committee_classification
                 updated_fields.append("committee_classification")
-            if term is not None:
-                proposal.term = term
+            if data.get("term") is not None:
+                proposal.term = data["term"]
                 updated_fields.append("term")
-            if quarter is not None:
-                proposal.quarter = quarter
+            if data.get("quarter") is not None:
+                proposal.quarter = data["quarter"]
                 updated_fields.append("quarter")
+        return updated_fields
+
+    @staticmethod
+    def _assigns_serial(data: dict) -> bool:
+        return (
+            data["stage"] == ProposalApproval.Stage.COMMITTEE
+            and data["status"] == ProposalApproval.Status.APPROVED
+            and data.get("term") is not None
+        )
 
-            # 通し番号を自動採番（期ごとに連番）
-            if term is not None:
-                max_serial = ImprovementProposal.objects.filter(
-                    term=term
-                ).aggregate(Max('serial_number'))['serial_number__max']
-                proposal.serial_number = (max_serial or 0) + 1
-                updated_fields.append("serial_number")
-
-            if updated_fields:
-                proposal.save(update_fields=updated_fields)
-
-        # メール送信ロジック
-        if status_val == ProposalApproval.Status.APPROVED:
-            stages_order = [s.value for s in ProposalApproval.Stage]
-            current_stage_index = stages_order.index(stage)
-
-            if current_stage_index + 1 < len(stages_order):
-                next_stage = stages_order[current_stage_index + 1]
-
-                # proposals_userprofile テーブルから管轄者を検索
-                # auth_user.email からメールアドレスを取得
-                from proposals.models import UserProfile
-
-                next_approvers_query = Q()
-                role_map = {
-                    "supervisor": "supervisor",
-                    "chief": "chief",
-                    "manager": "manager",
-                    "committee": "committee",
-                    "committee_chair": "committee_chair"
-                }
-                next_role = role_map.get(next_stage)
-
-                if next_role:
-                    department_q = Q()
-                    if next_role == 'supervisor' and proposal.team:
-                        department_q = Q(responsible_department=proposal.team)
-                    elif next_role == 'chief' and proposal.group:
-                        department_q = Q(responsible_department=proposal.group)
-                    elif next_role == 'manager' and proposal.section:
-                        department_q = Q(responsible_department=proposal.section)
-                    elif next_role == 'manager' and proposal.department:
-                         department_q = Q(responsible_department=proposal.department)
-                    elif next_role in ['committee', 'committee_chair'] and proposal.section:
-                        department_q = Q(responsible_department=proposal.section)
-                    elif next_role in ['committee', 'committee_chair'] and proposal.department:
-                        department_q = Q(responsible_department=proposal.department)
-
-                    if department_q:
-                        next_approvers_query = Q(role=next_role) & department_q
-
-                # システム管理者にも通知
-                next_approvers_query |= Q(role='admin')
-
-                if next_approvers_query:
-                    next_profiles = UserProfile.objects.filter(
-                        next_approvers_query,
-                        user__isnull=False,
-                        user__is_active=True,
-                        user__email__isnull=False
-                    ).exclude(user__email__exact='').select_related('user')
-
-                    recipient_list = [profile.user.email for profile in next_profiles if profile.user and profile.user.email]
-
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.info(
-                        "[mail] approval: next_stage=%s next_role=%s recipients=%s",
-                        next_stage,
-                        next_role,
-                        recipient_list
+    @transaction.atomic
+    def _apply_approval(self, proposal: ImprovementProposal, data: dict, user) -> ProposalApproval | None:
+        """承認結果を保存し、提案側の集計列・承認状況を同一トランザクションで更新する。"""
+        approval = (
+            ProposalApproval.objects.select_for_update()
+            .filter(proposal=proposal, stage=data["stage"])
+            .first()
+        )
+        if not approval:
+            return None
+
+        self._fill_approval(approval, data, user, timezone.now())
+        approval.save()
+
+        updated_fields = self._apply_decision_fields(proposal, data)
+        # 提案ポイントを共同提案者に均等配分
+        if "classification_points" in updated_fields and proposal.classification_points is not None:
+            _distribute_classification_points(proposal)
+        # 通し番号を自動採番（期ごとに連番）
+        if self._assigns_serial(data):
+            proposal.serial_number = sequences.allocate_serial_numbers(data["term"])[0]
+            updated_fields.append("serial_number")
+        # 承認内容だけの変更でも一覧・詳細の版数（updated_at）を進める
+        proposal.save(update_fields=[*updated_fields, "updated_at"])
+
+        refresh_stage_state(proposal)
+        proposal_analytics.refresh_proposal(proposal)
+        return approval
+
+    @transaction.atomic
+    def _apply_bulk_approval(self, ids: list[int], data: dict, user) -> tuple[list[ImprovementProposal], list[int]]:
+        """同じ承認内容を複数の提案に適用する。(更新した提案, 対象外のID) を返す。"""
+        proposals = {
+            proposal.pk: proposal
+            for proposal in ImprovementProposal.objects.select_for_update().filter(pk__in=ids)
+        }
+        approvals = {
+            approval.proposal_id: approval
+            for approval in ProposalApproval.objects.select_for_update().filter(
+                proposal_id__in=list(proposals), stage=data["stage"]
+            )
+        }
+        targets = [proposals[pk] for pk in ids if pk in approvals]
+        skipped = [pk for pk in ids if pk not in approvals]
+        if not targets:
+            return [], skipped
+
+        confirmed_at = timezone.now()
+        for proposal in targets:
+            self._fill_approval(approvals[proposal.pk], data, user, confirmed_at)
+        ProposalApproval.objects.bulk_update(
+            [approvals[proposal.pk] for proposal in targets],
+            [
+                "status", "comment", "confirmed_name", "confirmed_at", "confirmed_by",
+                "sdgs_flag", "safety_flag", "mindset_score", "idea_score", "hint_score",
+            ],
+        )
+
+        updated_fields = set()
+        for proposal in targets:
+            updated_fields.update(self._apply_decision_fields(proposal, data))
+        if "classification_points" in updated_fields:
+            # 共同提案者を1クエリで読み込んで均等配分し、まとめて保存
+            contributors_by_proposal = defaultdict(list)
+            for contributor in ProposalContributor.objects.filter(proposal__in=targets):
+                contributors_by_proposal[contributor.proposal_id].append(contributor)
+            contributors = []
+            for proposal in targets:
+                if proposal.classification_points is not None and contributors_by_proposal[proposal.pk]:
+                    _assign_classification_point_shares(
+                        proposal.classification_points, contributors_by_proposal[proposal.pk]
                     )
+                    contributors.extend(contributors_by_proposal[proposal.pk])
+            ProposalContributor.objects.bulk_update(contributors, ["classification_points_share", "reward_amount"])
+        if self._assigns_serial(data):
+            # 通し番号は件数分をまとめて確保して指定順に割り当てる
+            serial_numbers = sequences.allocate_serial_numbers(data["term"], len(targets))
+            for proposal, serial_number in zip(targets, serial_numbers):
+                proposal.serial_number = serial_number
+            updated_fields.add("serial_number")
+        for proposal in targets:
+            proposal.updated_at = confirmed_at
+        ImprovementProposal.objects.bulk_update(targets, sorted(updated_fields | {"updated_at"}))
+
+        workflow.refresh_stage_states(targets)
+        proposal_analytics.refresh_proposals([proposal.pk for proposal in targets])
+        return targets, skipped
+
+    def _queue_next_approver_email(self, proposal: ImprovementProposal, stage: str, user) -> None:
+        """次段階の承認者への承認依頼メールを送信箱に登録する。"""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        next_role, recipient_list = approvers.next_stage_recipients(proposal, stage)
+        if next_role is None:
+            return
+        logger.info("[mail] approval: next_stage=%s recipients=%s", next_role, recipient_list)
+        if not recipient_list:
+            logger.warning(
+                "[mail] no recipients found for approval: proposal_id=%s next_stage=%s",
+                proposal.id,
+                next_role,
+            )
+            return
+
+        subject = f"【改善提案】承認依頼: {proposal.management_no}"
+        message = f"""
+        改善提案が承認され、あなたの確認待ちです。
+
+        管理番号: {proposal.management_no}
+        提案者: {proposal.proposer_name}
+        テーマ: {proposal.deployment_item}
+
+        下記URLより内容を確認し、承認処理をお願いします。
+        http://10.0.1.232:8503/approval-center
+        """
+        # 承認者の SMTP 設定が設定されていない場合は送信しない（送信時に同じ設定で接続する）
+        # console / locmem バックエンドでは SMTP 設定に関係なく登録する
+        if mail_outbox.uses_smtp_backend() and not mail_outbox.sender_has_smtp(user):
+            logger.warning(
+                "[mail] SMTP not configured for user: %s",
+                user.username if user else 'Unknown'
+            )
+            return
+        if digest.is_enabled():
+            # まとめ送信: 宛先ごとに溜めて send_outbox_mail が期間ごとに1通にまとめる
+            digest.queue_notices(proposal, next_role, recipient_list, sender=user)
+            logger.info("[mail] queued approval notice for digest to=%s", recipient_list)
+            return
+        mail_outbox.enqueue(
+            EmailOutbox.Kind.APPROVAL,
+            subject,
+            message,
+            recipient_list,
+            sender=user,
+            proposal=proposal,
+        )
+        logger.info("[mail] queued approval email to=%s", recipient_list)
+
+    @action(detail=True, methods=["post"])
+    def approve(self, request, pk=None):
+        proposal = self.get_object()
+        serializer = ApprovalActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        stage = data["stage"]
+        status_val = data["status"]
 
-                    if recipient_list:
-                        subject = f"【改善提案】承認依頼: {proposal.management_no}"
-                        message = f"""
-                        改善提案が承認され、あなたの確認待ちです。
-
-                        管理番号: {proposal.management_no}
-                        提案者: {proposal.proposer_name}
-                        テーマ: {proposal.deployment_item}
-
-                        下記URLより内容を確認し、承認処理をお願いします。
-                        http://10.0.1.232:8503/approval-center
-                        """
-                        try:
-                            # 承認者のSMTP設定を取得
-                            from django.core.mail import EmailMessage
-                            connection, from_email = get_smtp_connection_for_user(request.user)
-
-                            # SMTP設定が設定されていない場合は送信しない
-                            if not connection:
-                                logger.warning(
-                                    "[mail] SMTP not configured for user: %s",
-                                    request.user.username if request.user else 'Unknown'
-                                )
-                            else:
-                                # EmailMessageを使用してカスタム接続で送信
-                                email = EmailMessage(
-                                    subject=subject,
-                                    body=message,
-                                    from_email=from_email,
-                                    to=recipient_list,
-                                    connection=connection,
-                                )
-                                email.send(fail_silently=False)
-                                logger.info("[mail] approval email sent to=%s from=%s", recipient_list, from_email)
-                        except Exception as e:
-                            logger.error("Error sending approval email: %s", e)
-                    else:
-                        logger.warning(
-                            "[mail] no recipients found for approval: proposal_id=%s next_stage=%s next_role=%s",
-                            proposal.id,
-                            next_stage,
-                            next_role
-                        )
+        # 承認結果と通知メール（送信箱）を同一トランザクションで登録する
+        with transaction.atomic():
+            approval = self._apply_approval(proposal, data, request.user)
+            if approval is None:
+                return Response({"detail": "Invalid stage"}, status=status.HTTP_400_BAD_REQUEST)
+            if status_val == ProposalApproval.Status.APPROVED:
+                self._queue_next_approver_email(proposal, stage, request.user)
 
         refreshed_instance = self.get_queryset().filter(pk=proposal.pk).first() or proposal
         refreshed = self.get_serializer(refreshed_instance)
         return Response(refreshed.data)
 
+    def _queue_bulk_approver_emails(self, proposals: list[ImprovementProposal], stage: str, user) -> None:
+        """一括承認した提案の承認依頼を宛先ごとに1通（承認待ち一覧）で送信箱に登録する。"""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        entries_by_recipient = defaultdict(list)
+        notices = []
+        for proposal in proposals:
+            next_role, recipient_list = approvers.next_stage_recipients(proposal, stage)
+            if next_role is None or not recipient_list:
+                continue
+            notices.append((proposal, next_role, recipient_list))
+            for recipient in recipient_list:
+                entries_by_recipient[recipient].append((proposal, next_role))
+        if not notices:
+            return
+        if mail_outbox.uses_smtp_backend() and not mail_outbox.sender_has_smtp(user):
+            logger.warning("[mail] SMTP not configured for user: %s", user.username if user else 'Unknown')
+            return
+
+        if digest.is_enabled():
+            for proposal, next_role, recipient_list in notices:
+                digest.queue_notices(proposal, next_role, recipient_list, sender=user)
+            logger.info("[mail] bulk approval: queued %s notices for digest", len(notices))
+            return
+        for recipient, entries in entries_by_recipient.items():
+            mail_outbox.enqueue(
+                EmailOutbox.Kind.DIGEST,
+                digest.summary_subject(len(entries)),
+                digest.summary_body(entries),
+                [recipient],
+                sender=user,
+            )
+        logger.info("[mail] bulk approval: queued %s emails", len(entries_by_recipient))
+
+    @action(detail=False, methods=["post"], url_path="bulk-approve")
+    def bulk_approve(self, request):
+        """同じ段階・承認内容を ids の提案にまとめて適用する（1トランザクション）。"""
+        serializer = BulkApprovalActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        with transaction.atomic():
+            proposals, skipped = self._apply_bulk_approval(data["ids"], data, request.user)
+            if not proposals:
+                return Response(
+                    {"detail": "No proposals to update", "skipped": skipped},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if data["status"] == ProposalApproval.Status.APPROVED:
+                self._queue_bulk_approver_emails(proposals, data["stage"], request.user)
+
+        return Response({
+            "updated": [
+                {
+                    "id": proposal.pk,
+                    "management_no": proposal.management_no,
+                    "current_stage": proposal.current_stage,
+                    "current_status": proposal.current_status,
+                    "serial_number": proposal.serial_number,
+                }
+                for proposal in proposals
+            ],
+            "skipped": skipped,
+        })
+
+    def _term_report_queryset(self, term_number: int):
+        """改善委員承認済みの指定期の提案（export / analytics 共通）。"""
+        return term_report_queryset(term_number)
+
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request):
+        """テーマ・本文の全文検索（関連度順）。他の一覧フィルターと併用可能。"""
+        keyword = (request.query_params.get("q") or "").strip()
+        if not keyword:
+            return Response({"detail": "q parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = getattr(settings, "PROPOSAL_SEARCH_LIMIT", 50)
+        limit_value = request.query_params.get("limit")
+        if limit_value:
+            try:
+                limit = min(max(int(limit_value), 1), getattr(settings, "PROPOSAL_LIST_MAX_PAGE_SIZE", 500))
+            except ValueError:
+                return Response({"detail": "limit must be integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        proposals = list(proposal_search.rank_proposals(self.get_queryset(), keyword)[:limit])
+        data = self.get_serializer(proposals, many=True).data
+        for item, proposal in zip(data, proposals):
+            item["relevance"] = proposal.relevance
+        return Response(data)
+
     @action(detail=False, methods=["get"], url_path="export")
     def export(self, request):
         term_value = request.query_params.get("term")
@@ -529,20 +761,22 @@ class ImprovementProposalViewSet(viewsets.ModelViewSet):
             term_number = int(term_value)
         except ValueError:
             return Response({"detail": "term must be integer"}, status=status.HTTP_400_BAD_REQUEST)
-        start_date, end_date = fiscal.term_date_range(term_number)
-        start_dt = datetime.combine(start_date, time.min)
-        end_dt = datetime.combine(end_date, time.max)
-        proposals = (
-            ImprovementProposal.objects.filter(
-                Q(term=term_number) | (Q(term__isnull=True) & Q(submitted_at__range=(start_dt, end_dt))),
-                approvals__stage=ProposalApproval.Stage.COMMITTEE,
-                approvals__status=ProposalApproval.Status.APPROVED
+        proposals = self._term_report_queryset(term_number)
+        filename = f"kaizen_term_{term_number}.xlsx"
+        cached = report_jobs.cached_report(term_number)
+        if cached is not None:
+            # ワーカー作成済みの成果物がデータ版数と一致していればそのまま配信する
+            return _report_file_response(cached, filename)
+        if getattr(settings, "REPORT_EXPORT_STREAMING", True):
+            # write-only ブックを一時ファイルに書き出して配信（全件をメモリに載せない）
+            return FileResponse(
+                export_term_report(proposals, term_number),
+                as_attachment=True,
+                filename=filename,
+                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
-            .select_related("department", "section", "group", "team", "proposer")
-            .prefetch_related("approvals__confirmed_by", "contributors__employee")
-        )
+
         buffer = generate_term_report(proposals, term_number)
-        filename = f"kaizen_term_{term_number}.xlsx"
         response = HttpResponse(
             buffer.getvalue(),
             content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
@@ -571,19 +805,23 @@ class ImprovementProposalViewSet(viewsets.ModelViewSet):
             if month_number < 1 or month_number > 12:
                 return Response({"detail": "month must be between 1 and 12"}, status=status.HTTP_400_BAD_REQUEST)
             
-        start_date, end_date = fiscal.term_date_range(term_number)
-        start_dt = datetime.combine(start_date, time.min)
-        end_dt = datetime.combine(end_date, time.max)
-
-        proposals = (
-            ImprovementProposal.objects.filter(
-                Q(term=term_number) | (Q(term__isnull=True) & Q(submitted_at__range=(start_dt, end_dt))),
-                approvals__stage=ProposalApproval.Stage.COMMITTEE,
-                approvals__status=ProposalApproval.Status.APPROVED
-            )
-            .select_related("department", "section", "group", "team", "proposer")
-            .prefetch_related("approvals__confirmed_by", "contributors__employee")
+        # 期のデータ版数（承認・編集・部署/従業員の変更で加算）が同じなら集計結果も同じ
+        etag = _version_etag(
+            "analytics",
+            term_number,
+            report_jobs.data_version(term_number),
+            getattr(settings, "ANALYTICS_USE_AGGREGATES", True),
         )
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        if getattr(settings, "ANALYTICS_USE_AGGREGATES", True) and proposal_analytics.is_built(term_number):
+            # 集計元テーブル（AnalyticsContribution）から集計。未構築の期は run_report_worker が再構築するまで従来の集計
+            data = proposal_analytics.get_analytics_summary(term_number, department_filter=department_filter, month=month_number)
+            return _with_validators(Response(data), etag)
+
+        proposals = self._term_report_queryset(term_number)
         # 部門フィルターは後でreports.pyで適用（contributorベース）
         # if department_filter:
         #     proposals = proposals.filter(department__name=department_filter)
@@ -592,7 +830,151 @@ class ImprovementProposalViewSet(viewsets.ModelViewSet):
 
         from .services.reports import get_analytics_summary
         data = get_analytics_summary(proposals, term_number, department_filter=department_filter)
-        return Response(data)
+        return _with_validators(Response(data), etag)
+
+
+def _report_file_response(job: ReportJob, filename: str) -> FileResponse:
+    return FileResponse(
+        report_jobs.artifact_path(job).open("rb"),
+        as_attachment=True,
+        filename=filename,
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
+class ReportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """期別実績レポートの非同期作成（POST で依頼、GET で状態確認、download で取得）。"""
+
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        term_value = self.request.query_params.get("term")
+        if term_value:
+            try:
+                queryset = queryset.filter(term=int(term_value))
+            except ValueError:
+                return queryset.none()
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        term_value = request.data.get("term", request.query_params.get("term"))
+        if term_value in (None, ""):
+            return Response({"detail": "term parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            term_number = int(term_value)
+        except (TypeError, ValueError):
+            return Response({"detail": "term must be integer"}, status=status.HTTP_400_BAD_REQUEST)
+        job = report_jobs.request_report(term_number, request.user)
+        ready = job.status == ReportJob.Status.SUCCEEDED
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_200_OK if ready else status.HTTP_202_ACCEPTED,
+        )
+
+    @action(detail=True, methods=["get"], url_path="download")
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ReportJob.Status.SUCCEEDED or report_jobs.artifact_path(job) is None:
+            return Response(
+                {"detail": "report is not ready", "status": job.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return _report_file_response(job, f"kaizen_term_{job.term}.xlsx")
+
+
+class ChunkedUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """再開可能な分割アップロード。
+
+    POST で開始（filename / size / sha256）、PATCH で本文のバイト列を ``Upload-Offset`` の位置に追記、
+    GET で受信済み offset を確認して中断した続きから送り直し、attach/ で受信完了したファイルを提案に添付する。
+    """
+
+    queryset = ChunkedUpload.objects.all()
+    serializer_class = ChunkedUploadSerializer
+    permission_classes = [AllowAny]
+
+    def partial_update(self, request, pk=None):
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.headers.get("Content-Length", ""))
+        except ValueError:
+            return Response(
+                {"detail": "Upload-Offset and Content-Length headers are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        upload = self.get_object()
+        if offset + length > upload.size:
+            return Response({"detail": "chunk exceeds declared size"}, status=status.HTTP_400_BAD_REQUEST)
+        # 本文の受信中はトランザクションを持たず、同じアップロードへの同時書き込みはロックファイルで防ぐ
+        with chunked_uploads.writing(upload) as acquired:
+            if acquired:
+                upload.refresh_from_db()
+            if not acquired or upload.status != ChunkedUpload.Status.UPLOADING or offset != upload.offset:
+                # 受信済みの位置を返し、クライアントはそこから送り直す
+                return Response(self.get_serializer(upload).data, status=status.HTTP_409_CONFLICT)
+            # request.data を使わずに本文を少しずつ読み、メモリに溜めない
+            chunked_uploads.append(upload, request.stream)
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=["post"])
+    def attach(self, request, pk=None):
+        serializer = ChunkedUploadAttachSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            upload = chunked_uploads.lock(self.get_object().pk)
+            if upload.status != ChunkedUpload.Status.COMPLETE:
+                return Response(self.get_serializer(upload).data, status=status.HTTP_409_CONFLICT)
+            image = chunked_uploads.attach(
+                upload, serializer.validated_data["proposal"], serializer.validated_data["kind"]
+            )
+        return Response(
+            ProposalImageSerializer(image, context=self.get_serializer_context()).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class MediaFileView(APIView):
+    """署名付き URL（services.media.media_path）の提案画像をログイン中の利用者にだけ配信する。
+
+    ファイル本体は MEDIA_SENDFILE_BACKEND に応じて nginx（X-Accel-Redirect）や X-Sendfile 対応サーバに送らせ、
+    URL に指紋が含まれるため1年間の immutable（private）でキャッシュさせる。
+    """
+
+    # <img> からの取得でも同一オリジンのセッション Cookie が送られるため、セッションで認証する。
+    # 署名は API が発行した URL（パスと指紋の組）であることの確認に使う
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, path):
+        backend = media.sendfile_backend()
+        version = request.query_params.get("v", "")
+        if not backend or not media.verify(path, version, request.query_params.get("s", "")):
+            raise Http404
+        try:
+            file_path = media.absolute_path(path)
+        except SuspiciousFileOperation:
+            raise Http404
+        if not file_path.is_file():
+            raise Http404
+
+        content_type = media.content_type(path)
+        if backend == "nginx":
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = media.accel_redirect_path(path)
+        elif backend == "sendfile":
+            response = HttpResponse(content_type=content_type)
+            response["X-Sendfile"] = str(file_path)
+        else:
+            response = FileResponse(file_path.open("rb"), content_type=content_type)
+        if version:
+            # 版は内容が変わると変わる（署名で API が発行した組み合わせであることを確認済み）
+            patch_cache_control(response, private=True, max_age=media.IMMUTABLE_MAX_AGE, immutable=True)
+        else:
+            # 版のない URL（処理中・旧データ）は長期キャッシュさせない
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
 class DebugView(APIView):
@@ -675,37 +1057,38 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             )
 
         if department_id:
-            # Get all descendant departments of the selected department
-            try:
-                selected_dept = Department.objects.get(id=department_id)
-                descendant_ids = self._get_descendant_ids(selected_dept)
-
-                # Get department names for filtering CharField columns
-                dept_names = list(Department.objects.filter(id__in=descendant_ids).values_list('name', flat=True))
+            # 選択部署と配下の部署（閉包テーブルとの結合をサブクエリとして一覧のクエリに含める）
+            descendant_ids = Department.objects.descendants_of(department_id).order_by().values('id')
 
-                # Filter by the most specific affiliation (priority: team > group > department)
-                queryset = queryset.filter(
-                    # 1. If team has value, filter by team
-                    (~Q(team='') & Q(team__in=dept_names)) |
-                    # 2. If team is empty but group has value, filter by group
-                    (Q(team='') & ~Q(group='') & Q(group__in=dept_names)) |
-                    # 3. If both team and group are empty, filter by department
-                    (Q(team='') & Q(group='') & Q(department_id__in=descendant_ids))
-                )
-            except Department.DoesNotExist:
-                queryset = queryset.none()
+            # Filter by the most specific affiliation (priority: team > group > department)
+            # 各条件は係・班・部署の FK 索引で引ける（名称の一致ではなく部署の行で判定する）
+            queryset = queryset.filter(
+                # 1. If team is set, filter by team
+                Q(team_department_id__in=descendant_ids) |
+                # 2. If team is unset but group is set, filter by group
+                Q(team_department__isnull=True, group_department_id__in=descendant_ids) |
+                # 3. If both team and group are unset, filter by department
+                Q(team_department__isnull=True, group_department__isnull=True, department_id__in=descendant_ids)
+            )
 
         if not include_inactive:
             return queryset.filter(is_active=True)
         return queryset
 
-    def _get_descendant_ids(self, department):
-        """Get all descendant department IDs including the department itself."""
-        ids = {department.id}
-        children = Department.objects.filter(parent=department)
-        for child in children:
-            ids.update(self._get_descendant_ids(child))
-        return ids
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        if params.get("code") or params.get("q") or params.get("include_inactive"):
+            return super().list(request, *args, **kwargs)
+        # 在籍従業員の一覧（部署での絞り込みを含む）は参照データとしてキャッシュする
+        department_id = params.get("department") or ""
+        current, data = reference_data.cached(
+            reference_data.EMPLOYEES,
+            f"active:{department_id}",
+            lambda: self.get_serializer(
+                self.get_queryset().select_related("department__parent"), many=True
+            ).data,
+        )
+        return _reference_response(request, reference_data.EMPLOYEES, current, data)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -109,16 +109,28 @@ export const updateMyProfile = async (payload) => {
   })
 }
 
-export const fetchProposals = async (params = {}) => {
+const proposalQuery = (params) => {
   const search = new URLSearchParams()
-  Object.entries({ page_size: 200, ...params }).forEach(([key, value]) => {
+  Object.entries(params).forEach(([key, value]) => {
     if (value !== undefined && value !== null && value !== '') {
       search.append(key, value)
     }
   })
   const query = search.toString()
-  const path = query ? `/improvement-proposals/?${query}` : '/improvement-proposals/'
-  const data = await request(path)
+  return query ? `/improvement-proposals/?${query}` : '/improvement-proposals/'
+}
+
+// 一覧を1ページずつ取得する（next は次ページのカーソル。最終ページでは null）
+export const fetchProposalPage = async (params = {}, cursor = null) => {
+  const data = await request(proposalQuery({ ...params, cursor }))
+  if (Array.isArray(data)) return { results: data, next: null }
+  const next = data?.next ? new URL(data.next, window.location.origin).searchParams.get('cursor') : null
+  return { results: Array.isArray(data?.results) ? data.results : [], next }
+}
+
+// 全件が必要な場合（件数の少ない絞り込みなど）
+export const fetchProposals = async (params = {}) => {
+  const data = await request(proposalQuery({ page_size: 'all', ...params }))
   if (Array.isArray(data)) return data
   if (data && Array.isArray(data.results)) return data.results
   return []
@@ -216,16 +228,39 @@ export const approveProposal = (id, payload) =>
     body: payload,
   })
 
-export const exportTermReport = async (term) => {
-  const response = await fetch(buildUrl(`/improvement-proposals/export/?term=${term}`), {
-    credentials: 'include',
-  })
+const REPORT_JOB_POLL_MS = 2000
+const REPORT_JOB_TIMEOUT_MS = 120000
+
+const downloadReportFile = async (path) => {
+  const response = await fetch(buildUrl(path), { credentials: 'include' })
   if (!response.ok) {
     throw new Error('レポートの生成に失敗しました')
   }
   return response.blob()
 }
 
+// レポート作成ジョブを依頼して完了を待つ。ワーカーが応答しない場合は同期エクスポートに切り替える
+export const exportTermReport = async (term) => {
+  let job
+  try {
+    job = await request('/report-jobs/', { method: 'POST', body: { term } })
+  } catch (error) {
+    return downloadReportFile(`/improvement-proposals/export/?term=${term}`)
+  }
+  const deadline = Date.now() + REPORT_JOB_TIMEOUT_MS
+  while (job.status === 'pending' || job.status === 'running') {
+    if (Date.now() > deadline) {
+      return downloadReportFile(`/improvement-proposals/export/?term=${term}`)
+    }
+    await new Promise((resolve) => setTimeout(resolve, REPORT_JOB_POLL_MS))
+    job = await request(`/report-jobs/${job.id}/`)
+  }
+  if (job.status !== 'succeeded') {
+    throw new Error(job.error || 'レポートの生成に失敗しました')
+  }
+  return downloadReportFile(`/report-jobs/${job.id}/download/`)
+}
+
 export const fetchAnalytics = async (params) => {
   const query = new URLSearchParams()
   if (typeof params === 'number' || typeof params === 'string') {
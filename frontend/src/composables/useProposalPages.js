@@ -0,0 +1,34 @@
+import { computed, ref } from 'vue'
+import { fetchProposalPage } from '../api/client'
+
+// 改善提案一覧をカーソルで1ページずつ読み込む（「さらに読み込む」で次ページを追加）
+export function useProposalPages() {
+  const proposals = ref([])
+  const nextCursor = ref(null)
+  const loadingMore = ref(false)
+  let currentParams = {}
+
+  const loadFirstPage = async (params = {}) => {
+    currentParams = { ...params }
+    const page = await fetchProposalPage(currentParams)
+    proposals.value = page.results
+    nextCursor.value = page.next
+    return proposals.value
+  }
+
+  const loadMore = async () => {
+    if (!nextCursor.value || loadingMore.value) return
+    loadingMore.value = true
+    try {
+      const page = await fetchProposalPage(currentParams, nextCursor.value)
+      proposals.value = [...proposals.value, ...page.results]
+      nextCursor.value = page.next
+    } finally {
+      loadingMore.value = false
+    }
+  }
+
+  const hasMore = computed(() => Boolean(nextCursor.value))
+
+  return { proposals, hasMore, loadingMore, loadFirstPage, loadMore }
+}